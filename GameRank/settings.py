@@ -84,6 +84,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',  # Ruta de la base de datos
+        'OPTIONS': {
+            # Escrituras a la vez -> esperan hasta `timeout` segundos el bloqueo de escritura
+            # Las valoraciones y los votos lo piden al empezar su transacción (games/ratings.py: write_transaction)
+            'timeout': 20,
+        },
+        # BD de las pruebas en un fichero (no en memoria compartida) -> las escrituras a la vez esperan su turno
+        # como en la BD real (ConcurrentRatingTests)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -153,3 +163,111 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Fuentes externas de juegos -> se sincronizan FUERA de las peticiones HTTP:
+# python manage.py sync_games          -> sincroniza las fuentes pendientes una vez
+# python manage.py sync_games --loop   -> worker en segundo plano (comprueba cada GAME_SYNC_POLL_INTERVAL)
+# - name: nombre único de la fuente (estado guardado en la BD -> FeedSyncStatus)
+# - format: 'XML' o 'JSON'
+# - prefix: prefijo de la clave primaria de cada juego de la fuente
+# - interval: segundos mínimos entre dos sincronizaciones de la misma fuente
+# - timeout (opcional): segundos máximos de cada intento de descarga (por defecto GAME_FEED_TIMEOUT)
+# - retries (opcional): reintentos de la descarga si falla (por defecto GAME_FEED_RETRIES)
+# - deadline (opcional): segundos máximos de la descarga con todos sus reintentos (por defecto GAME_FEED_DEADLINE)
+GAME_FEEDS = [
+    {
+        'name': 'listado1',
+        'format': 'XML',
+        'url': 'https://gitlab.eif.urjc.es/cursosweb/2024-2025/final-gamerank/-/raw/main/listado1.xml',
+        'prefix': 'LIS1-',
+        'interval': 24 * 60 * 60,
+    },
+    {
+        'name': 'freetogame',
+        'format': 'JSON',
+        'url': 'https://www.freetogame.com/api/games',
+        'prefix': 'LIS2-',
+        'interval': 60 * 60,
+    },
+    {
+        'name': 'mmobomb',
+        'format': 'JSON',
+        'url': 'https://www.mmobomb.com/api1/games',
+        'prefix': 'LIS3-',
+        'interval': 60 * 60,
+    },
+]
+
+# Timeout por defecto de la descarga de cada fuente (segundos):
+GAME_FEED_TIMEOUT = 30
+
+# Reintentos de la descarga de cada fuente (espera GAME_FEED_RETRY_BACKOFF segundos, el doble en cada reintento):
+GAME_FEED_RETRIES = 2
+GAME_FEED_RETRY_BACKOFF = 2
+
+# Tiempo máximo de la descarga de cada fuente con todos sus reintentos (segundos):
+GAME_FEED_DEADLINE = 120
+
+# Caché en disco de las fuentes -> última copia correcta + ETag / Last-Modified / hash (games/feeds.py):
+GAME_FEED_CACHE_DIR = BASE_DIR / 'feed_cache'
+
+# Segundos entre comprobaciones del worker de sincronización (sync_games --loop):
+GAME_SYNC_POLL_INTERVAL = 60
+
+# Fuentes descargadas y parseadas en paralelo (hilos) -> las escrituras en la BD las hace un único escritor:
+GAME_SYNC_WORKERS = 4
+
+# Tamaño de los lotes de escritura de la ingesta de juegos (bulk_create / bulk_update) -> games/ingest.py:
+GAME_INGEST_BATCH_SIZE = 500
+
+# Miniaturas de los juegos (games/thumbnails.py) -> se descargan UNA vez durante la sincronización
+# y se guardan redimensionadas y comprimidas (WebP) con el hash de la imagen en el nombre (caché inmutable):
+GAME_THUMBNAIL_SYNC = True
+GAME_THUMBNAIL_DIR = BASE_DIR / 'thumbnail_cache'
+# Anchos (px) de las variantes de cada miniatura -> srcset de las tarjetas:
+GAME_THUMBNAIL_WIDTHS = [180, 360]
+GAME_THUMBNAIL_QUALITY = 75
+GAME_THUMBNAIL_TIMEOUT = 10
+
+# Paginación de los listados de juegos y comentarios (games/pagination.py):
+# - 'keyset' -> por clave con cursores opacos (sin COUNT ni OFFSET: todas las páginas cuestan lo mismo)
+# - 'offset' -> Paginator de Django con número de página
+GAME_PAGINATION = 'keyset'
+
+# Caché de la página principal (games/page_cache.py) -> listado ya renderizado por filtros, página e idioma
+# Segundos de cada entrada (0 -> sin caché). Se invalida antes si cambia el catálogo o un juego (games/versions.py)
+GAME_PAGE_CACHE_TIMEOUT = 300
+
+# Búsqueda (games/search.py) -> búsquedas con más coincidencias no se ordenan por relevancia (BM25 las recorre todas)
+# sino con las que tienen todas las palabras en el título primero
+GAME_SEARCH_RANK_LIMIT = 1000
+
+# Sugerencias de títulos del buscador (games/suggest.py) -> índice de prefijos en memoria de cada proceso
+# Títulos por sugerencia y segundos entre comprobaciones de las versiones (cambios del catálogo o de los títulos)
+# MAX_AGE -> segundos tras los que se vuelve a crear aunque no cambien (orden por las valoraciones nuevas)
+GAME_SUGGEST_LIMIT = 8
+GAME_SUGGEST_REFRESH = 5
+GAME_SUGGEST_MAX_AGE = 300
+
+# Ordenación de los listados (Game.rank_score, games/ratings.py) -> media bayesiana de las valoraciones:
+# (PRIOR_RATING * PRIOR_VOTES + suma de puntuaciones) / (PRIOR_VOTES + votos)
+# -> cada juego empieza con PRIOR_VOTES votos "ficticios" de PRIOR_RATING: pocos votos pesan poco
+# Si se cambian -> python manage.py rebuild_rank_scores
+GAME_RANK_PRIOR_RATING = 3.0
+GAME_RANK_PRIOR_VOTES = 10
+
+# Votos de la API de likes (POST /api/comments/<id>/vote, games/vote_buffer.py) -> escritura por lotes en memoria
+# Segundos que se acumulan los votos antes de escribirlos (0 -> cada voto se escribe en el momento)
+# y votos pendientes como mucho (lleno -> se escriben antes de aceptar otro)
+GAME_VOTE_BUFFER_WINDOW = 0
+GAME_VOTE_BUFFER_SIZE = 1000
+
+# Caché de Django -> en memoria de cada proceso (las versiones de los datos están en la BD, compartidas)
+# Con varios procesos web se puede usar una caché compartida (Redis / Memcached) para compartir también las entradas
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gamerank',
+    }
+}
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Game, Comment, UserGameFollow, Profile, ValidPassword, Like
+from .models import (Game, Comment, UserGameFollow, Profile, ValidPassword, Like, FeedSyncStatus, GameAlias,
+                     CacheVersion, UserStats)
 
 # Register your models here.
 # Registrar todos los modelos para que sea visible en el panel de admin:
@@ -9,4 +10,8 @@ admin.site.register(Comment)
 admin.site.register(UserGameFollow)
 admin.site.register(Profile)
 admin.site.register(ValidPassword)
-admin.site.register(Like)
\ No newline at end of file
+admin.site.register(Like)
+admin.site.register(FeedSyncStatus)
+admin.site.register(GameAlias)
+admin.site.register(CacheVersion)
+admin.site.register(UserStats)
@@ -1,9 +1,30 @@
-from .models import Game, Comment
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .facets import facet_combinations, get_facets
+from .models import Comment
+from .user_stats import get_user_stats
+from .versions import COMMENTS, get_versions
+
+
+# Recuento de todos los comentarios -> cacheado con la versión de los comentarios (games/versions.py)
+# => una consulta de versiones por petición y el COUNT solo después de un cambio (signals.py)
+def comments_count():
+    key = f"stats:comments:{get_versions(COMMENTS)[COMMENTS]}"
+    count = cache.get(key)
+    if count is None:
+        count = Comment.objects.count()
+        cache.set(key, count, None)
+    return count
+
 
 # Contexto base a pasar a todos los templates => Middleware:
+# Cada valor es perezoso (SimpleLazyObject) -> solo se calcula si la plantilla lo usa
+# (help, login, errores... sin el pie de página ni los filtros => sin consultas)
 def stats(request):
-    games_count = Game.objects.count()
-    comments_count = Comment.objects.count()
+    # Fragmentos HTMX (comments_section.html, like.html) -> no usan nada de este contexto
+    if request.headers.get('HX-Request'):
+        return {}
 
     # Referencia a la vista anterior:
     # request.META -> diccionario de Django que tiene todas las cabeceras HTTP (headers) de la solicitud del navegador:
@@ -15,30 +36,24 @@ def stats(request):
     user_comments_count = 0
 
     # Si el usuario está autenticado, calcula sus juegos votados y sus comentarios
+    # -> UNA lectura por clave primaria de sus recuentos (UserStats, games/user_stats.py)
     if request.user.is_authenticated:
-        comments = Comment.objects.filter(user=request.user.username)
-
-        # Contamos los juegos votados (rating >= 0) y sin duplicados (aunque no debería haberlos)
-        voted_games = comments.filter(rating__gte=0).values('game').distinct()
-        voted_games_count = voted_games.count()
-
-        # Contamos los comentarios del usuario que tienen texto (campo 'text' no vacío)
-        user_comments_count = comments.filter(text__isnull=False).exclude(text__exact="").count()
+        voted_games_count = SimpleLazyObject(lambda: get_user_stats(request.user).rated_games_count)
+        user_comments_count = SimpleLazyObject(lambda: get_user_stats(request.user).comment_count)
 
-    # Valores únicos para los filtros:
-    # Listas (flat=True) con los parámetros disponibles en la base de datos
-    # distinct() -> elimina duplicados
-    platforms = Game.objects.values_list('platform', flat=True).distinct().order_by('platform')
-    genres = Game.objects.values_list('genre', flat=True).distinct().order_by('genre')
-    publishers = Game.objects.values_list('publisher', flat=True).distinct().order_by('publisher')
+    # Valores de los filtros con el número de juegos de cada uno -> [(valor, juegos)] (games/facets.py)
+    # Solo los que tienen juegos con el resto de filtros seleccionados (sin listados vacíos)
+    # -> una consulta agrupada cacheada por versión del catálogo (no tres DISTINCT por petición)
+    facets = SimpleLazyObject(lambda: get_facets(request))
 
     return {
-        'games_count': games_count,
-        'comments_count': comments_count,
+        # Total de juegos -> suma de las combinaciones de filtros (misma caché que los filtros, sin COUNT)
+        'games_count': SimpleLazyObject(lambda: sum(combination[-1] for combination in facet_combinations(request))),
+        'comments_count': SimpleLazyObject(comments_count),
         'voted_games_count': voted_games_count,
         'user_comments_count': user_comments_count,
         'previous_page': referer,
-        'platforms': platforms,
-        'genres': genres,
-        'publishers': publishers,
-    }
\ No newline at end of file
+        'platforms': SimpleLazyObject(lambda: facets['platform']),
+        'genres': SimpleLazyObject(lambda: facets['genre']),
+        'publishers': SimpleLazyObject(lambda: facets['publisher']),
+    }
@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Game
+from .versions import FACET_COUNTS, get_versions
+
+
+# Filtros de la página principal (platform, genre, publisher) con el número de juegos de cada valor:
+# - UNA consulta agrupada -> juegos (no obsoletos) por cada combinación (platform, genre, publisher) que existe
+#   (índice game_facet_idx: se recorre el índice ya agrupado, sin leer la tabla ni ordenar)
+# - Las combinaciones se guardan en la caché con la versión de los recuentos (versions.FACET_COUNTS)
+#   -> cambia con la ingesta y al crear, borrar o cambiar los filtros de un juego (NO con las valoraciones)
+# - Con las combinaciones se calculan en Python los valores de cada filtro para CUALQUIER selección
+#   => sin consultas por filtro ni recuentos en cada página
+# Valores de un filtro -> los juegos que cumplen los OTROS filtros seleccionados (como cambiaría al elegirlo)
+#   => solo aparecen los valores con juegos (sin opciones que lleven a un listado vacío)
+
+FACETS = ('platform', 'genre', 'publisher')
+
+
+# Filtros seleccionados en la petición -> {filtro: valor} (solo los que tienen valor, sin espacios)
+def selected_filters(request):
+    selection = {}
+    for facet in FACETS:
+        value = request.GET.get(facet, '').strip()
+        if value:
+            selection[facet] = value
+    return selection
+
+
+# Combinaciones de filtros con juegos -> [(platform, genre, publisher, juegos)]
+# Una vez por petición (se guardan en la petición: la usan la vista y el context processor)
+def facet_combinations(request):
+    combinations = getattr(request, '_facet_combinations', None)
+    if combinations is None:
+        key = f"facets:{get_versions(FACET_COUNTS)[FACET_COUNTS]}"
+        combinations = cache.get(key)
+        if combinations is None:
+            combinations = list(Game.objects.filter(is_stale=False).values_list(*FACETS)
+                                .annotate(games=Count('*')).order_by())
+            cache.set(key, combinations, None)
+        request._facet_combinations = combinations
+    return combinations
+
+
+# Filtros de la petición -> {'platform': [(valor, juegos)], 'genre': [...], 'publisher': [...], 'count': juegos}
+# count -> juegos que cumplen TODOS los filtros seleccionados
+# El valor seleccionado siempre aparece (aunque no tenga juegos con el resto de filtros)
+def get_facets(request):
+    selection = selected_filters(request)
+    counts = {facet: {} for facet in FACETS}
+    total = 0
+    for combination in facet_combinations(request):
+        values, games = dict(zip(FACETS, combination)), combination[-1]
+        mismatched = [facet for facet in FACETS if facet in selection and values[facet] != selection[facet]]
+        if not mismatched:
+            total += games
+        # Cuenta para un filtro si cumple todos los demás
+        for facet in FACETS:
+            if not mismatched or mismatched == [facet]:
+                counts[facet][values[facet]] = counts[facet].get(values[facet], 0) + games
+
+    facets = {'count': total}
+    for facet in FACETS:
+        if facet in selection:
+            counts[facet].setdefault(selection[facet], 0)
+        facets[facet] = sorted(counts[facet].items())
+    return facets
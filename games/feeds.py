@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.utils import timezone
+
+
+# Descarga de las fuentes externas con caché en disco (settings.GAME_FEED_CACHE_DIR):
+# - Por cada URL se guardan: la última copia correcta (.body) y sus metadatos (.json)
+#   -> ETag, Last-Modified y hash (sha256) del contenido
+# - Peticiones condicionales (If-None-Match / If-Modified-Since) -> 304 = sin cambios, sin descarga
+# - Timeout por fuente -> si la fuente falla y hay copia en caché se usa la última copia correcta
+
+# Tamaño de los bloques de lectura de la descarga (se guarda en disco sin cargarla entera en memoria):
+CHUNK_SIZE = 64 * 1024
+
+
+# Resultado de una descarga:
+# status -> 'fetched' (descargada), 'not_modified' (304) o 'fallback' (error -> copia en caché)
+# content_hash -> sha256 del contenido | path -> fichero con el contenido | error -> motivo del fallback
+class FeedResult:
+
+    def __init__(self, status, content_hash, path, error=''):
+        self.status = status
+        self.content_hash = content_hash
+        self.path = path
+        self.error = error
+
+    # Abrir el contenido como flujo de bytes (igual que la respuesta de urlopen):
+    def open(self):
+        return open(self.path, 'rb')
+
+
+# Directorio de la caché de fuentes:
+def get_cache_dir():
+    cache_dir = getattr(settings, 'GAME_FEED_CACHE_DIR', settings.BASE_DIR / 'feed_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+# Rutas del contenido y de los metadatos de una URL en la caché -> nombre = sha256 de la URL
+def cache_paths(url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    base = os.path.join(get_cache_dir(), key)
+    return base + '.body', base + '.json'
+
+
+def read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Escribir los metadatos de forma atómica (fichero temporal + os.replace):
+def write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+# Hash del último contenido de una URL cargado en la BD con load_games (utils.py) -> '' si no se ha cargado
+# (en los metadatos de la caché: solo se guarda tras una carga sin errores)
+def loaded_hash(url):
+    _body_path, meta_path = cache_paths(url)
+    return read_meta(meta_path).get('loaded_hash', '')
+
+
+def set_loaded_hash(url, content_hash):
+    _body_path, meta_path = cache_paths(url)
+    meta = read_meta(meta_path)
+    meta['loaded_hash'] = content_hash
+    write_meta(meta_path, meta)
+
+
+# Descargar una fuente -> FeedResult
+# timeout -> segundos máximos de la petición (None = settings.GAME_FEED_TIMEOUT)
+# Si falla y NO hay copia en caché -> se propaga el error
+def fetch_feed(url, timeout=None):
+    if timeout is None:
+        timeout = getattr(settings, 'GAME_FEED_TIMEOUT', 30)
+
+    body_path, meta_path = cache_paths(url)
+    meta = read_meta(meta_path)
+    has_copy = os.path.exists(body_path) and meta.get('content_hash')
+
+    # Cabeceras condicionales -> solo si tenemos copia válida en caché:
+    headers = {}
+    if has_copy:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    request = urllib.request.Request(url, headers=headers)
+    tmp_path = body_path + '.tmp'
+    try:
+        # Descargar por bloques a un fichero temporal calculando el hash a la vez:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            digest = hashlib.sha256()
+            with open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and has_copy:
+            # Sin cambios en la fuente -> la copia en caché sigue siendo válida
+            meta['checked_at'] = timezone.now().isoformat()
+            write_meta(meta_path, meta)
+            return FeedResult('not_modified', meta['content_hash'], body_path)
+        return fallback(url, body_path, meta, has_copy, e)
+
+    except (urllib.error.URLError, OSError) as e:
+        # Error de conexión o timeout:
+        return fallback(url, body_path, meta, has_copy, e)
+
+    content_hash = digest.hexdigest()
+    if content_hash == meta.get('content_hash') and os.path.exists(body_path):
+        # Mismo contenido que la copia en caché -> no se reescribe
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, body_path)
+
+    write_meta(meta_path, {
+        'url': url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'content_hash': content_hash,
+        'checked_at': timezone.now().isoformat(),
+        'loaded_hash': meta.get('loaded_hash', ''),
+    })
+    return FeedResult('fetched', content_hash, body_path)
+
+
+# Usar la última copia correcta de la caché si la descarga ha fallado (si no hay copia -> error)
+def fallback(url, body_path, meta, has_copy, error):
+    tmp_path = body_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    if not has_copy:
+        raise error
+
+    print(f"Error al descargar '{url}', se usa la copia en caché: {error}")
+    return FeedResult('fallback', meta['content_hash'], body_path, error=str(error))
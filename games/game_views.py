@@ -1,79 +1,100 @@
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.http import Http404, JsonResponse, HttpResponse
+from django.db.models import BooleanField, Case, Value, When
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseNotAllowed, FileResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 import xml.etree.ElementTree as ET
-from django.utils.translation import gettext as _
+from django.utils.translation import get_language, gettext as _
 from urllib.parse import urlencode
 
+from . import page_cache, vote_buffer
+from .facets import get_facets
 from .forms import RatingCommentForm
+from .likes import toggle_vote, user_vote
 from .models import Game, Comment, UserGameFollow, Like
-from .utils import load_games
+from .pagination import COMMENT_ORDERING, GAME_ORDERING, page_key, paginate, paginate_groups, related_ordering
+from .ratings import add_rating, write_transaction
+from .search import search_games
+from .suggest import suggest_titles
+from .thumbnails import thumbnail_path
+from .user_stats import add_user_stats
+
+
+# Juegos por página de la página principal y resultados por página de la búsqueda:
+MAIN_PAGE_SIZE = 30
+SEARCH_PAGE_SIZE = 20
 
 
 # GET / -> Muestra el listado de juegos con sus comentarios --> guardados en la base de datos
+# Los datos de las APIs: XML(1) y JSON(2) se cargan fuera de la petición -> games/sync.py (python manage.py sync_games)
 def main(request):
-    # Cargamos los datos de las APIs: XML(1) y JSON(2):
-    load_games('XML', 'https://gitlab.eif.urjc.es/cursosweb/2024-2025/final-gamerank/-/raw/main/listado1.xml', 'LIS1-')
-    load_games('JSON', 'https://www.freetogame.com/api/games', 'LIS2-')
-    load_games('JSON', 'https://www.mmobomb.com/api1/games', 'LIS3-')
-
     # Filtrado de juegos desde la petición GET
     # Parámetros de la URL -> ej => ?platform=PC+(Windows)&genre=ARPG&publisher=101XP
     platform = request.GET.get('platform', '').strip()
     genre = request.GET.get('genre', '').strip()
     publisher = request.GET.get('publisher', '').strip()
 
-    # Obtener todos los juegos de la base de datos:
-    games = Game.objects.all()
-
     # Generar query string sin el parámetro 'page'
     query_params = {}
-
-    # Si se le ha pasado el parámetro en el body -> filtrar juegos:
     if platform:
-        games = games.filter(platform=platform)
         query_params['platform'] = platform
     if genre:
-        games = games.filter(genre=genre)
         query_params['genre'] = genre
     if publisher:
-        games = games.filter(publisher=publisher)
         query_params['publisher'] = publisher
 
-    # Construir la query string -> ej: platform=PC&genre=Action
-    query_string = urlencode(query_params)
-
-    # Mensaje info de filtrado:
-    if platform or genre or publisher:
-        if games.exists():
-            messages.success(request, _("%(count)d games found with selected filters!!!") % {"count": games.count() })
+    # Página del listado (cursor normalizado: '' si no es válido) -> parte de la clave de la caché:
+    page = page_key(request, Game.objects.filter(is_stale=False, **query_params), GAME_ORDERING, MAIN_PAGE_SIZE)
+
+    # Listado ya renderizado en la caché (games/page_cache.py) -> por filtros, página e idioma
+    # -> si no está: consultar los juegos de la página, renderizar el listado y guardarlo
+    key = page_cache.listing_key(platform, genre, publisher, page, get_language())
+    listing = page_cache.get_listing(key)
+    cache_status = 'hit' if listing is not None else 'miss'
+    if listing is None:
+        listing = build_listing(request, query_params)
+        page_cache.set_listing(key, listing)
+
+    # Mensaje info de filtrado -> recuento de los filtros (games/facets.py: cacheado por versión del catálogo,
+    # el mismo que usan los desplegables del context processor => sin COUNT por petición):
+    if query_params:
+        count = get_facets(request)['count']
+        if count:
+            messages.success(request, _("%(count)d games found with selected filters!!!") % {"count": count})
         else:
             messages.warning(request, _("No games match the selected filters!!!"))
 
-    # Listar juegos por puntuación ascendente -> de mayor a menor (descendente) puntuación:
-    games = games.order_by('-average_rating')
+    # Renderizar plantilla html --> games/main.html -> con el listado de la página
+    # y los botones de seguir de este usuario (no se cachean):
+    response = render(request, 'games/main.html', {
+        'listing': page_cache.add_follow_buttons(request, listing),
+    })
+    # Cabecera con el resultado de la caché (hit / miss) -> depuración y medidas
+    response['X-Page-Cache'] = cache_status
+    return response
+
 
-    # Asignar a cada Game -> nuevo atributo dinámico no persistente -> no se guarda en la base de datos
-    # Debido a que varía dependiendo del User
-    for game in games:
-        game.is_following = game.is_followed_by_user(request.user)
+# Listado de la página principal sin cachear -> {'html', 'game_ids'}
+# -> NO depende del usuario (se comparte entre todos en la caché)
+def build_listing(request, query_params):
+    # Obtener los juegos de la base de datos:
+    # Si se le ha pasado el parámetro en el body -> filtrar juegos:
+    # ej => ?platform=PC+(Windows)&genre=ARPG&publisher=101XP
+    # Sin los juegos obsoletos (eliminados en su fuente, Game.is_stale)
+    games = Game.objects.filter(is_stale=False, **query_params)
 
-    # Configuración de la paginación (30 juegos por página) -> separa games en páginas:
-    paginator = Paginator(games, 30)
-    # Número de página actual en el campo 'page' del cuerpo de la petición GET:
-    page_number = request.GET.get('page')
-    # Games de la página actual:
-    games_page = paginator.get_page(page_number)
+    # Paginación (30 juegos por página) -> de mayor a menor (descendente) puntuación (games/pagination.py):
+    # -> solo se cargan los juegos de la página actual (cursor en el campo 'page' de la petición GET)
+    games_page = paginate(request, games, GAME_ORDERING, MAIN_PAGE_SIZE)
 
-    # Renderizar plantilla html --> games/main.html -> pasando el listado de juegos de la página
-    # y parámetros de los filtros si se ha hecho filtrado de juegos:
-    return render(request, 'games/main.html', {
+    # Renderizar el listado -> con la query string de los filtros en la paginación (ej: platform=PC&genre=Action)
+    html = render_to_string('games/main_listing.html', {
         'games': games_page,
-        'query_string': query_string,
+        'query_string': urlencode(query_params),
     })
-
+    return {'html': html, 'game_ids': [game.id for game in games_page]}
 
 
 # GET /rated_games -> Muestra los juegos que ha votado el usuario
@@ -86,52 +107,35 @@ def rated_games(request):
     # Juegos que el usuario ha puntuado (y comentado):
     # values_list('game', flat=True) -> lista plana de ids de games asociados al user
     # filter(id__in=rated_game_ids) -> filtrar games con id en la lista rated_games_ids
-    # order_by('-rating') -> Ordenar por puntuación descendente (mayor a menor)
+    # Sin juegos valorados -> la primera página sale vacía (mensaje de la plantilla) y sin comentarios que buscar
     rated_game_ids = Comment.objects.filter(user=request.user, rating__gte=0).values_list('game', flat=True)
-    rated_games = Game.objects.filter(id__in=rated_game_ids).order_by('-average_rating')
+    rated_games = Game.objects.filter(id__in=rated_game_ids)
 
     # Buscar tabla NN UserGameFollow -> juegos seguidos por el User mediante ForeignKeys
     # values_list() -> obtener solo los lista (no de tuplas) de valores **id** de cada Game de la columna game
     followed_games = UserGameFollow.objects.filter(user=request.user).values_list('game', flat=True)
 
-    # Para cada juego, agregamos los comentarios asociados
-    rated_game_details = []
-    for game in rated_games:
-        # Única valoración del usuario (si existe)
-        rated_comment = Comment.objects.filter(game=game, user=request.user, rating__gte=0).first()
+    # Paginación (5 juegos por página) -> de mayor a menor puntuación
+    # -> los comentarios solo se buscan para los juegos de la página actual
+    page_rated_games = paginate(request, rated_games, GAME_ORDERING, 5)
 
-        if rated_comment:
-            comments = [rated_comment]
+    # Comentarios del usuario: primero su valoración y después el resto (recientes a antiguos)
+    # -> is_rating forma parte de la ordenación de la paginación por clave (nunca nulo, aunque rating lo sea)
+    user_comments = Comment.objects.filter(user=request.user).annotate(
+        is_rating=Case(When(rating__gte=0, then=Value(True)), default=Value(False), output_field=BooleanField()))
 
-            # Obtener resto de comentarios para este juego y el usuario
-            other_comments = (Comment.objects.filter(game=game, user=request.user)
-                              .exclude(id=rated_comment.id).order_by('-timestamp'))
+    # Comentarios de los juegos de la página -> UNA consulta para todos (games/pagination.py)
+    # Paginación (5 comentarios por página) de cada juego:
+    # Identificador único para cada page de valoraciones de cada juego
+    # (parámetro en la URL: page_{game.id})
+    comment_pages = paginate_groups(request, user_comments, ('-is_rating',) + COMMENT_ORDERING, 5, 'game',
+                                    {game.id: f"page_{game.id}" for game in page_rated_games})
 
-            # Añadir comentarios restantes:
-            comments += list(other_comments)
+    # Contexto de cada juego con sus comentarios
+    rated_game_details = [{'game': game, 'comments': comment_pages[game.id]} for game in page_rated_games]
 
-        else:
-            # Sin valoración -> Obtener los comentarios para este juego y el usuario
-            # (NUNCA PASA -> VISTA DE RATED GAMES)
-            comments = Comment.objects.filter(game=game, user=request.user).order_by('-timestamp')
-
-        # Paginación (5 comentarios por página):
-        paginator = Paginator(comments, 5)
-        # Identificador único para cada page de valoraciones de cada juego
-        # (parámetro en la URL: page_{game.id})
-        page_number = request.GET.get(f"page_{game.id}", 1)
-        page_comments = paginator.get_page(page_number)
-
-        # Contexto de cada juego con sus comentarios
-        rated_game_details.append({
-            'game': game,
-            'comments': page_comments
-        })
-
-    # Paginación (5 juegos por página)
-    paginator = Paginator(rated_game_details, 5)
-    page_number = request.GET.get("page")
-    page_rated_games = paginator.get_page(page_number)
+    # Los juegos de la página (con sus comentarios) se muestran con la paginación de los juegos:
+    page_rated_games.object_list = rated_game_details
 
     # Renderizar plantilla html --> games/rated_games.html con los juegos que ha votado el usuario y los seguidos
     return render(request, 'games/rated_games.html',
@@ -145,15 +149,12 @@ def followed_games(request):
         messages.error(request, _("Login required to access this page!!!"))
         return redirect('login')
 
-    # Juegos seguidos por el usuario -> ordenados descendentemente (mayor a menor):
+    # Juegos seguidos por el usuario:
     # --> Acceso indirecto a tablas NN UserGameFollow del user con acceso a cada juego seguido
-    followed_games = (UserGameFollow.objects.filter(user=request.user).
-    select_related('game').order_by('-game__average_rating'))
+    followed_games = UserGameFollow.objects.filter(user=request.user).select_related('game')
 
-    # Paginación (5 juegos por página)
-    paginator = Paginator(followed_games, 5)
-    page_number = request.GET.get("page")
-    followed_games_page = paginator.get_page(page_number)
+    # Paginación (5 juegos por página) -> ordenados descendentemente (mayor a menor puntuación):
+    followed_games_page = paginate(request, followed_games, related_ordering(GAME_ORDERING, 'game'), 5)
 
     # Renderizar plantilla html --> games/followed_games.html con los juegos que ha seguido el usuario
     return render(request, 'games/followed_games.html', {'followed_games': followed_games_page})
@@ -243,85 +244,77 @@ def game_detail(request, game_id):
                 status = 401
 
             else: # Si se proporciona una valoración -> modificar valoración media:
+                # Comentario + valoración media del juego + recuentos del usuario (UserStats) -> todo o nada
+                # (con el bloqueo de escritura desde el principio: lee la valoración anterior antes de escribir)
+                with write_transaction():
+
+                    if rating is not None:
+                        # Verificar si el juego ya ha sido valorado por el user:
+                        existing_rating_comment = Comment.objects.filter(game=game,
+                                                                         user=request.user,
+                                                                         rating__gte=0).first()
+
+                        if existing_rating_comment:
+                            # Recuentos del usuario -> diferencia de puntuación y si ahora tiene (o no) texto:
+                            stats_deltas = {'rating_sum': rating - existing_rating_comment.rating,
+                                            'comment_count': (text != '') - (existing_rating_comment.text != '')}
+
+                            # Modificar la suma de puntuaciones del juego (mismo número de votos) -> games/ratings.py:
+                            add_rating(game, rating - existing_rating_comment.rating, 0)
+
+                            # Actualizar valoración (y comentario si tiene) existente:
+                            existing_rating_comment.rating = rating
+                            existing_rating_comment.text = text
+                            existing_rating_comment.save()
+                            messages.success(request, _("Your rating has been updated!!!"))
 
-                if rating is not None:
-                    # Verificar si el juego ya ha sido valorado por el user:
-                    existing_rating_comment = Comment.objects.filter(game=game,
-                                                                     user=request.user,
-                                                                     rating__gte=0).first()
-
-                    if existing_rating_comment:
-                        # Modificar media de puntuación existente del juego:
-                        total_rating = game.average_rating * game.vote_count
-                        total_rating = total_rating - existing_rating_comment.rating + rating
-
-                        if game.vote_count == 1:
-                            # Si solo hay una valoración, y se cambia a 0
-                            game.average_rating = 0.0 if rating == 0 else round(rating, 1)
                         else:
-                            game.average_rating = round(total_rating / game.vote_count, 1)
+                            # Recuentos del usuario -> un voto y un juego valorado más (y un comentario si tiene texto):
+                            stats_deltas = {'vote_count': 1, 'rating_sum': rating, 'rated_games_count': 1,
+                                            'comment_count': int(text != '')}
 
-                        # Actualizar valoración (y comentario si tiene) existente:
-                        existing_rating_comment.rating = rating
-                        existing_rating_comment.text = text
-                        existing_rating_comment.save()
-                        messages.success(request, _("Your rating has been updated!!!"))
+                            # Sumar el voto y su puntuación a los contadores del juego -> games/ratings.py:
+                            add_rating(game, rating, 1)
 
-                    else:
-                        # Actualizar campos del modelo Game:
-                        game.vote_count += 1  # Incrementar contador de votos
+                            # Crear un Comment -> valoración (y comentario) hecha:
+                            Comment.objects.create(
+                                game=game,  # Guardar dueño del comentario, si no está logado -> Anonymous
+                                user=request.user.username if request.user.is_authenticated else _('Anonymous'),
+                                rating=rating,
+                                text=text
+                            )
 
-                        # Modificar media de puntuación nueva:
-                        # Calcular suma total de las valoraciones previas:
-                        total_rating = game.average_rating * (game.vote_count - 1)
-                        # Sumar la nueva valoración:
-                        total_rating += rating
+                            messages.success(request, _("Your rating has been saved!!!"))
 
-                        if game.vote_count == 1:
-                            game.average_rating = 0.0 if rating == 0 else round(rating, 1)
-                        else:
-                            game.average_rating = round(total_rating / game.vote_count, 1)
+                    else:
 
-                        # Crear un Comment -> valoración (y comentario) hecha:
+                        # Crear un Comment -> Comentario hecho (solo):
                         Comment.objects.create(
                             game=game,  # Guardar dueño del comentario, si no está logado -> Anonymous
                             user=request.user.username if request.user.is_authenticated else _('Anonymous'),
-                            rating=rating,
                             text=text
                         )
+                        stats_deltas = {'comment_count': int(text != '')}
+                        # messages -> Django envía mensajes de diferentes niveles implícitamente a la plantilla que se renderiza
+                        messages.success(request, _("Your comment has been saved!!!"))
 
-                        messages.success(request, _("Your rating has been saved!!!"))
-
-                    # Guardar cambios en la base de datos:
-                    game.save()
-
-                else:
-
-                    # Crear un Comment -> Comentario hecho (solo):
-                    Comment.objects.create(
-                        game=game,  # Guardar dueño del comentario, si no está logado -> Anonymous
-                        user=request.user.username if request.user.is_authenticated else _('Anonymous'),
-                        text=text
-                    )
-                    # messages -> Django envía mensajes de diferentes niveles implícitamente a la plantilla que se renderiza
-                    messages.success(request, _("Your comment has been saved!!!"))
+                    # Recuentos del usuario (games/user_stats.py) -> UPDATE con F() en la misma transacción
+                    if request.user.is_authenticated:
+                        add_user_stats(request.user, **stats_deltas)
 
         else:
             messages.error(request, _("Please provide a rating and/or a comment!"))
             status = 401
 
 
-    # Obtener todos los comentarios del juego
+    # Obtener los comentarios del juego
     # ordenados por fecha => timestamp (recientes a antiguos -> descendente):
-    comments = Comment.objects.filter(game=game).order_by('-timestamp')
+    comments = Comment.objects.filter(game=game)
 
-    # Paginar comentarios -> 5 comentarios por página:
-    paginator = Paginator(comments, 5)
-    # Obtener número de la página actual
-    # -> campo 'page' del body del GET /details:
-    page_number = request.GET.get('page')
+    # Paginar comentarios -> 5 comentarios por página (games/pagination.py):
+    # -> cursor de la página actual en el campo 'page' del GET /details
     # Comentarios a mostrar en el template (página actual):
-    comments_page = paginator.get_page(page_number)
+    comments_page = paginate(request, comments, COMMENT_ORDERING, 5)
 
     # Si es solicitud HTMX (cabecera) y está activo el modo dinámico:
     if request.headers.get('HX-Request'):
@@ -339,6 +332,101 @@ def game_detail(request, game_id):
     }, status=status)
 
 
+# GET /thumbs/<name> -> Variante de una miniatura guardada en local (games/thumbnails.py)
+# El nombre lleva el hash de la imagen -> nunca cambia su contenido => caché del navegador de 1 año (immutable)
+def thumbnail(request, name):
+    try:
+        image = open(thumbnail_path(name), 'rb')
+    except OSError:
+        raise Http404
+    response = FileResponse(image, content_type='image/webp')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# GET /cache_stats/ -> JSON con los aciertos y fallos de la caché de la página principal (solo staff)
+def cache_stats(request):
+    if not request.user.is_staff:
+        raise Http404
+    return JsonResponse(page_cache.page_cache_stats())
+
+
+# Parámetros de una búsqueda (GET /search y /api/search) -> (texto, filtros, número de página)
+# ej => ?q=space+shooter&genre=Shooter&page=2
+def search_params(request):
+    text = request.GET.get('q', '').strip()
+    filters = {}
+    for field in ('platform', 'genre', 'publisher'):
+        value = request.GET.get(field, '').strip()
+        if value:
+            filters[field] = value
+    try:
+        number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        number = 1
+    return text, filters, number
+
+
+# GET /search/?q=... -> Buscar juegos por título y descripción (games/search.py)
+# Resultados por relevancia (20 por página) con las palabras encontradas resaltadas
+# -> se puede combinar con los filtros de la página principal (platform, genre, publisher)
+def search(request):
+    text, filters, number = search_params(request)
+    results, has_next = search_games(text, filters, limit=SEARCH_PAGE_SIZE, offset=(number - 1) * SEARCH_PAGE_SIZE)
+
+    # Query string de la búsqueda sin el parámetro 'page' -> enlaces de la paginación
+    query_string = urlencode({'q': text, **filters})
+    return render(request, 'games/search.html', {
+        'query': text,
+        'filters': filters,
+        'results': results,
+        'number': number,
+        'has_next': has_next,
+        'query_string': query_string,
+    })
+
+
+# GET /api/search/?q=... -> JSON con los mismos resultados que /search (título y fragmento resaltados en HTML)
+def search_json(request):
+    text, filters, number = search_params(request)
+    results, has_next = search_games(text, filters, limit=SEARCH_PAGE_SIZE, offset=(number - 1) * SEARCH_PAGE_SIZE)
+    return JsonResponse({
+        'query': text,
+        'filters': filters,
+        'page': number,
+        'has_next': has_next,
+        'results': [{
+            'id': result['game'].id,
+            'title': result['game'].title,
+            'title_html': result['title'],
+            'snippet_html': result['snippet'],
+            'platform': result['game'].platform,
+            'genre': result['game'].genre,
+            'publisher': result['game'].publisher,
+            'average_rating': result['game'].average_rating,
+            'rank': result['rank'],
+            'url': reverse('game_detail', args=[result['game'].id]),
+        } for result in results],
+    })
+
+
+# GET /suggest/?q=... -> JSON con los títulos que empiezan por el texto (desde cualquier palabra), por valoración
+# Índice de prefijos en memoria (games/suggest.py) -> sin consultas a la BD en cada tecla
+def suggest(request):
+    # Número de títulos (?limit=) -> como mucho GAME_SUGGEST_LIMIT
+    try:
+        limit = int(request.GET.get('limit', 0))
+    except ValueError:
+        limit = 0
+    titles = suggest_titles(request.GET.get('q', ''), limit)
+    return JsonResponse({'results': [{
+        'id': game_id,
+        'title': title,
+        'average_rating': rating,
+        'url': reverse('game_detail', args=[game_id]),
+    } for game_id, title, rating in titles]})
+
+
 # GET /help -> Ayuda/Funcionalidad de la aplicación games
 def help_view(request):
     return render(request, 'games/help.html')
@@ -435,44 +523,50 @@ def like_comment(request, comment_id):
     except Http404:
         return render(request, 'games/404error.html', status=404)
 
-    # Obtener o crear objeto de Like:
-    like_obj, created = Like.objects.get_or_create(
-        comment=comment,
-        user=request.user,
-    )
-
     if request.method == 'POST':
-        # Query strings --> Formulario HTMX de like -> tipo
-        like_type = request.POST.get("like_type")
-
-        if like_type == 'like':
-            if like_obj.like:
-                # Anular like
-                like_obj.like = False
-            elif not like_obj.like:
-                # Dar like
-                like_obj.like = True
-            # Dislike a False
-            like_obj.dislike = False
-
-        else:
-            if like_obj.dislike:
-                # Anular dislike
-                like_obj.dislike = False
-            elif not like_obj.dislike:
-                # Dar dislike
-                like_obj.dislike = True
-            # Like a False
-            like_obj.like = False
-
-        # Guardar cambios en la base de datos
-        like_obj.save()
+        # Query strings --> Formulario HTMX de like -> tipo -> mismo voto otra vez lo anula
+        # (UN upsert del voto + contadores del comentario en la misma transacción)
+        value = Like.LIKE if request.POST.get("like_type") == 'like' else Like.DISLIKE
+        vote = toggle_vote(comment, request.user, value)
+    else:
+        # GET -> solo leer el voto (sin crear una fila vacía por cada botón mostrado)
+        vote = user_vote(comment, request.user)
 
     # Para GET y POST:
     # Solo renderizar botones de like y dislike -> para realizar formulario:
     return render(request, 'games/like.html', {
         'comment': comment,
         'user': request.user,
-        'like': like_obj,
+        'vote': vote,
         'like_options': [('like', '👍 '+_('Like')), ('dislike', '👎 '+_('Dislike'))],
     })
+
+
+# POST /api/comments/<comment_id>/vote -> Like/Dislike en JSON (vote=like | vote=dislike, mismo voto otra vez lo anula)
+# Sin plantillas ni context processors -> {'comment', 'vote' (1, -1 o 0), 'like_count', 'dislike_count'}
+# Con settings.GAME_VOTE_BUFFER_WINDOW -> los votos se escriben por lotes (games/vote_buffer.py)
+def comment_vote(request, comment_id):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': "Login required to like a comment"}, status=401)
+
+    values = {'like': Like.LIKE, 'dislike': Like.DISLIKE}
+    if request.POST.get('vote') not in values:
+        return JsonResponse({'error': "vote must be 'like' or 'dislike'"}, status=400)
+
+    comment = Comment.objects.only('id', 'like_count', 'dislike_count').filter(id=comment_id).first()
+    if comment is None:
+        return JsonResponse({'error': "Comment not found"}, status=404)
+
+    # Comentario borrado entre la consulta y el voto -> también 404
+    try:
+        value, like_count, dislike_count = vote_buffer.vote(comment, request.user, values[request.POST['vote']])
+    except Comment.DoesNotExist:
+        return JsonResponse({'error': "Comment not found"}, status=404)
+    return JsonResponse({
+        'comment': comment.id,
+        'vote': value,
+        'like_count': like_count,
+        'dislike_count': dislike_count,
+    })
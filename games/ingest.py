@@ -0,0 +1,461 @@
+import codecs
+import hashlib
+import json
+import re
+import sys
+import time
+from contextlib import nullcontext
+import xml.etree.ElementTree as ET
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from .models import Game, GameAlias, normalize_title
+from .search import SEARCH_COLUMNS, index_games, remove_games
+from .versions import bump_ingest_versions, bump_stale_versions
+
+
+# Motor de ingesta masiva de juegos (usado por load_xml y load_json en utils.py):
+# - Carga UNA vez por ejecución las claves existentes (id y título normalizado) y el hash de cada juego en memoria
+# - Mismo título normalizado con otro id (otra fuente) -> NO se duplica: se guarda como alias (GameAlias)
+# - Construye los objetos Game por lotes y los escribe con bulk_create / bulk_update
+# - Juegos ya existentes -> se comparan por hash (source_hash) y solo se actualizan los campos que cambian
+# - Juegos que ya no vienen en su fuente -> se marcan como obsoletos (is_stale)
+# - Toda la ejecución va en una sola transacción (o una por lote en modo reanudable -> checkpoint)
+# - Devuelve estadísticas: filas insertadas, actualizadas y omitidas + registros/segundo
+
+# Fecha por defecto si la fuente no trae una fecha válida:
+DEFAULT_RELEASE_DATE = '2025-01-01'
+
+# Tamaño de los bloques de lectura del JSON en streaming:
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Tamaño máximo (caracteres) de un objeto del JSON en streaming -> memoria acotada aunque el fichero esté corrupto:
+JSON_MAX_OBJECT_SIZE = 16 * 1024 * 1024
+
+# Separadores entre los elementos del array JSON (espacios, comas y BOM inicial):
+JSON_SEPARATORS = re.compile(r'[\s,\ufeff]*')
+
+# Campos del juego que vienen de la fuente externa (los de valoración son propios de la app):
+SOURCE_FIELDS = [
+    'title', 'platform', 'genre', 'developer', 'publisher', 'release_date',
+    'description', 'freetogame_profile_url', 'game_url', 'thumbnail',
+]
+
+
+# Hash (sha256) de los campos de la fuente de un juego -> estable entre ejecuciones (Game.source_hash)
+def source_hash(game_data):
+    values = [str(game_data.get(field) or '') for field in SOURCE_FIELDS]
+    return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()
+
+
+# Tamaño de lote por defecto -> settings.GAME_INGEST_BATCH_SIZE
+def default_batch_size():
+    return getattr(settings, 'GAME_INGEST_BATCH_SIZE', 500)
+
+
+# Convertir la fecha de la fuente a date -> fecha por defecto si no existe o no es válida
+# ej: Bleach Online -> listado1.xml -> 2014-02-30 | Pocket Starships -> MMOBomb -> null
+def clean_release_date(value):
+    try:
+        release_date = parse_date(value) if value else None
+    except ValueError:
+        release_date = None
+    return release_date or parse_date(DEFAULT_RELEASE_DATE)
+
+
+# Elemento <game> del XML (listado1.xml) -> diccionario de campos de Game
+def game_data_from_xml(game_element, prefix):
+    # Texto de un subelemento (None si no existe):
+    def text(tag):
+        element = game_element.find(tag)
+        return element.text if element is not None else None
+
+    return {
+        # Prefijo añadido al ID -> ej: <id>1</id> -> 'LIS1-1'
+        'id': prefix + text('id'),
+        'title': text('title'),
+        'platform': text('platform'),
+        'genre': text('genre'),
+        'developer': text('developer'),
+        'publisher': text('publisher'),
+        'release_date': clean_release_date(text('release_date')),
+        'description': text('short_description'),
+        'freetogame_profile_url': text('freetogame_profile_url'),
+        'game_url': text('game_url'),
+        'thumbnail': text('thumbnail'),
+    }
+
+
+# Recorrer en streaming los <game> de un XML (listado1.xml) -> genera un diccionario de Game por juego
+# -> iterparse: cada <game> se procesa al cerrarse y se libera después
+#    => memoria constante aunque el fichero sea muy grande (no se construye el árbol completo)
+# Solo los <game> hijos directos de la raíz <games> (igual que root.findall('game'))
+def iter_xml_games(stream, prefix):
+    root = None
+    depth = 0
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 1 and element.tag == 'game':
+            yield game_data_from_xml(element, prefix)
+            # Liberar el juego ya procesado (y la referencia que guarda la raíz):
+            element.clear()
+            root.clear()
+
+
+# Lector en streaming de un array JSON (FreeToGame / MMOBomb) -> genera los elementos uno a uno
+# -> lee el flujo de bytes por bloques y decodifica cada elemento con JSONDecoder.raw_decode
+#    => solo hay en memoria el bloque actual y el elemento en curso (no el array completo)
+# reader.offset -> byte del flujo justo después del último elemento generado
+#    => JsonArrayReader(stream, offset=reader.offset) continúa desde ahí tras un fallo a mitad del fichero
+# reader.peak_buffer -> tamaño máximo (caracteres) que ha llegado a tener el buffer de lectura
+class JsonArrayReader:
+
+    def __init__(self, stream, offset=0, chunk_size=JSON_CHUNK_SIZE, max_object_size=JSON_MAX_OBJECT_SIZE):
+        self.stream = stream
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.max_object_size = max_object_size
+        self.peak_buffer = 0
+
+    # Saltar hasta el byte offset (reanudar) -> seek si el flujo lo permite, si no leer y descartar
+    def skip_to_offset(self):
+        if self.stream.seekable():
+            self.stream.seek(self.offset)
+            return
+        remaining = self.offset
+        while remaining:
+            chunk = self.stream.read(min(remaining, self.chunk_size))
+            if not chunk:
+                raise ValueError(f"JSON stream ended before the resume offset {self.offset}")
+            remaining -= len(chunk)
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        # Decodificador UTF-8 incremental -> un carácter multibyte puede quedar partido entre dos bloques
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+
+        if self.offset:
+            self.skip_to_offset()
+        # Al reanudar ya estamos dentro del array (después de un elemento):
+        started = self.offset > 0
+
+        text = ''       # Texto leído (bloque actual)
+        base = 0        # Posición de text que corresponde al byte self.offset
+        pos = 0         # Posición actual dentro de text
+        eof = False
+
+        while True:
+            # Saltar separadores entre elementos:
+            pos = JSON_SEPARATORS.match(text, pos).end()
+
+            if pos < len(text):
+                char = text[pos]
+                if not started:
+                    if char != '[':
+                        raise ValueError("The JSON document is not an array")
+                    started = True
+                    pos += 1
+                    continue
+
+                if char == ']':
+                    # Fin del array:
+                    self.offset += len(text[base:pos + 1].encode('utf-8'))
+                    return
+
+                try:
+                    element, end = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    # Elemento incompleto -> leer más (salvo fin de fichero o elemento demasiado grande)
+                    if eof:
+                        raise ValueError(f"Invalid or truncated JSON array after byte {self.offset}")
+                    if len(text) - pos > self.max_object_size:
+                        raise ValueError(f"JSON element larger than {self.max_object_size} chars "
+                                         f"after byte {self.offset}")
+                else:
+                    # Un elemento que acaba justo al final del bloque puede estar incompleto (ej: número)
+                    if end < len(text) or eof:
+                        self.offset += len(text[base:end].encode('utf-8'))
+                        base = pos = end
+                        yield element
+                        continue
+
+            elif eof:
+                raise ValueError(f"Truncated JSON array after byte {self.offset}")
+
+            # Leer el siguiente bloque (descartando lo ya consumido):
+            chunk = self.stream.read(self.chunk_size)
+            eof = not chunk
+            text = text[base:] + utf8.decode(chunk, final=eof)
+            pos -= base
+            base = 0
+            self.peak_buffer = max(self.peak_buffer, len(text))
+
+
+# Objeto del JSON (FreeToGame / MMOBomb) -> diccionario de campos de Game
+def game_data_from_json(record, prefix):
+    return {
+        'id': prefix + str(record['id']),
+        'title': record.get('title'),
+        'platform': record.get('platform'),
+        'genre': record.get('genre'),
+        'developer': record.get('developer'),
+        'publisher': record.get('publisher'),
+        'release_date': clean_release_date(record.get('release_date')),
+        'description': record.get('short_description'),
+        # APIs -> distintos campos en el JSON:
+        # freetogame_profile_url -> FreeToGame | profile_url -> MMOBomb
+        'freetogame_profile_url': record.get('freetogame_profile_url') or record.get('profile_url'),
+        'game_url': record.get('game_url'),
+        'thumbnail': record.get('thumbnail'),
+    }
+
+
+# Recorrer en streaming los juegos de una fuente según su formato ('XML' o 'JSON') -> solo parseo, sin escrituras
+def iter_source(formato, stream, prefix):
+    if formato == 'XML':
+        return iter_xml_games(stream, prefix)
+
+    elif formato == 'JSON':
+        return (game_data_from_json(record, prefix) for record in JsonArrayReader(stream))
+
+    raise ValueError(f"Formato de datos NO reconocido o NO compatible: {formato}")
+
+
+# Pico de memoria residente (RSS) del proceso en MB -> None si no está disponible (Windows)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux -> KB | macOS -> bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Estadísticas de una ejecución de ingesta:
+class IngestStats:
+
+    def __init__(self, inserted=0, updated=0, skipped=0, stale=0, aliased=0):
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped
+        self.stale = stale
+        self.aliased = aliased      # Nuevos alias (duplicados de otra fuente) guardados
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    # Registros procesados en total:
+    @property
+    def records(self):
+        return self.inserted + self.updated + self.skipped
+
+    # Registros procesados por segundo:
+    @property
+    def rate(self):
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def __str__(self):
+        return (f"{self.inserted} inserted, {self.updated} updated, {self.skipped} skipped "
+                f"({self.aliased} new aliases), {self.stale} stale in {self.elapsed:.2f}s ({self.rate:.0f} records/s)")
+
+
+# Escritor por lotes de juegos:
+# -> writer.add(game_data) por cada registro de la fuente y writer.flush() al final
+# Juego que ya existe por id:
+#   - mismo hash -> se omite (sin escrituras)
+#   - hash distinto -> se actualizan SOLO los campos que han cambiado (bulk_update agrupado por campos)
+# Juego nuevo con un título normalizado que ya existe (otra fuente) -> se omite y se guarda como alias
+# checkpoint -> función checkpoint(stats) llamada después de confirmar cada lote (ver ingest_games)
+class GameBatchWriter:
+
+    def __init__(self, batch_size=None, checkpoint=None):
+        self.batch_size = batch_size or default_batch_size()
+        self.checkpoint = checkpoint
+        self.stats = IngestStats()
+        self.load()
+
+        # Ids recibidos de las fuentes en esta ejecución (para detectar los eliminados en origen):
+        self.seen_ids = set()
+
+        # Lotes pendientes de escribir:
+        self.to_create = []
+        self.to_update = []
+        self.to_alias = []
+
+    # Claves y hashes existentes en la base de datos -> una consulta para los juegos y otra para los alias
+    def load(self):
+        self.hashes = {}                # id -> source_hash
+        self.title_keys = {}            # título normalizado -> id del juego
+        self.stale_ids = set()          # Juegos ya marcados como obsoletos
+        rows = Game.objects.values_list('id', 'title_key', 'source_hash', 'is_stale')
+        for game_id, title_key, game_hash, is_stale in rows:
+            self.hashes[game_id] = game_hash
+            self.title_keys.setdefault(title_key, game_id)
+            if is_stale:
+                self.stale_ids.add(game_id)
+
+        # Alias ya guardados:
+        self.alias_ids = set(GameAlias.objects.values_list('alias_id', flat=True))
+
+    # Lote deshecho (rollback) -> descartar lo pendiente y volver a cargar las claves desde la BD
+    # -> hashes, title_keys y alias_ids ya incluían los juegos del lote que NO se han guardado
+    #    (si no, otra fuente crearía alias a juegos inexistentes u omitiría juegos como "sin cambios")
+    # seen_ids conserva los ids del lote -> solo afectan a mark_stale de esa fuente, que no se ejecuta tras un error
+    def rollback(self):
+        self.to_create = []
+        self.to_update = []
+        self.to_alias = []
+        self.load()
+
+    def add(self, game_data):
+        game_id = game_data['id']
+        game_hash = source_hash(game_data)
+        title_key = normalize_title(game_data['title'])
+        self.seen_ids.add(game_id)
+
+        if game_id in self.hashes:
+            # Ya existe por id -> actualizar solo si ha cambiado en la fuente:
+            if self.hashes[game_id] == game_hash:
+                self.stats.skipped += 1
+            else:
+                self.to_update.append(Game(source_hash=game_hash, title_key=title_key, **game_data))
+                self.hashes[game_id] = game_hash
+                self.title_keys.setdefault(title_key, game_id)
+
+        elif title_key in self.title_keys:
+            # Mismo título normalizado con otro id (otra fuente) -> NO se duplica, se guarda el alias
+            self.stats.skipped += 1
+            if game_id not in self.alias_ids:
+                self.to_alias.append(GameAlias(alias_id=game_id, game_id=self.title_keys[title_key],
+                                               title=game_data['title']))
+                self.alias_ids.add(game_id)
+
+        else:
+            self.to_create.append(Game(source_hash=game_hash, title_key=title_key, **game_data))
+            # Registrar las claves para detectar duplicados dentro de la misma fuente:
+            self.hashes[game_id] = game_hash
+            self.title_keys[title_key] = game_id
+
+        if len(self.to_create) + len(self.to_update) + len(self.to_alias) >= self.batch_size:
+            self.flush()
+
+    # Escribir los lotes pendientes en la base de datos:
+    def flush(self):
+        if self.checkpoint is None:
+            self.write()
+        else:
+            # Cada lote en su propia transacción -> confirmado antes de avisar del checkpoint
+            with transaction.atomic():
+                self.write()
+            self.checkpoint(self.stats)
+
+    def write(self):
+        # Juegos nuevos o cambiados -> nueva versión del catálogo y de los recuentos de los filtros
+        # (páginas cacheadas y facets.py, games/versions.py) -> en la misma transacción que las escrituras
+        if self.to_create or self.to_update:
+            bump_ingest_versions()
+
+        if self.to_create:
+            Game.objects.bulk_create(self.to_create, batch_size=self.batch_size)
+            # bulk_create no lanza señales -> juegos nuevos al índice de búsqueda (search.py)
+            index_games(self.to_create, new=True)
+            self.stats.inserted += len(self.to_create)
+            self.to_create = []
+
+        if self.to_update:
+            self.write_updates()
+            self.to_update = []
+
+        # Alias después de los juegos -> el juego al que apuntan ya está guardado
+        if self.to_alias:
+            GameAlias.objects.bulk_create(self.to_alias, batch_size=self.batch_size)
+            self.stats.aliased += len(self.to_alias)
+            self.to_alias = []
+
+    # Actualizar los juegos cambiados -> solo los campos distintos de los guardados
+    # (una consulta para leer los valores actuales + un bulk_update por cada combinación de campos)
+    def write_updates(self):
+        current = Game.objects.only(*SOURCE_FIELDS).in_bulk([game.id for game in self.to_update])
+
+        groups = {}
+        for game in self.to_update:
+            stored = current[game.id]
+            changed = [field for field in SOURCE_FIELDS if getattr(game, field) != getattr(stored, field)]
+            if changed:
+                self.stats.updated += 1
+            else:
+                # Solo cambia el hash (ej: juego guardado antes de existir source_hash)
+                self.stats.skipped += 1
+            groups.setdefault(tuple(changed), []).append(game)
+
+        for changed, games in groups.items():
+            fields = list(changed) + ['source_hash']
+            # Título cambiado -> también su clave normalizada
+            if 'title' in changed:
+                fields.append('title_key')
+            # Miniatura cambiada -> se vuelve a descargar en la siguiente sincronización (thumbnails.py)
+            if 'thumbnail' in changed:
+                fields += ['thumbnail_hash', 'thumbnail_checked_at']
+            Game.objects.bulk_update(games, fields, batch_size=self.batch_size)
+            # Campos de la búsqueda cambiados (texto o filtros) -> volver a indexarlos (search.py)
+            # (los obsoletos no están en el índice -> entran si mark_stale les quita la marca)
+            if set(changed) & set(SEARCH_COLUMNS):
+                index_games([game for game in games if game.id not in self.stale_ids])
+
+    # Marcar como obsoletos los juegos de una fuente (ids con ese prefijo) que no han llegado en esta ejecución
+    # -> y quitar la marca a los que vuelven a aparecer
+    # ¡¡Solo tras recorrer la fuente COMPLETA!! (si no, se marcarían juegos que aún no se han leído)
+    def mark_stale(self, prefix):
+        stale = [game_id for game_id in self.hashes
+                 if game_id.startswith(prefix) and game_id not in self.seen_ids and game_id not in self.stale_ids]
+        revived = [game_id for game_id in self.stale_ids if game_id.startswith(prefix) and game_id in self.seen_ids]
+
+        for game_ids, is_stale in ((stale, True), (revived, False)):
+            for start in range(0, len(game_ids), self.batch_size):
+                Game.objects.filter(id__in=game_ids[start:start + self.batch_size]).update(is_stale=is_stale)
+
+        # update() no lanza señales -> índice de búsqueda (search.py) y versiones de la caché
+        # (listado, recuentos de los filtros y sugerencias: los obsoletos no salen)
+        if stale or revived:
+            remove_games(stale)
+            for start in range(0, len(revived), self.batch_size):
+                index_games(Game.objects.filter(id__in=revived[start:start + self.batch_size])
+                            .only('id', *SEARCH_COLUMNS, 'is_stale'))
+            bump_stale_versions()
+
+        self.stale_ids.update(stale)
+        self.stale_ids.difference_update(revived)
+        self.stats.stale += len(stale)
+
+
+# Guardar en la base de datos un iterable de diccionarios de juegos (game_data_from_xml / game_data_from_json)
+# -> una sola transacción para toda la ejecución -> devuelve IngestStats
+# checkpoint -> modo reanudable: cada lote se confirma en su propia transacción y después se llama
+#    a checkpoint(stats) -> el llamante guarda hasta dónde ha llegado (ej: JsonArrayReader.offset)
+# prefix -> records es la fuente COMPLETA de ese prefijo -> sus juegos que no aparecen se marcan como obsoletos
+def ingest_games(records, batch_size=None, checkpoint=None, prefix=None):
+    # Modo normal -> una sola transacción | modo reanudable -> una por lote (GameBatchWriter.flush)
+    atomic = transaction.atomic() if checkpoint is None else nullcontext()
+    with atomic:
+        writer = GameBatchWriter(batch_size=batch_size, checkpoint=checkpoint)
+        for game_data in records:
+            writer.add(game_data)
+        writer.flush()
+
+        if prefix is not None:
+            with transaction.atomic():
+                writer.mark_stale(prefix)
+
+    writer.stats.stop()
+    return writer.stats
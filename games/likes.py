@@ -0,0 +1,107 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, F, FilteredRelation, Q
+
+from .models import Comment, Like
+from .ratings import write_transaction
+
+
+# Likes y dislikes de los comentarios con contadores en la fila del comentario (Comment.like_count / dislike_count):
+# - Un voto por usuario y comentario en UNA columna (Like.value: 1 like, -1 dislike, 0 anulado)
+# - toggle_vote suma el cambio del voto (antes -> después) con F() en UN UPDATE
+#   => mostrar los botones de un comentario no cuenta sus likes (antes: dos COUNT por comentario)
+# - Listas de comentarios -> los contadores llegan en la misma consulta que los comentarios (sin consultas extra)
+# - with_like_counts -> recuentos desde Like en la misma consulta (para los contadores que no son de fiar)
+# - Los cambios fuera de toggle_vote (admin, usuarios borrados) -> python manage.py reconcile_like_counts
+
+
+# Cambio de los contadores entre dos votos (Like.value) -> (likes, dislikes)
+# ej: like -> dislike => (-1, 1); sin voto -> like => (1, 0)
+def like_deltas(before, after):
+    return (int(after == Like.LIKE) - int(before == Like.LIKE),
+            int(after == Like.DISLIKE) - int(before == Like.DISLIKE))
+
+
+# Voto de un usuario en un comentario -> Like.value (NO_VOTE si no tiene fila: mirar no crea filas)
+def user_vote(comment, user):
+    return Like.objects.filter(comment=comment, user=user).values_list('value', flat=True).first() or Like.NO_VOTE
+
+
+# Like / dislike de un usuario (value = Like.LIKE o Like.DISLIKE) -> mismo voto otra vez lo anula -> (nuevo voto)
+# Bloqueo de escritura desde el principio (ratings.write_transaction) -> nadie escribe entre leer el voto y guardarlo
+# El voto se guarda con UN upsert (INSERT ... ON CONFLICT DO UPDATE) + el cambio de los contadores (F())
+def toggle_vote(comment, user, value):
+    with write_transaction():
+        before = user_vote(comment, user)
+        after = Like.NO_VOTE if before == value else value
+        Like.objects.bulk_create([Like(comment=comment, user=user, value=after)], update_conflicts=True,
+                                 unique_fields=['comment', 'user'], update_fields=['value', 'timestamp'])
+        add_like_counts(comment, *like_deltas(before, after))
+    return after
+
+
+# Guardar varios votos a la vez -> {(comment_id, user_id): voto} (votos acumulados de vote_buffer.py)
+# UNA transacción: una lectura de los votos actuales + UN upsert de los que cambian + un UPDATE con F() por comentario
+# Los cambios de los contadores salen de los votos leídos aquí (no de los del momento del clic) -> siempre exactos
+# Comentarios o usuarios borrados mientras tanto -> sus votos se descartan -> (votos escritos)
+def write_votes(votes):
+    comment_ids = {comment_id for comment_id, _user_id in votes}
+    user_ids = {user_id for _comment_id, user_id in votes}
+    with write_transaction():
+        comment_ids &= set(Comment.objects.filter(pk__in=comment_ids).values_list('pk', flat=True))
+        user_ids &= set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        current = {(comment_id, user_id): value for comment_id, user_id, value in Like.objects.filter(
+            comment_id__in=comment_ids, user_id__in=user_ids).values_list('comment_id', 'user_id', 'value')}
+
+        changed = []
+        deltas = {}
+        for (comment_id, user_id), value in votes.items():
+            before = current.get((comment_id, user_id), Like.NO_VOTE)
+            if comment_id not in comment_ids or user_id not in user_ids or before == value:
+                continue
+            changed.append(Like(comment_id=comment_id, user_id=user_id, value=value))
+            like_delta, dislike_delta = like_deltas(before, value)
+            likes, dislikes = deltas.get(comment_id, (0, 0))
+            deltas[comment_id] = (likes + like_delta, dislikes + dislike_delta)
+
+        Like.objects.bulk_create(changed, update_conflicts=True, unique_fields=['comment', 'user'],
+                                 update_fields=['value', 'timestamp'])
+        for comment_id, (like_delta, dislike_delta) in deltas.items():
+            if like_delta or dislike_delta:
+                Comment.objects.filter(pk=comment_id).update(like_count=F('like_count') + like_delta,
+                                                             dislike_count=F('dislike_count') + dislike_delta)
+    return len(changed)
+
+
+# Sumar el cambio de un voto a su comentario -> UPDATE con F() (sin leer la fila ni perder escrituras a la vez)
+# -> dentro de la transacción del voto; el comentario se vuelve a leer con los contadores actuales
+def add_like_counts(comment, like_delta, dislike_delta):
+    if not like_delta and not dislike_delta:
+        return
+    Comment.objects.filter(pk=comment.pk).update(like_count=F('like_count') + like_delta,
+                                                 dislike_count=F('dislike_count') + dislike_delta)
+    comment.refresh_from_db(fields=['like_count', 'dislike_count'])
+
+
+# Comentarios con sus recuentos desde Like -> counted_likes / counted_dislikes
+# (LEFT JOIN agrupado: cada comentario se cuenta con el índice like_comment_vote_idx, sin leer las filas de Like)
+# Solo los votos (FilteredRelation: value IN (-1, 1) en el JOIN) -> misma condición que el índice parcial
+def with_like_counts(comments):
+    votes = FilteredRelation('likes', condition=Q(likes__value__in=[Like.DISLIKE, Like.LIKE]))
+    return comments.annotate(votes=votes).annotate(
+        counted_likes=Count('votes', filter=Q(votes__value=Like.LIKE)),
+        counted_dislikes=Count('votes', filter=Q(votes__value=Like.DISLIKE)))
+
+
+# Volver a calcular los contadores de todos los comentarios desde Like -> (comentarios cambiados)
+# UNA consulta (solo los comentarios con contadores distintos) + bulk_update por lotes
+def reconcile_like_counts(batch_size=1000):
+    comments = with_like_counts(Comment.objects.only('id', 'like_count', 'dislike_count')).filter(
+        ~Q(like_count=F('counted_likes')) | ~Q(dislike_count=F('counted_dislikes'))).order_by()
+
+    changed = []
+    for comment in comments.iterator():
+        comment.like_count, comment.dislike_count = comment.counted_likes, comment.counted_dislikes
+        changed.append(comment)
+
+    Comment.objects.bulk_update(changed, ['like_count', 'dislike_count'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.ingest import (JsonArrayReader, game_data_from_json, game_data_from_xml, ingest_games, iter_xml_games,
+                          peak_rss_mb)
+from games.management.commands.benchmark_ingest import synthetic_record
+
+
+# Campos de cada <game> en el orden de listado1.xml:
+XML_FIELDS = ['id', 'title', 'thumbnail', 'short_description', 'game_url', 'genre', 'platform',
+              'publisher', 'developer', 'release_date', 'freetogame_profile_url']
+
+
+# Generar un fichero XML con el formato de listado1.xml de aproximadamente size_mb MB
+# -> devuelve el número de juegos escritos
+def write_synthetic_xml(path, size_mb):
+    target = size_mb * 1024 * 1024
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<games>\n')
+        while f.tell() < target:
+            record = synthetic_record(count)
+            f.write('  <game>\n')
+            for field in XML_FIELDS:
+                f.write(f'    <{field}>{escape(str(record[field]))}</{field}>\n')
+            f.write('  </game>\n')
+            count += 1
+        f.write('</games>\n')
+    return count
+
+
+# Generar un fichero JSON con el formato de la API de FreeToGame con entries juegos
+def write_synthetic_json(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i in range(entries):
+            if i:
+                f.write(',\n')
+            json.dump(synthetic_record(i), f)
+        f.write(']\n')
+    return entries
+
+
+# Camino anterior: árbol completo del XML en memoria (ET.fromstring + findall)
+def dom_ingest(path, prefix, batch_size):
+    with open(path, 'rb') as f:
+        root = ET.fromstring(f.read())
+    return ingest_games((game_data_from_xml(game, prefix) for game in root.findall('game')),
+                        batch_size=batch_size)
+
+
+# Camino en streaming: iterparse + escrituras por lotes
+def stream_ingest(path, prefix, batch_size):
+    with open(path, 'rb') as f:
+        return ingest_games(iter_xml_games(f, prefix), batch_size=batch_size)
+
+
+# Camino anterior del JSON: respuesta completa en memoria (json.loads)
+def json_loads_ingest(path, prefix, batch_size):
+    with open(path, 'rb') as f:
+        records = json.loads(f.read())
+    return ingest_games((game_data_from_json(record, prefix) for record in records),
+                        batch_size=batch_size)
+
+
+# Camino en streaming del JSON: JsonArrayReader + escrituras por lotes
+def json_stream_ingest(path, prefix, batch_size):
+    with open(path, 'rb') as f:
+        return ingest_games((game_data_from_json(record, prefix) for record in JsonArrayReader(f)),
+                            batch_size=batch_size)
+
+
+# Caminos de cada formato: (streaming, carga completa en memoria)
+PATHS = {
+    'xml': (('iterparse', stream_ingest), ('dom', dom_ingest)),
+    'json': (('stream', json_stream_ingest), ('json.loads', json_loads_ingest)),
+}
+
+
+# python manage.py benchmark_feeds -> Memoria y rendimiento de la ingesta en streaming de feeds grandes
+# Cada camino se ejecuta dentro de una transacción que se deshace al final -> la base de datos no cambia
+# Memoria -> pico de memoria residente (RSS) del proceso tras cada camino
+# -> el streaming se ejecuta primero: el pico que deja el camino anterior (DOM / json.loads) no le afecta
+class Command(BaseCommand):
+    help = "Benchmark memory and throughput of the streaming feed ingestion on a generated large feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(PATHS), default='xml',
+                            help="Feed format: xml (listado1) or json (FreeToGame / MMOBomb) (default: xml)")
+        parser.add_argument('--size-mb', type=int, default=300,
+                            help="Approximate size of the generated XML feed in MB (default: 300)")
+        parser.add_argument('--entries', type=int, default=1000000,
+                            help="Number of games of the generated JSON feed (default: 1000000)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Batch size of the writes (default: GAME_INGEST_BATCH_SIZE)")
+        parser.add_argument('--compare-full', action='store_true',
+                            help="Also run the previous whole-document path (needs several GB of RAM)")
+
+    def handle(self, *args, **options):
+        feed_format = options['format']
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, f'listado.{feed_format}')
+            if feed_format == 'xml':
+                count = write_synthetic_xml(path, options['size_mb'])
+            else:
+                count = write_synthetic_json(path, options['entries'])
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            self.stdout.write(f"Synthetic {feed_format} feed: {count} games, {size_mb:.0f} MB")
+            self.stdout.write(f"Baseline peak RSS: {self.format_rss(peak_rss_mb())}")
+
+            stream_path, full_path = PATHS[feed_format]
+            paths = [stream_path]
+            if options['compare_full']:
+                paths.append(full_path)
+
+            for name, run in paths:
+                self.run_path(name, run, path, count, options['batch_size'])
+
+    def run_path(self, name, run, path, count, batch_size):
+        with transaction.atomic():
+            started = time.perf_counter()
+            stats = run(path, 'BENCH-', batch_size)
+            elapsed = time.perf_counter() - started
+            # Deshacer los juegos sintéticos:
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{name:>10}: {elapsed:8.2f}s  {count / elapsed:10.0f} games/s  "
+                          f"peak RSS {self.format_rss(peak_rss_mb())}  ({stats.inserted} inserted)")
+
+    def format_rss(self, rss):
+        return 'n/a' if rss is None else f"{rss:.0f} MB"
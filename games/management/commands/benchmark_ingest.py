@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.ingest import game_data_from_json, ingest_games
+from games.models import Game
+
+
+# Registro sintético con el formato de la API de FreeToGame:
+# -> 1 de cada 10 registros repite el título de otro (juego duplicado entre fuentes)
+def synthetic_record(i):
+    title_id = i - 1 if i % 10 == 9 else i
+    return {
+        'id': i,
+        'title': f"Synthetic Game {title_id}",
+        'thumbnail': f"https://example.com/g/{i}/thumbnail.jpg",
+        'short_description': f"Synthetic description of the game number {i}.",
+        'game_url': f"https://example.com/open/{i}",
+        'genre': ('Shooter', 'MMORPG', 'Strategy', 'MOBA', 'Card Game')[i % 5],
+        'platform': ('PC (Windows)', 'Web Browser', 'PC (Windows), Web Browser')[i % 3],
+        'publisher': f"Publisher {i % 250}",
+        'developer': f"Developer {i % 400}",
+        'release_date': '2020-02-30' if i % 50 == 0 else '2020-01-01',
+        'freetogame_profile_url': f"https://example.com/g/{i}",
+    }
+
+
+# Camino anterior (por filas): 2 exists() + 1 create() por registro
+def legacy_ingest(records):
+    for game_data in records:
+        if (not Game.objects.filter(id=game_data['id']).exists()
+                and not Game.objects.filter(title=game_data['title']).exists()):
+            Game.objects.create(**game_data)
+
+
+# python manage.py benchmark_ingest -> Comparar la ingesta por lotes con el camino anterior por filas
+# - bulk -> dentro de una transacción que se deshace al final
+# - legacy (autocommit) -> como load_games: cada fila en su propia transacción (la comparación de la petición)
+#   -> los juegos sintéticos se borran al final (fuera del tiempo medido)
+# - legacy (one transaction) -> el mismo camino por filas dentro de una transacción (solo como referencia)
+# => la base de datos no cambia
+class Command(BaseCommand):
+    help = "Benchmark the bulk ingestion engine against the legacy per-row path on a synthetic feed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000,
+                            help="Number of synthetic records in the feed (default: 100000)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Batch size of the bulk engine (default: GAME_INGEST_BATCH_SIZE)")
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help="Only run the bulk engine")
+
+    def handle(self, *args, **options):
+        count = options['records']
+        records = [game_data_from_json(synthetic_record(i), 'BENCH-') for i in range(count)]
+        self.stdout.write(f"Synthetic feed: {count} records")
+
+        # (nombre, camino, dentro de una transacción que se deshace)
+        paths = [('bulk', lambda: ingest_games(records, batch_size=options['batch_size']), True)]
+        if not options['skip_legacy']:
+            paths.append(('legacy (autocommit)', lambda: legacy_ingest(records), False))
+            paths.append(('legacy (one transaction)', lambda: legacy_ingest(records), True))
+
+        results = {}
+        for name, run, atomic in paths:
+            if atomic:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    # Deshacer los juegos sintéticos:
+                    transaction.set_rollback(True)
+            else:
+                try:
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                finally:
+                    # Borrar los juegos sintéticos (ya guardados fila a fila):
+                    Game.objects.filter(id__in=[game_data['id'] for game_data in records]).delete()
+
+            results[name] = elapsed
+            self.stdout.write(f"{name:>24}: {elapsed:8.2f}s  {count / elapsed:10.0f} records/s")
+
+        for name in ('legacy (autocommit)', 'legacy (one transaction)'):
+            if name in results:
+                self.stdout.write(self.style.SUCCESS(f"Speedup vs {name}: {results[name] / results['bulk']:.1f}x"))
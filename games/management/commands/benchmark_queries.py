@@ -0,0 +1,200 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from games.facets import FACETS
+from games.models import Comment, Game, Like, normalize_title
+from games.pagination import COMMENT_ORDERING, GAME_ORDERING, after_cursor
+from games.ratings import average, rank_score
+from games.management.commands.benchmark_ingest import synthetic_record
+
+
+# Filas de cada tabla por lote de inserción:
+INSERT_BATCH = 50000
+
+# Columnas de las filas de game_rows (también las usa benchmark_search)
+GAME_COLUMNS = ['id', 'title', 'title_key', 'platform', 'genre', 'publisher', 'developer', 'release_date',
+                'description', 'average_rating', 'vote_count', 'rating_sum', 'rank_score', 'freetogame_profile_url',
+                'game_url', 'thumbnail', 'thumbnail_hash', 'thumbnail_checked_at', 'source_hash', 'is_stale']
+
+
+# SQL de creación de las tablas de los modelos (sin ejecutarlo) -> (tablas, índices)
+# -> los índices se crean después de cargar los datos (carga mucho más rápida)
+def schema_sql(models):
+    with connection.schema_editor(collect_sql=True) as editor:
+        for model in models:
+            editor.create_model(model)
+    statements = [sql.rstrip(';') for sql in editor.collected_sql]
+    tables = [sql for sql in statements if not sql.startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX'))]
+    indexes = [sql for sql in statements if sql.startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX'))]
+    return tables, indexes
+
+
+# Consulta del ORM -> (sql, params) para el módulo sqlite3 (mismo SQL que ejecutan las vistas)
+def raw_query(queryset):
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    return sql.replace('%s', '?').replace('%%', '%'), list(params)
+
+
+# Juegos sintéticos -> mismo reparto de plataformas, géneros y publicadores que benchmark_ingest
+# Votos al azar -> contadores, media y rank_score coherentes (como los deja ratings.add_rating)
+def game_rows(count):
+    rng = random.Random(1)
+    for i in range(count):
+        record = synthetic_record(i)
+        vote_count = rng.randint(0, 200)
+        rating_sum = rng.randint(0, 5 * vote_count)
+        yield (f"BENCH-{i}", record['title'], normalize_title(record['title']), record['platform'], record['genre'],
+               record['publisher'], record['developer'], '2020-01-01', record['short_description'],
+               str(average(rating_sum, vote_count)), vote_count, rating_sum, rank_score(rating_sum, vote_count),
+               record['freetogame_profile_url'], record['game_url'], record['thumbnail'], '', None, '', False)
+
+
+# Comentarios sintéticos -> juegos y usuarios al azar, 1 de cada 4 con valoración, fechas crecientes
+def comment_rows(count, games, users):
+    rng = random.Random(2)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        rating = rng.randint(0, 5) if i % 4 == 0 else None
+        timestamp = (start + timedelta(seconds=i * 5)).strftime('%Y-%m-%d %H:%M:%S')
+        yield (f"BENCH-{rng.randrange(games)}", f"user{rng.randrange(users)}", f"Synthetic comment {i}", rating,
+               timestamp, 0, 0)
+
+
+# Likes sintéticos -> comentarios distintos (restricción comment + user), 3 de cada 4 son like
+def like_rows(count, comments, users):
+    rng = random.Random(3)
+    step = max(comments // max(count, 1), 1)
+    now = '2025-01-01 00:00:00'
+    for i in range(min(count, comments)):
+        yield (i * step + 1, rng.randint(1, users), Like.LIKE if rng.random() < 0.75 else Like.DISLIKE, now)
+
+
+# python manage.py benchmark_queries -> Tiempos de las consultas de las vistas con y sin los índices compuestos
+# Los datos sintéticos se cargan en una base de datos SQLite temporal -> la base de datos del proyecto no cambia
+# Cada consulta se ejecuta --repeat veces con los índices de los modelos (Meta.indexes) y otras tantas
+# después de eliminarlos -> mediana en ms + plan de la consulta (EXPLAIN QUERY PLAN) con los índices
+class Command(BaseCommand):
+    help = "Benchmark the hot view queries with and without the composite indexes on a synthetic dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100000,
+                            help="Number of synthetic games (default: 100000)")
+        parser.add_argument('--comments', type=int, default=5000000,
+                            help="Number of synthetic comments (default: 5000000)")
+        parser.add_argument('--likes', type=int, default=1000000,
+                            help="Number of synthetic likes (default: 1000000)")
+        parser.add_argument('--users', type=int, default=10000,
+                            help="Number of distinct comment authors (default: 10000)")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Runs of each query (default: 5)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("benchmark_queries only supports SQLite")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = sqlite3.connect(os.path.join(tmp_dir, 'benchmark.sqlite3'))
+            db.execute('PRAGMA journal_mode = OFF')
+            db.execute('PRAGMA synchronous = OFF')
+            try:
+                self.load(db, options)
+                queries = self.queries(db, options)
+
+                results = {name: [self.run(db, sql, params, options['repeat'])] for name, sql, params in queries}
+                plans = {name: self.plan(db, sql, params) for name, sql, params in queries}
+                for model in (Game, Comment, Like):
+                    for index in model._meta.indexes:
+                        db.execute(f'DROP INDEX "{index.name}"')
+                for name, sql, params in queries:
+                    results[name].append(self.run(db, sql, params, options['repeat']))
+            finally:
+                db.close()
+
+        self.stdout.write(f"{'query':<28}{'without':>12}{'with':>12}  plan (with indexes)")
+        for name, (with_indexes, without_indexes) in results.items():
+            self.stdout.write(f"{name:<28}{without_indexes:>10.2f}ms{with_indexes:>10.2f}ms  {plans[name]}")
+
+    def load(self, db, options):
+        tables, indexes = schema_sql([Game, Comment, Like])
+        for sql in tables:
+            db.execute(sql)
+
+        started = time.perf_counter()
+        self.insert(db, Game, game_rows(options['games']), GAME_COLUMNS)
+        self.insert(db, Comment, comment_rows(options['comments'], options['games'], options['users']),
+                    ['game_id', 'user', 'text', 'rating', 'timestamp', 'like_count', 'dislike_count'])
+        self.insert(db, Like, like_rows(options['likes'], options['comments'], options['users']),
+                    ['comment_id', 'user_id', 'value', 'timestamp'])
+        # Contadores de likes de los comentarios (como la migración 0028) -> un like como mucho por comentario
+        db.execute('UPDATE games_comment SET like_count = games_like.value = 1, dislike_count = games_like.value = -1 '
+                   'FROM games_like WHERE games_like.comment_id = games_comment.id')
+        for sql in indexes:
+            db.execute(sql)
+        db.commit()
+        self.stdout.write(f"Synthetic dataset: {options['games']} games, {options['comments']} comments, "
+                          f"{min(options['likes'], options['comments'])} likes "
+                          f"(loaded in {time.perf_counter() - started:.0f}s)")
+
+    def insert(self, db, model, rows, columns):
+        names = ', '.join(connection.ops.quote_name(column) for column in columns)
+        sql = (f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({names}) '
+               f'VALUES ({", ".join("?" for _column in columns)})')
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == INSERT_BATCH:
+                db.executemany(sql, batch)
+                batch = []
+        db.executemany(sql, batch)
+
+    # Consultas de las vistas (mismos filtros y ordenación que game_views.py y context_processors.py)
+    def queries(self, db, options):
+        middle = db.execute('SELECT rank_score, id FROM games_game ORDER BY rank_score DESC, id '
+                            'LIMIT 1 OFFSET ?', [options['games'] // 2]).fetchone()
+        game = 'BENCH-0'
+        user = 'user0'
+        comment = db.execute('SELECT comment_id FROM games_like LIMIT 1').fetchone()
+        comment = comment[0] if comment else 1
+
+        games = Game.objects.all()
+        # (nombre, consulta, es un recuento -> SELECT COUNT(*) de la consulta)
+        querysets = [
+            ('main page 1', games.order_by(*GAME_ORDERING)[:31], False),
+            ('main deep page (cursor)', games.filter(after_cursor(GAME_ORDERING, middle))
+             .order_by(*GAME_ORDERING)[:31], False),
+            ('main genre', games.filter(genre='Strategy').order_by(*GAME_ORDERING)[:31], False),
+            ('main platform + genre', games.filter(platform='Web Browser', genre='MOBA')
+             .order_by(*GAME_ORDERING)[:31], False),
+            ('main publisher', games.filter(publisher='Publisher 7').order_by(*GAME_ORDERING)[:31], False),
+            ('filter combinations', games.values_list(*FACETS).annotate(games=Count('*')).order_by(), False),
+            ('game_detail comments', Comment.objects.filter(game=game).order_by(*COMMENT_ORDERING)[:6], False),
+            ('rated_games user comments', Comment.objects.filter(user=user, rating__gte=0).values('game'), False),
+            ('comment like of user', Like.objects.filter(comment=comment, user_id=1), False),
+        ]
+        queries = []
+        for name, queryset, count in querysets:
+            sql, params = raw_query(queryset)
+            if count:
+                sql = f'SELECT COUNT(*) FROM ({sql})'
+            queries.append((name, sql, params))
+        return queries
+
+    def run(self, db, sql, params, repeat):
+        timings = []
+        for _run in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def plan(self, db, sql, params):
+        return ' | '.join(row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', params))
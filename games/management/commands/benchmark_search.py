@@ -0,0 +1,151 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from games.models import Game, normalize_title
+from games.pagination import GAME_ORDERING
+from games.search import common_sql, create_table_sql, facet_token, insert_sql, rank_limit, search_rowid, search_sql
+from games.suggest import SuggestIndex
+from games.management.commands.benchmark_queries import GAME_COLUMNS, game_rows, raw_query, schema_sql
+
+
+# Palabras de las descripciones sintéticas -> unas pocas muy frecuentes y muchas raras (como en las reales)
+COMMON_WORDS = ['free', 'to', 'play', 'game', 'online', 'multiplayer', 'shooter', 'fantasy', 'mmorpg', 'strategy',
+                'battle', 'players', 'world', 'action', 'card', 'sci', 'fi', 'space', 'team', 'pvp', 'moba', 'racing',
+                'survival', 'open', 'anime', 'heroes', 'arena', 'build', 'war', 'magic']
+RARE_WORDS = 5000
+DESCRIPTION_WORDS = 30
+
+# Búsquedas medidas -> (nombre, texto, filtros)
+SEARCHES = [
+    ('common word', 'free', {}),
+    ('one word', 'shooter', {}),
+    ('two words', 'fantasy shooter', {}),
+    ('prefix', 'sur', {}),
+    ('rare word', 'term1234', {}),
+    ('word + genre', 'shooter', {'genre': 'Strategy'}),
+    ('word + platform + genre', 'space', {'platform': 'Web Browser', 'genre': 'MOBA'}),
+]
+
+
+# Descripción sintética -> DESCRIPTION_WORDS palabras: la mitad de COMMON_WORDS (más frecuentes las primeras)
+# y la otra mitad de RARE_WORDS palabras raras
+def synthetic_description(rng):
+    words = []
+    for _word in range(DESCRIPTION_WORDS // 2):
+        words.append(COMMON_WORDS[min(int(rng.expovariate(0.15)), len(COMMON_WORDS) - 1)])
+        words.append(f"term{rng.randrange(RARE_WORDS)}")
+    return ' '.join(words).capitalize() + '.'
+
+
+# python manage.py benchmark_search -> Tiempos de la búsqueda FTS5 (games/search.py) frente a icontains
+# y de las sugerencias de títulos (games/suggest.py)
+# Los juegos sintéticos se cargan en una base de datos SQLite temporal -> la base de datos del proyecto no cambia
+# Cada búsqueda se ejecuta --repeat veces -> mediana en ms (primera página de 20 resultados)
+# icontains -> LIKE '%palabra%' en título y descripción, ordenado como la página principal (lo que haría el ORM sin el índice)
+class Command(BaseCommand):
+    help = "Benchmark the FTS5 game search against icontains scans and the title suggestions on a synthetic dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100000,
+                            help="Number of synthetic games (default: 100000)")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Runs of each search (default: 20)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("benchmark_search only supports SQLite")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = sqlite3.connect(os.path.join(tmp_dir, 'benchmark.sqlite3'))
+            db.execute('PRAGMA journal_mode = OFF')
+            db.execute('PRAGMA synchronous = OFF')
+            try:
+                rows = self.load(db, options['games'])
+                self.stdout.write(f"{'search':<28}{'icontains':>12}{'fts5':>12}  matches")
+                for name, text, filters in SEARCHES:
+                    fts = self.run_search(db, text, filters, options['repeat'])
+                    matches = db.execute('SELECT COUNT(*) FROM games_game_search WHERE games_game_search MATCH ?',
+                                         search_sql(text, filters)[1][:1]).fetchone()[0]
+                    if matches > rank_limit():
+                        name += ' *'
+
+                    games = Game.objects.filter(**filters)
+                    for word in text.split():
+                        games = games.filter(title__icontains=word) | games.filter(description__icontains=word)
+                    sql, params = raw_query(games.order_by(*GAME_ORDERING)[:21])
+                    scan = self.run(db, sql, params, options['repeat'])
+                    self.stdout.write(f"{name:<28}{scan:>10.2f}ms{fts:>10.2f}ms  {matches}")
+                self.stdout.write(f"* more than {rank_limit()} matches -> title matches first, without BM25")
+                self.suggest(rows)
+            finally:
+                db.close()
+
+    def load(self, db, count):
+        tables, indexes = schema_sql([Game])
+        for sql in tables + indexes:
+            db.execute(sql)
+        for sql in create_table_sql():
+            db.execute(sql)
+
+        started = time.perf_counter()
+        rng = random.Random(4)
+        rows = [row[:8] + (synthetic_description(rng),) + row[9:] for row in game_rows(count)]
+        db.executemany(f"INSERT INTO games_game ({', '.join(GAME_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' for _column in GAME_COLUMNS)})", rows)
+        # Misma fila que search.search_row -> (rowid, game_id, title, description, platform, genre, publisher)
+        db.executemany(insert_sql().replace('%s', '?'),
+                       [(search_rowid(row[0]), row[0], row[1], row[8], facet_token(row[3]), facet_token(row[4]),
+                         facet_token(row[5])) for row in rows])
+        db.execute("INSERT INTO games_game_search (games_game_search) VALUES ('optimize')")
+        db.commit()
+        self.stdout.write(f"Synthetic dataset: {count} games (loaded and indexed in "
+                          f"{time.perf_counter() - started:.0f}s)")
+        return rows
+
+    # Sugerencias de títulos (games/suggest.py) -> índice en memoria de los mismos juegos
+    # + p50 / p99 de prefijos al azar de los títulos (desde cualquier palabra), como al escribir en el buscador
+    def suggest(self, rows):
+        started = time.perf_counter()
+        index = SuggestIndex([(row[0], row[1], float(row[9]), normalize_title(row[1])) for row in rows], 8)
+        built = (time.perf_counter() - started) * 1000
+
+        rng = random.Random(5)
+        timings = []
+        for _query in range(20000):
+            words = normalize_title(rng.choice(rows)[1]).split(' ')
+            text = ' '.join(words[rng.randrange(len(words)):])
+            text = text[:rng.randint(1, len(text))]
+            started = time.perf_counter()
+            index.suggest(text)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(f"Suggest index: {len(index.keys)} keys built in {built:.0f}ms -> "
+                          f"p50 {timings[len(timings) // 2]:.3f}ms, p99 {timings[int(len(timings) * 0.99)]:.3f}ms")
+
+    # Búsqueda como search.search_games (solo las consultas al índice) -> mediana en ms
+    # Por relevancia y, si no devuelve filas (demasiadas coincidencias), sin BM25
+    def run_search(self, db, text, filters, repeat):
+        timings = []
+        for _run in range(repeat):
+            started = time.perf_counter()
+            sql, params = search_sql(text, filters, limit=21)
+            if not db.execute(sql.replace('%s', '?'), params).fetchall():
+                sql, params = common_sql(text, filters, limit=21)
+                db.execute(sql.replace('%s', '?'), params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run(self, db, sql, params, repeat):
+        timings = []
+        for _run in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
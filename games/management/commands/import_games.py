@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from games.ingest import GameBatchWriter, peak_rss_mb
+from games.sync import BatchQueue, SourceReport, cancel_queues, parse_batches, write_source
+
+
+# Formato de una fuente según su extensión (fichero o URL):
+EXTENSION_FORMATS = {'.xml': 'XML', '.json': 'JSON'}
+
+# Segundos mínimos entre dos líneas de progreso:
+PROGRESS_INTERVAL = 1
+
+
+# Abrir una fuente como flujo de bytes: '-' (stdin), URL (http/https) o ruta de un fichero local
+# -> sin caché ni FeedSyncStatus: la importación no depende de la sincronización
+def open_source(location):
+    if location == '-':
+        # stdin no se cierra al terminar:
+        return nullcontext(sys.stdin.buffer)
+    if urlparse(location).scheme in ('http', 'https'):
+        timeout = getattr(settings, 'GAME_FEED_TIMEOUT', 30)
+        return urllib.request.urlopen(location, timeout=timeout)
+    return open(location, 'rb')
+
+
+# Trabajo de cada hilo: abrir y parsear una fuente -> lotes de juegos a la cola de la fuente
+# -> siempre termina con ('done', None) en la cola, también si hay error (salvo si el escritor ya ha parado)
+def open_and_parse(report, batch_size, batches):
+    try:
+        report.attempts = 1
+        started = time.perf_counter()
+        with open_source(report.feed['url']) as stream:
+            report.fetch_time = time.perf_counter() - started
+            parse_batches(report, stream, batch_size, batches)
+
+    except Exception as e:
+        report.error = e
+
+    finally:
+        batches.done()
+
+
+# python manage.py import_games SOURCE [SOURCE ...] -> Importar juegos sin el proceso web
+# SOURCE -> nombre de una fuente de settings.GAME_FEEDS (ej: freetogame), URL, ruta de un fichero o '-' (stdin)
+# --format / --prefix -> para URLs, ficheros y stdin (el formato se deduce de la extensión .xml / .json)
+# --dry-run -> todo se ejecuta dentro de una transacción que se deshace al final -> la base de datos no cambia
+# --mark-stale -> cada fuente es el catálogo COMPLETO de su prefijo: sus juegos que no aparecen se marcan obsoletos
+#    (sin él -> un fichero parcial o de prueba no toca los demás juegos del prefijo)
+# Igual que sync_games: las fuentes se parsean en paralelo (--workers) y un único escritor guarda los juegos
+# en el orden de los argumentos
+class Command(BaseCommand):
+    help = "Import games from feed names, URLs, local files or stdin (XML or JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+',
+                            help="Feed name from GAME_FEEDS, URL, local file path or '-' for stdin")
+        parser.add_argument('--format', choices=['XML', 'JSON'], type=str.upper,
+                            help="Format of URLs, files and stdin (default: from the extension)")
+        parser.add_argument('--prefix', choices=sorted({feed['prefix'] for feed in settings.GAME_FEEDS}),
+                            help="Id prefix of the games of URLs, files and stdin")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Batch size of the writes (default: GAME_INGEST_BATCH_SIZE)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Sources parsed at the same time (default: GAME_SYNC_WORKERS)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Parse and validate everything, then roll back all the writes")
+        parser.add_argument('--mark-stale', action='store_true',
+                            help="Treat each source as the full catalogue of its prefix and mark the missing "
+                                 "games as stale")
+
+    def handle(self, *args, **options):
+        if options['sources'].count('-') > 1:
+            raise CommandError("stdin ('-') can only be used once")
+        feeds = [self.source_feed(source, options) for source in options['sources']]
+
+        workers = options['workers'] or getattr(settings, 'GAME_SYNC_WORKERS', 4)
+        batch_size = options['batch_size'] or getattr(settings, 'GAME_INGEST_BATCH_SIZE', 500)
+        reports = [SourceReport(feed) for feed in feeds]
+        queues = [BatchQueue() for _report in reports]
+
+        self.started = time.perf_counter()
+        self.last_progress = self.started
+        with transaction.atomic():
+            writer = GameBatchWriter(batch_size=batch_size)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for report, batches in zip(reports, queues):
+                    pool.submit(open_and_parse, report, batch_size, batches)
+                try:
+                    for report, batches in zip(reports, queues):
+                        write_source(writer, report, batches, on_batch=lambda _report: self.progress(reports),
+                                     stale=options['mark_stale'])
+                finally:
+                    # Escritor terminado (o con error) -> ningún hilo sigue esperando en una cola llena
+                    cancel_queues(queues)
+
+            if options['dry_run']:
+                # Deshacer todas las escrituras:
+                transaction.set_rollback(True)
+
+        self.summary(reports, options['dry_run'])
+        if any(report.error is not None for report in reports):
+            raise CommandError("Some sources could not be imported")
+
+    # Fuente de la línea de comandos -> diccionario de fuente como los de GAME_FEEDS
+    def source_feed(self, source, options):
+        for feed in settings.GAME_FEEDS:
+            if feed['name'] == source:
+                # Fuente configurada -> su propio formato y prefijo
+                return feed
+
+        feed_format = options['format']
+        if feed_format is None and source != '-':
+            extension = os.path.splitext(urlparse(source).path)[1].lower()
+            feed_format = EXTENSION_FORMATS.get(extension)
+        if feed_format is None:
+            raise CommandError(f"Cannot infer the format of '{source}', use --format")
+        if options['prefix'] is None:
+            raise CommandError(f"'{source}' is not a configured feed, use --prefix")
+
+        name = 'stdin' if source == '-' else source
+        return {'name': name, 'url': source, 'format': feed_format, 'prefix': options['prefix']}
+
+    # Progreso en vivo (como mucho una línea cada PROGRESS_INTERVAL segundos): registros, registros/s y pico de RSS
+    def progress(self, reports):
+        now = time.perf_counter()
+        if now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        records = sum(report.stats.records for report in reports)
+        self.stdout.write(f"{records} records  {records / (now - self.started):.0f} records/s  "
+                          f"peak RSS {self.format_rss(peak_rss_mb())}")
+
+    def summary(self, reports, dry_run):
+        for report in reports:
+            report.stats.elapsed = report.write_time
+            if report.error is not None:
+                self.stdout.write(self.style.ERROR(str(report)))
+            else:
+                self.stdout.write(self.style.SUCCESS(str(report)))
+
+        elapsed = time.perf_counter() - self.started
+        records = sum(report.stats.records for report in reports)
+        inserted = sum(report.stats.inserted for report in reports)
+        updated = sum(report.stats.updated for report in reports)
+        self.stdout.write(f"Total: {records} records ({inserted} inserted, {updated} updated) in {elapsed:.2f}s "
+                          f"({records / elapsed if elapsed else 0:.0f} records/s), "
+                          f"peak RSS {self.format_rss(peak_rss_mb())}")
+        if dry_run:
+            self.stdout.write(self.style.WARNING("Dry run: all the changes have been rolled back"))
+
+    def format_rss(self, rss):
+        return 'n/a' if rss is None else f"{rss:.0f} MB"
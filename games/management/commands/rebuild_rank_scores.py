@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from games.ratings import rank_prior, rebuild_rank_scores
+
+
+# python manage.py rebuild_rank_scores -> Volver a calcular la puntuación de ordenación (rank_score) de todos los juegos
+# (cada voto la mantiene al día; hace falta al cambiar GAME_RANK_PRIOR_RATING / GAME_RANK_PRIOR_VOTES)
+class Command(BaseCommand):
+    help = "Recompute every game's ranking score (Bayesian average) from its rating counters"
+
+    def handle(self, *args, **options):
+        prior_rating, prior_votes = rank_prior()
+        count = rebuild_rank_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rank scores rebuilt: {count} games (prior {prior_rating} over {prior_votes:g} votes)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from games.search import rebuild_index
+
+
+# python manage.py rebuild_search_index -> Volver a crear el índice de búsqueda (FTS5) con todos los juegos
+# (normalmente no hace falta: se mantiene al día con las señales de Game y con la ingesta -> games/search.py)
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of game titles and descriptions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Games indexed per batch (default: 2000)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("rebuild_search_index only supports SQLite")
+        with transaction.atomic():
+            count = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt: {count} games"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.likes import reconcile_like_counts
+
+
+# python manage.py reconcile_like_counts -> Volver a calcular los likes y dislikes de todos los comentarios desde Like
+# (like_comment los mantiene al día; hace falta tras cambios en el admin o usuarios borrados)
+class Command(BaseCommand):
+    help = "Recompute every comment's like and dislike counters from the likes table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Comments written per statement (default: 1000)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = reconcile_like_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Like counters reconciled: {count} comments changed"))
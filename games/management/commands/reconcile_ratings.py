@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.ratings import reconcile_ratings
+
+
+# python manage.py reconcile_ratings -> Volver a calcular la suma, el número de votos y la media de todos los juegos
+# desde sus valoraciones (game_detail los mantiene al día; hace falta tras cambios en el admin o comentarios borrados)
+class Command(BaseCommand):
+    help = "Recompute every game's rating sum, vote count and average from the comments table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Games written per statement (default: 1000)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = reconcile_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Ratings reconciled: {count} games changed"))
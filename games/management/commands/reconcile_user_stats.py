@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.user_stats import reconcile_user_stats
+
+
+# python manage.py reconcile_user_stats -> Volver a calcular los recuentos de todos los usuarios (UserStats) desde Comment
+# (game_detail los mantiene al día; hace falta tras cambios en el admin, juegos borrados o al crear la tabla)
+class Command(BaseCommand):
+    help = "Rebuild the per-user vote and comment counts from the comments table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Users written per statement (default: 1000)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = reconcile_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"User stats reconciled: {count} users"))
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from games.sync import run_scheduler, sync_due_feeds
+
+
+# python manage.py sync_games -> Sincronizar las fuentes externas de juegos (settings.GAME_FEEDS)
+# --loop   -> worker en segundo plano: comprueba las fuentes pendientes cada GAME_SYNC_POLL_INTERVAL segundos
+# --force  -> sincronizar aunque no haya pasado el intervalo de la fuente
+# --source -> sincronizar solo la fuente indicada (se puede repetir)
+class Command(BaseCommand):
+    help = "Synchronize the external game feeds configured in settings.GAME_FEEDS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Run as a background worker, checking the feeds periodically")
+        parser.add_argument('--interval', type=int, default=None,
+                            help="Seconds between checks in --loop mode (default: GAME_SYNC_POLL_INTERVAL)")
+        parser.add_argument('--force', action='store_true',
+                            help="Synchronize even if the feed interval has not elapsed")
+        parser.add_argument('--source', action='append', dest='sources',
+                            help="Only synchronize this feed name (can be repeated)")
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            interval = options['interval'] or getattr(settings, 'GAME_SYNC_POLL_INTERVAL', 60)
+            self.stdout.write(f"Sync worker started (checking feeds every {interval}s)")
+            run_scheduler(poll_interval=interval, on_status=self.write_report)
+            return
+
+        results = sync_due_feeds(force=options['force'], sources=options['sources'])
+        if not results:
+            self.stdout.write("No feeds due for synchronization")
+
+        for status in results:
+            self.write_report(status)
+
+    # Informe de cada fuente sincronizada -> tiempos de descarga, parseo y escritura:
+    def write_report(self, status):
+        if status.status == 'error':
+            self.stdout.write(self.style.ERROR(str(status.report)))
+        else:
+            self.stdout.write(self.style.SUCCESS(str(status.report)))
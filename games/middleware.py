@@ -17,13 +17,18 @@ class PasswordMiddleware:
     # -> decide si se deja pasar o redirigir al login global:
     def __call__(self, request):
         # Definir paths de la app permitidos sin login global:
-        allowed_paths = ['/', '/static/', '/favicon.ico', '/global_login/']
+        # /suggest/ -> títulos de la página principal (públicos) en cada tecla del buscador: sin consultas a la BD
+        allowed_paths = ['/', '/static/', '/favicon.ico', '/global_login/', '/suggest/']
+        # Prefijos permitidos sin login global -> miniaturas de las tarjetas de la página principal (pública):
+        allowed_prefixes = ['/thumbs/']
 
         # Comprobar si path de la vista solicitada
         # -> NO pertenece a los paths permitidos => ver si tiene la cookie de sesión <-> redirigir al login global
         # -> SI pertenece a los paths permitidos -> ***seguir con la petición***
         if any(request.path == path for path in allowed_paths):
             return self.get_response(request)
+        if any(request.path.startswith(prefix) for prefix in allowed_prefixes):
+            return self.get_response(request)
 
         # Cookie de sesión con la contraseña global -> si existe:
         password_cookie = request.COOKIES.get('global_pass')
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0016_feedsyncstatus"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feedsyncstatus",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="feedsyncstatus",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("running", "Running"),
+                    ("ok", "OK"),
+                    ("unchanged", "Unchanged"),
+                    ("error", "Error"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0017_feedsyncstatus_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="is_stale",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="source_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
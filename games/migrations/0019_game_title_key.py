@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:47
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de games.models.normalize_title en el momento de esta migración (sin importar el código de la app)
+TRADEMARK_SYMBOLS = re.compile(r'[™®©℠]')
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+def normalize_title(title):
+    title = TRADEMARK_SYMBOLS.sub('', title or '')
+    title = ''.join(char for char in unicodedata.normalize('NFKD', title) if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(' ', title.casefold()).strip()
+
+
+def fill_title_keys(apps, schema_editor):
+    Game = apps.get_model("games", "Game")
+    games = list(Game.objects.only("id", "title"))
+    for game in games:
+        game.title_key = normalize_title(game.title)
+    Game.objects.bulk_update(games, ["title_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0018_game_source_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="title_key",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=200
+            ),
+        ),
+        migrations.CreateModel(
+            name="GameAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("alias_id", models.CharField(max_length=255, unique=True)),
+                ("title", models.CharField(max_length=200)),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="games.game",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(fill_title_keys, migrations.RunPython.noop),
+    ]
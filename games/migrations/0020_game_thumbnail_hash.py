@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0019_game_title_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="thumbnail_checked_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="thumbnail_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
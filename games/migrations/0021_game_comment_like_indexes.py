@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0020_game_thumbnail_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["game", "-timestamp", "id"], name="comment_game_recent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(fields=["user", "game"], name="comment_user_game_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["-average_rating", "id"], name="game_rating_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["platform", "-average_rating", "id"],
+                name="game_platform_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["genre", "-average_rating", "id"], name="game_genre_rating_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["publisher", "-average_rating", "id"],
+                name="game_publisher_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(
+                fields=["comment", "like", "dislike"], name="like_comment_vote_idx"
+            ),
+        ),
+    ]
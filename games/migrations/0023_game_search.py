@@ -0,0 +1,87 @@
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Tabla virtual FTS5 de búsqueda de juegos (games/search.py) -> solo SQLite
+# Copia de games.search (y de games.models.normalize_title) en el momento de esta migración
+# -> sin importar el código de la app: cambios posteriores no cambian lo que hace esta migración
+SEARCH_TABLE = "games_game_search"
+SEARCH_COLUMNS = ("title", "description", "platform", "genre", "publisher")
+RANK_WEIGHTS = (0.0, 10.0, 1.0, 0.0, 0.0, 0.0)
+FACETS = ("platform", "genre", "publisher")
+PREFIX_INDEXES = "2 3 4"
+FACET_MARK = "_"
+
+TRADEMARK_SYMBOLS = re.compile(r'[™®©℠]')
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+def normalize_title(title):
+    title = TRADEMARK_SYMBOLS.sub('', title or '')
+    title = ''.join(char for char in unicodedata.normalize('NFKD', title) if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(' ', title.casefold()).strip()
+
+
+def search_rowid(game_id):
+    digest = hashlib.blake2b(game_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def facet_token(value):
+    token = normalize_title(value).replace(' ', '')
+    return FACET_MARK + token if token else ''
+
+
+def search_row(game):
+    return ((search_rowid(game.id), game.id, game.title, game.description)
+            + tuple(facet_token(getattr(game, facet)) for facet in FACETS))
+
+
+def create_table_sql():
+    columns = ', '.join(SEARCH_COLUMNS)
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return [
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(game_id UNINDEXED, {columns}, "
+        f"tokenize = \"unicode61 remove_diacritics 2 tokenchars '{FACET_MARK}'\", prefix = '{PREFIX_INDEXES}')",
+        f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({weights})')",
+    ]
+
+
+def insert_sql():
+    columns = ('rowid', 'game_id') + SEARCH_COLUMNS
+    return (f"INSERT INTO {SEARCH_TABLE} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('%s' for _column in columns)})")
+
+
+# Crear la tabla e indexar los juegos que ya existen
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    Game = apps.get_model("games", "Game")
+    with schema_editor.connection.cursor() as cursor:
+        for sql in create_table_sql():
+            cursor.execute(sql)
+        rows = [search_row(game) for game in Game.objects.only("id", *SEARCH_COLUMNS)]
+        if rows:
+            cursor.executemany(insert_sql(), rows)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0022_cacheversion"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
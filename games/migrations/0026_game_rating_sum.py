@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+# Copia de games.ratings.average en el momento de esta migración (sin importar el código de la app)
+# Media redondeada a 1 decimal (la mitad hacia arriba) solo con enteros -> Decimal (0 sin votos)
+def average(rating_sum, vote_count):
+    if not vote_count:
+        return Decimal('0.0')
+    return Decimal((20 * rating_sum + vote_count) // (2 * vote_count)) / 10
+
+
+# Contadores exactos de los juegos que ya existen -> desde sus valoraciones (la media también: sin redondeos acumulados)
+def fill_rating_sums(apps, schema_editor):
+    Game = apps.get_model("games", "Game")
+    Comment = apps.get_model("games", "Comment")
+    totals = {game_id: (rating_sum, vote_count) for game_id, rating_sum, vote_count in
+              Comment.objects.filter(rating__gte=0).values_list("game").annotate(
+                  rating_sum=Sum("rating"), vote_count=Count("id")).order_by()}
+    games = list(Game.objects.filter(id__in=totals).only("id"))
+    for game in games:
+        game.rating_sum, game.vote_count = totals[game.id]
+        game.average_rating = average(game.rating_sum, game.vote_count)
+    Game.objects.bulk_update(games, ["rating_sum", "vote_count", "average_rating"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0025_userstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="rating_sum",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_sums, migrations.RunPython.noop),
+    ]
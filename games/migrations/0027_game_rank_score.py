@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+import games.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+
+
+# Puntuación de ordenación de los juegos que ya existen -> desde sus contadores (antes de crear los índices)
+# Copia de games.ratings.rank_score_expression en el momento de esta migración (sin importar el código de la app):
+# (PRIOR_RATING * PRIOR_VOTES + suma) / (PRIOR_VOTES + votos)
+# games.models.default_rank_score solo es el default del campo (estado del modelo, como lo genera makemigrations)
+#   -> el valor de cada fila sale de aquí
+def fill_rank_scores(apps, schema_editor):
+    Game = apps.get_model("games", "Game")
+    prior_rating = float(getattr(settings, "GAME_RANK_PRIOR_RATING", 3.0))
+    prior_votes = float(getattr(settings, "GAME_RANK_PRIOR_VOTES", 10))
+    Game.objects.update(rank_score=ExpressionWrapper(
+        (Value(prior_rating * prior_votes) + F("rating_sum")) / (Value(prior_votes) + F("vote_count")),
+        output_field=FloatField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0026_game_rating_sum"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="game",
+            name="game_rating_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="game",
+            name="game_platform_rating_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="game",
+            name="game_genre_rating_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="game",
+            name="game_publisher_rating_idx",
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="rank_score",
+            field=models.FloatField(default=games.models.default_rank_score),
+        ),
+        migrations.RunPython(fill_rank_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["-rank_score", "id"], name="game_rank_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["platform", "-rank_score", "id"], name="game_platform_rank_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["genre", "-rank_score", "id"], name="game_genre_rank_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(
+                fields=["publisher", "-rank_score", "id"],
+                name="game_publisher_rank_idx",
+            ),
+        ),
+    ]
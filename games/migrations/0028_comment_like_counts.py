@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:47
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+# Contadores de los comentarios que ya tienen likes -> UNA consulta agrupada de Like (el resto se queda en 0)
+def fill_like_counts(apps, schema_editor):
+    Comment = apps.get_model("games", "Comment")
+    Like = apps.get_model("games", "Like")
+    totals = {comment_id: (likes, dislikes) for comment_id, likes, dislikes in
+              Like.objects.values_list("comment").annotate(
+                  likes=Count("id", filter=Q(like=True)), dislikes=Count("id", filter=Q(dislike=True))).order_by()}
+    comments = list(Comment.objects.filter(id__in=totals).only("id"))
+    for comment in comments:
+        comment.like_count, comment.dislike_count = totals[comment.id]
+    Comment.objects.bulk_update(comments, ["like_count", "dislike_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0027_game_rank_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="dislike_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="comment",
+            name="like_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_like_counts, migrations.RunPython.noop),
+    ]
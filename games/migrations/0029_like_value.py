@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+# like / dislike -> value (like gana si estaban los dos) + sin las filas vacías que creaba cada GET de los botones
+def fill_like_values(apps, schema_editor):
+    Like = apps.get_model("games", "Like")
+    Like.objects.filter(like=True).update(value=1)
+    Like.objects.filter(like=False, dislike=True).update(value=-1)
+    Like.objects.filter(value=0).delete()
+
+
+# Contadores de los comentarios desde value -> 0028 contaba las filas con like y dislike en los dos contadores
+# (ahora solo son likes) => UNA consulta agrupada de Like + poner a 0 los que ya no tienen votos
+def fill_like_counts(apps, schema_editor):
+    Comment = apps.get_model("games", "Comment")
+    Like = apps.get_model("games", "Like")
+    totals = {comment_id: (likes, dislikes) for comment_id, likes, dislikes in
+              Like.objects.values_list("comment").annotate(
+                  likes=Count("id", filter=Q(value=1)), dislikes=Count("id", filter=Q(value=-1))).order_by()}
+    Comment.objects.exclude(id__in=totals).exclude(like_count=0, dislike_count=0).update(like_count=0, dislike_count=0)
+    comments = list(Comment.objects.filter(id__in=totals).only("id"))
+    for comment in comments:
+        comment.like_count, comment.dislike_count = totals[comment.id]
+    Comment.objects.bulk_update(comments, ["like_count", "dislike_count"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0028_comment_like_counts"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="like",
+            name="value",
+            field=models.SmallIntegerField(
+                choices=[(1, "Like"), (-1, "Dislike"), (0, "No vote")], default=0
+            ),
+        ),
+        migrations.RunPython(fill_like_values, migrations.RunPython.noop),
+        migrations.RunPython(fill_like_counts, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="like",
+            name="like_comment_vote_idx",
+        ),
+        migrations.RemoveField(
+            model_name="like",
+            name="dislike",
+        ),
+        migrations.RemoveField(
+            model_name="like",
+            name="like",
+        ),
+        migrations.AddIndex(
+            model_name="like",
+            index=models.Index(
+                condition=models.Q(("value__in", [-1, 1])),
+                fields=["comment", "value"],
+                name="like_comment_vote_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="like",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("value__in", [-1, 0, 1])), name="like_value_valid"
+            ),
+        ),
+    ]
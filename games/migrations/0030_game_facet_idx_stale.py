@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0029_like_value"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="game",
+            name="game_facet_idx",
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["platform", "genre", "publisher", "is_stale"], name="game_facet_idx"),
+        ),
+    ]
@@ -1,5 +1,38 @@
+import re
+import unicodedata
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.urls import reverse
+
+
+# Símbolos que no forman parte del nombre del juego (marcas registradas):
+TRADEMARK_SYMBOLS = re.compile(r'[™®©℠]')
+# Todo lo que no sea letra o número (puntuación, espacios...):
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+
+# Clave normalizada de un título -> detectar el mismo juego en distintas fuentes
+# -> sin mayúsculas, acentos, puntuación ni símbolos de marca: "Warframe™" / "WARFRAME" -> 'warframe'
+# ej: "Star Wars: The Old Republic" -> 'star wars the old republic'
+def normalize_title(title):
+    title = TRADEMARK_SYMBOLS.sub('', title or '')
+    # Separar los acentos de las letras (NFKD) y quitarlos:
+    title = ''.join(char for char in unicodedata.normalize('NFKD', title) if not unicodedata.combining(char))
+    return NON_ALPHANUMERIC.sub(' ', title.casefold()).strip()
+
+
+# Nombre del fichero de una variante de miniatura -> hash (sha256) de la imagen original + ancho
+# -> mismo contenido = mismo nombre => se puede cachear para siempre en el navegador
+def thumbnail_name(content_hash, width):
+    return f"{content_hash}-{width}.webp"
+
+
+# Puntuación de la ordenación de un juego sin votos -> la valoración a priori de la media bayesiana (games/ratings.py)
+def default_rank_score():
+    return float(getattr(settings, 'GAME_RANK_PRIOR_RATING', 3.0))
+
 
 class Game(models.Model):                           # Tipo de dato de la BD --> Game
     # Cambiar el tipo de 'id' (IntegerField o AutoField) -> CharField
@@ -8,6 +41,8 @@ class Game(models.Model):                           # Tipo de dato de la BD -->
     id = models.CharField(max_length=255, primary_key=True)
     # 200 chars -> Título del juego:
     title = models.CharField(max_length=200)
+    # 200 chars -> Título normalizado (normalize_title) con índice --> juegos duplicados entre fuentes:
+    title_key = models.CharField(max_length=200, db_index=True, blank=True, default='')
     # 100 chars -> Plataforma:
     platform = models.CharField(max_length=100)
     # 100 chars -> Género:
@@ -20,21 +55,63 @@ class Game(models.Model):                           # Tipo de dato de la BD -->
     release_date = models.DateField()
     # Texto largo -> Longitud dinámica --> Descripción del juego:
     description = models.TextField()
-    # Número -> 2 dígitos con 1 decimal --> Media de votos:
+    # Número -> 2 dígitos con 1 decimal --> Media de votos (rating_sum / vote_count, games/ratings.py):
     average_rating = models.DecimalField(max_digits=2, decimal_places=1, default=0)
     # Número entero --> Número de votos:
     vote_count = models.IntegerField(default=0)
+    # Número entero --> Suma exacta de las puntuaciones de los votos:
+    rating_sum = models.IntegerField(default=0)
+    # Número real --> Puntuación de la ordenación de los listados (media bayesiana, games/ratings.py):
+    # sin votos -> la valoración a priori (settings.GAME_RANK_PRIOR_RATING)
+    rank_score = models.FloatField(default=default_rank_score)
     # URL -> 500 chars --> URL del juego en FreeToGame:
     freetogame_profile_url = models.URLField(max_length=500)
     # URL -> 500 chars --> URL del juego:
     game_url = models.URLField(max_length=500)
     # URL -> 500 chars --> URL de la miniatura:
     thumbnail = models.URLField(max_length=500)
+    # 64 chars -> Hash de la miniatura descargada (vacío = sin descargar todavía) --> games/thumbnails.py:
+    thumbnail_hash = models.CharField(max_length=64, blank=True, default='')
+    # Fecha del último intento de descarga de la miniatura (si falla se reintenta más tarde):
+    thumbnail_checked_at = models.DateTimeField(null=True, blank=True)
+    # 64 chars -> Hash (sha256) de los campos que vienen de la fuente externa (ingest.source_hash)
+    # --> en cada sincronización solo se actualizan los juegos cuyo hash ha cambiado:
+    source_hash = models.CharField(max_length=64, blank=True, default='')
+    # Booleano --> El juego ya no aparece en su fuente externa (eliminado en origen)
+    # -> no sale en el listado, la búsqueda, las sugerencias ni los filtros (sí en su ficha y en las listas del usuario):
+    is_stale = models.BooleanField(default=False)
 
     # null=True -> Permite que el campo sea null
     # blank=True -> Permite que no se rellene el campo en un formulario
     # default=0 -> Valor por defecto del campo -> 0 si no se introduce nada
 
+    # Clase Meta: --> Opciones adicionales del modelo Game en la base de datos
+    class Meta:
+        # Índices del listado de la página principal -> filtro opcional + orden (-rank_score, id) (pagination.py)
+        # => la BD recorre el índice ya ordenado y para en el LIMIT de la página (sin ordenar toda la tabla)
+        # Con varios filtros a la vez se usa el índice de uno de ellos y el resto se comprueba en sus filas
+        indexes = [
+            models.Index(fields=['-rank_score', 'id'], name='game_rank_idx'),
+            models.Index(fields=['platform', '-rank_score', 'id'], name='game_platform_rank_idx'),
+            models.Index(fields=['genre', '-rank_score', 'id'], name='game_genre_rank_idx'),
+            models.Index(fields=['publisher', '-rank_score', 'id'], name='game_publisher_rank_idx'),
+            # Juegos por combinación de filtros (games/facets.py) -> GROUP BY recorriendo solo el índice ya agrupado
+            # (is_stale al final -> el filtro de los obsoletos se comprueba en el propio índice)
+            models.Index(fields=['platform', 'genre', 'publisher', 'is_stale'], name='game_facet_idx'),
+        ]
+
+    # Cargar desde la BD -> recordar los valores de los filtros de la página principal
+    # (si se cambian y se guarda el juego, se invalidan también las páginas cacheadas de los valores anteriores)
+    # y los campos de la búsqueda + is_stale (si no cambian, guardar el juego no vuelve a indexarlo -> search.py)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_filters = tuple(instance.__dict__.get(field) for field in ('platform', 'genre', 'publisher'))
+        instance._loaded_search = tuple(instance.__dict__.get(field)
+                                        for field in ('title', 'description', 'platform', 'genre', 'publisher',
+                                                      'is_stale'))
+        return instance
+
     # -> game.is_followed_by_user(user) => True o False
     def is_followed_by_user(self, user):
         # Comprobar si el User autenticado sigue el juego o no
@@ -43,6 +120,30 @@ class Game(models.Model):                           # Tipo de dato de la BD -->
         # Ver si existe relación UserGameFollow del User con el Game en la base de datos:
         return UserGameFollow.objects.filter(user=user, game=self).exists()
 
+    # Miniatura para <img src> -> variante más grande guardada en local (o la URL original si aún no está)
+    @property
+    def thumbnail_src(self):
+        if not self.thumbnail_hash:
+            return self.thumbnail
+        width = settings.GAME_THUMBNAIL_WIDTHS[-1]
+        return reverse('thumbnail', args=[thumbnail_name(self.thumbnail_hash, width)])
+
+    # Variantes de la miniatura para <img srcset> -> '' si aún no está guardada en local
+    @property
+    def thumbnail_srcset(self):
+        if not self.thumbnail_hash:
+            return ''
+        return ', '.join(f"{reverse('thumbnail', args=[thumbnail_name(self.thumbnail_hash, width)])} {width}w"
+                         for width in settings.GAME_THUMBNAIL_WIDTHS)
+
+    # Guardar -> clave del título siempre actualizada (bulk_create / bulk_update la calculan en ingest.py):
+    def save(self, *args, **kwargs):
+        self.title_key = normalize_title(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'title_key'}
+        super().save(*args, **kwargs)
+
     def __str__(self):      # Forma de llamar al objeto -> Título del juego
         return self.title
 
@@ -61,31 +162,40 @@ class Comment(models.Model):                        # Tipo de dato de la BD -->
     rating = models.IntegerField(null=True, blank=True)
     # Fecha y hora del comentario -> automáticamente al crear o actualizar el objeto:
     timestamp = models.DateTimeField(auto_now=True)
+    # Número entero --> Likes y dislikes del comentario (games/likes.py -> like_comment los suma con F()):
+    like_count = models.IntegerField(default=0)
+    dislike_count = models.IntegerField(default=0)
 
-    # @ property -> Decorador -> definir un método en una clase que puede ser accedido como si fuera un atributo/campo
-    # Número de likes:
-    @property
-    def likes_count(self):
-        return self.likes.filter(like=True).count()
-
-    # Número de dislikes:
-    @property
-    def dislikes_count(self):
-        return self.likes.filter(dislike=True).count()
+    # Clase Meta: --> Opciones adicionales del modelo Comment en la base de datos
+    class Meta:
+        indexes = [
+            # Comentarios de un juego de recientes a antiguos (game_detail) -> orden (-timestamp, id) de la paginación
+            models.Index(fields=['game', '-timestamp', 'id'], name='comment_game_recent_idx'),
+            # Comentarios de un usuario por juego (rated_games y contadores del context processor)
+            models.Index(fields=['user', 'game'], name='comment_user_game_idx'),
+        ]
 
     def __str__(self):       # Forma de llamar al objeto Comment
         return f"Comment by {self.user} of {self.game.title} on {self.timestamp}"
 
 
 class Like(models.Model):        # Tipo de dato de la BD --> Like o Dislike
+    LIKE = 1
+    DISLIKE = -1
+    NO_VOTE = 0
+    VALUE_CHOICES = [
+        (LIKE, 'Like'),
+        (DISLIKE, 'Dislike'),
+        (NO_VOTE, 'No vote'),
+    ]
+
     # ForeignKey -> Relación con Comment --> Campo 'likes' de un dato tipo Comment
     comment = models.ForeignKey(Comment, related_name='likes', on_delete=models.CASCADE)
     # ForeignKey -> Relación con User --> Campo 'likes' de un dato tipo User
     user = models.ForeignKey(User, related_name='likes', on_delete=models.CASCADE)
-    # BooleanField -> Campo de tipo booleano => Like
-    like = models.BooleanField(default=False)
-    # BooleanField -> Campo de tipo booleano => Dislike
-    dislike = models.BooleanField(default=False)
+    # Número entero pequeño --> Voto: 1 (like), -1 (dislike) o 0 (anulado)
+    # -> una sola columna: like y dislike a la vez no se pueden guardar (restricción like_value_valid)
+    value = models.SmallIntegerField(choices=VALUE_CHOICES, default=NO_VOTE)
     # Fecha y hora del like -> Automáticamente al crear o actualizar el objeto:
     timestamp = models.DateTimeField(auto_now=True)
 
@@ -94,18 +204,18 @@ class Like(models.Model):        # Tipo de dato de la BD --> Like o Dislike
     class Meta:
         # Un User y un Comment solo puedan estar relacionados una vez en la tabla del modelo `Like`
         unique_together = ('comment', 'user')
-
-    def is_valid_vote(self):
-        # Solo válido si no están ambos a True
-        return not (self.like and self.dislike)
+        constraints = [
+            models.CheckConstraint(condition=models.Q(value__in=[-1, 0, 1]), name='like_value_valid'),
+        ]
+        # Votos de cada comentario -> los recuentos se resuelven solo con el índice (sin leer las filas)
+        # Solo los votos (value -1 o 1) -> los anulados no ocupan el índice
+        indexes = [
+            models.Index(fields=['comment', 'value'], condition=models.Q(value__in=[-1, 1]),
+                         name='like_comment_vote_idx'),
+        ]
 
     def __str__(self):
-        if self.like:
-            status = "👍 Like"
-        elif self.dislike:
-            status = "👎 Dislike"
-        else:
-            status = "❓ No vote"
+        status = {self.LIKE: "👍 Like", self.DISLIKE: "👎 Dislike"}.get(self.value, "❓ No vote")
         return f"{status} by {self.user.username} on {self.comment.game.title}"
 
 
@@ -146,9 +256,78 @@ class Profile(models.Model):                # Tipo de dato de la BD --> Datos de
     def __str__(self):
         return self.user.username
 
+
+class UserStats(models.Model):              # Tipo de dato de la BD --> Recuentos de los comentarios de un user (games/user_stats.py)
+    # Usuario de los recuentos -> clave primaria = id del user => UNA lectura por clave primaria:
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Valoraciones hechas (comentarios con rating >= 0) y suma de sus puntuaciones -> media del perfil:
+    vote_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Comentarios con texto (no vacío):
+    comment_count = models.PositiveIntegerField(default=0)
+    # Juegos distintos valorados:
+    rated_games_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.vote_count} votes, {self.comment_count} comments"
+
+
 class ValidPassword(models.Model):          # Tipo de dato de la BD --> ValidPassword -> Contraseñas globales de acceso sin registro
     # 255 chars -> Password a verificar para acceso sin registro -> globales
     value = models.TextField(unique=True)
 
     def __str__(self):      # Forma de llamar al objeto -> Password en si
         return self.value
+
+
+class FeedSyncStatus(models.Model):         # Tipo de dato de la BD --> Estado de sincronización de cada fuente externa
+    # Estados posibles de la última sincronización -> (valor en la BD, texto a mostrar):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('ok', 'OK'),
+        ('unchanged', 'Unchanged'),
+        ('error', 'Error'),
+    ]
+
+    # 100 chars -> Nombre de la fuente (settings.GAME_FEEDS -> 'name'), único:
+    source = models.CharField(max_length=100, unique=True)
+    # Estado de la última sincronización:
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # sha256 del contenido de la fuente en la última sincronización correcta -> mismo hash = sin cambios:
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Fechas de inicio y fin de la última sincronización (éxito o error):
+    last_started = models.DateTimeField(null=True, blank=True)
+    last_finished = models.DateTimeField(null=True, blank=True)
+    # Fecha de la última sincronización correcta:
+    last_success = models.DateTimeField(null=True, blank=True)
+    # Número de juegos nuevos guardados en la última sincronización correcta:
+    games_created = models.IntegerField(default=0)
+    # Texto del último error (vacío si la última sincronización fue correcta):
+    last_error = models.TextField(blank=True, default='')
+
+    def __str__(self):      # Forma de llamar al objeto -> fuente y estado
+        return f"{self.source} ({self.status})"
+
+
+class GameAlias(models.Model):              # Tipo de dato de la BD --> Mismo juego en otra fuente (duplicado)
+    # 255 chars -> Id del juego en la otra fuente (ej: 'LIS3-12'), único -> no se guarda como Game:
+    alias_id = models.CharField(max_length=255, unique=True)
+    # ForeignKey -> Juego guardado con el mismo título normalizado (ej: 'LIS2-5') --> game.aliases
+    game = models.ForeignKey(Game, related_name='aliases', on_delete=models.CASCADE)
+    # 200 chars -> Título con el que viene en la otra fuente:
+    title = models.CharField(max_length=200)
+
+    def __str__(self):      # Forma de llamar al objeto -> alias y juego
+        return f"{self.alias_id} -> {self.game_id}"
+
+
+class CacheVersion(models.Model):           # Tipo de dato de la BD --> Versión de una parte cacheada (games/versions.py)
+    # 100 chars -> Nombre de lo que se cachea (ej: 'catalogue' o 'filters:<hash>'), único:
+    name = models.CharField(max_length=100, unique=True)
+    # Número -> cambia cada vez que cambian los datos => las entradas de la caché con la versión anterior no se usan
+    # -> guardada en la BD (no en la caché) para que la vean todos los procesos (web y sync_games --loop)
+    version = models.BigIntegerField()
+
+    def __str__(self):      # Forma de llamar al objeto -> nombre y versión
+        return f"{self.name} (v{self.version})"
@@ -0,0 +1,93 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .models import UserGameFollow
+from .versions import CATALOGUE, filters_scope, get_versions
+
+
+# Caché del listado de la página principal (games/main_listing.html ya renderizado):
+# - Una entrada por combinación de filtros (platform, genre, publisher), página (cursor) e idioma
+# - La clave lleva la versión del catálogo y la de esa combinación de filtros (games/versions.py)
+#   => un cambio en un juego solo invalida las combinaciones en las que aparece
+# - Sin nada que dependa del usuario: los botones de seguir se añaden en cada petición (add_follow_buttons)
+# - Contadores de aciertos / fallos -> page_cache_stats() (vista cache_stats)
+
+# Marca de la posición del botón de seguir de cada juego en el HTML cacheado:
+FOLLOW_PLACEHOLDER = '<!-- follow-button:{} -->'
+
+HITS_KEY = 'main_page:hits'
+MISSES_KEY = 'main_page:misses'
+
+
+def get_timeout():
+    return getattr(settings, 'GAME_PAGE_CACHE_TIMEOUT', 300)
+
+
+# Clave de una página del listado -> filtros normalizados (sin espacios, '' si no se filtra) + página
+# (normalizada: pagination.page_key -> cualquier ?page= no válido comparte la entrada de la primera página) + idioma
+def listing_key(platform, genre, publisher, page, language):
+    scope = filters_scope(platform, genre, publisher)
+    versions = get_versions(CATALOGUE, scope)
+    params = '\x1f'.join((platform, genre, publisher, page or '', language or ''))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f"main_page:{versions[CATALOGUE]}:{versions[scope]}:{digest}"
+
+
+# Entrada cacheada -> {'html', 'game_ids'} o None (cuenta el acierto o el fallo)
+def get_listing(key):
+    if not get_timeout():
+        return None
+    listing = cache.get(key)
+    count_access(HITS_KEY if listing is not None else MISSES_KEY)
+    return listing
+
+
+def set_listing(key, listing):
+    if get_timeout():
+        cache.set(key, listing, get_timeout())
+
+
+def count_access(key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La caché ha eliminado el contador entre add() e incr()
+        cache.set(key, 1, None)
+
+
+# Aciertos y fallos de la caché de la página principal (de este proceso si la caché es local -> LocMemCache)
+def page_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else None,
+        'timeout': get_timeout(),
+    }
+
+
+# Añadir al HTML cacheado los botones de seguir / dejar de seguir del usuario de la petición
+# -> UNA consulta con los juegos de la página que sigue el usuario (ninguna si no está autenticado)
+def add_follow_buttons(request, listing):
+    following = set()
+    if request.user.is_authenticated and listing['game_ids']:
+        following = set(UserGameFollow.objects.filter(user=request.user, game_id__in=listing['game_ids'])
+                        .values_list('game_id', flat=True))
+
+    # Plantilla sin context processors (no hacen falta) -> solo el token CSRF de los formularios
+    template = get_template('games/follow_button.html')
+    context = {'user': request.user, 'csrf_token': get_token(request)}
+    html = listing['html']
+    for game_id in listing['game_ids']:
+        button = template.render({**context, 'game_id': game_id, 'is_following': game_id in following})
+        html = html.replace(FOLLOW_PLACEHOLDER.format(game_id), button, 1)
+    # HTML ya renderizado (y escapado) por las plantillas:
+    return mark_safe(html)
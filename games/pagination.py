@@ -0,0 +1,269 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Case, F, Q, When, Window
+from django.db.models.functions import RowNumber
+
+
+# Paginación por clave (keyset / cursor) de los listados de juegos y comentarios:
+# - La página siguiente se pide con los valores de ordenación del ÚLTIMO elemento de la página actual
+#   (ej: WHERE (rank_score, id) < (4.5, 'LIS1-20') ORDER BY -rank_score, id LIMIT 31)
+#   => sin COUNT(*) ni OFFSET -> una página profunda cuesta lo mismo que la primera
+# - La ordenación SIEMPRE termina en un campo único (id) -> ningún elemento se repite ni se salta entre páginas
+# - Los campos de ordenación no pueden ser nulos
+# - Cursor opaco en la URL (?page=<cursor>): JSON en base64 con los valores, el sentido y el número de página
+# - settings.GAME_PAGINATION = 'offset' -> vuelve al Paginator de Django (?page=<número>)
+
+# Ordenaciones de los listados:
+GAME_ORDERING = ('-rank_score', 'id')
+COMMENT_ORDERING = ('-timestamp', 'id')
+
+
+# Ordenación a través de una relación -> ej: ('-rank_score', 'id') de 'game' => ('-game__rank_score', 'game__id')
+def related_ordering(ordering, relation):
+    return tuple(f"{'-' if name.startswith('-') else ''}{relation}__{name.lstrip('-')}" for name in ordering)
+
+
+# Codificar un cursor -> str (base64 sin relleno '=', seguro en URLs)
+def encode_cursor(values, number, previous=False):
+    data = {'v': [cursor_value(value) for value in values], 'n': number}
+    if previous:
+        data['p'] = 1
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# Valores de ordenación en JSON -> Decimal y fechas como texto (sin perder precisión)
+def cursor_value(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+# Decodificar un cursor -> (valores, número de página, hacia atrás) o None si no es válido (=> primera página)
+def decode_cursor(token, fields):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        values = data['v']
+        if len(values) != len(fields):
+            return None
+        values = [field.to_python(value) for field, value in zip(fields, values)]
+        return values, max(int(data['n']), 1), bool(data.get('p'))
+    except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+        return None
+
+
+# Campo del modelo (o anotación) de un nombre de ordenación -> para convertir los valores del cursor
+# ej: 'game__rank_score' -> Game.rank_score
+def ordering_field(queryset, name):
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+
+    model = queryset.model
+    *relations, last = name.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(last)
+    # Clave ajena -> valor de la clave primaria del modelo relacionado
+    return field.target_field if field.remote_field else field
+
+
+# Valor de ordenación de un objeto -> sigue las relaciones (ya cargadas con select_related)
+def ordering_value(obj, name):
+    for attribute in name.split('__'):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+# Condición "después del cursor" en el orden dado (comparación lexicográfica de los campos):
+# (a, b) después de (x, y) <=> a > x OR (a = x AND b > y) -> < en los campos descendentes
+# -> más el rango del primer campo (a >= x) para que la BD pueda recorrer su índice
+def after_cursor(ordering, values):
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f"{field}__{lookup}": value})
+        equal &= Q(**{field: value})
+
+    first, value = ordering[0].lstrip('-'), values[0]
+    first_range = Q(**{f"{first}__{'lte' if ordering[0].startswith('-') else 'gte'}": value})
+    return first_range & condition
+
+
+# Invertir una ordenación -> páginas anteriores (se recorren hacia atrás y se dan la vuelta)
+def reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f"-{name}" for name in ordering)
+
+
+# Página de un listado por clave -> mismo uso en las plantillas que una Page del Paginator
+# (iterable, len, has_next / has_previous, number) + cursores de las páginas siguiente y anterior
+class KeysetPage:
+    keyset = True
+
+    def __init__(self, object_list, ordering, number, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.ordering = ordering
+        # Valores de ordenación del primer y el último elemento -> se guardan al crear la página
+        # (la vista puede cambiar object_list después, ej: rated_games -> {'game', 'comments'})
+        self.first_values = self.values(object_list[0]) if object_list else None
+        self.last_values = self.values(object_list[-1]) if object_list else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def values(self, obj):
+        return [ordering_value(obj, name.lstrip('-')) for name in self.ordering]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page:
+            return None
+        return encode_cursor(self.last_values, self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page:
+            return None
+        # Volver a la página 1 -> sin cursor (la página 1 siempre es el principio del listado)
+        if self.number <= 2:
+            return ''
+        return encode_cursor(self.first_values, self.number - 1, previous=True)
+
+
+# Condición y orden de la consulta de una página (cursor ya decodificado o None) -> (Q, ordenación)
+# Páginas anteriores -> elementos ANTES del cursor en orden inverso (se da la vuelta a la página)
+def page_query(ordering, decoded):
+    if decoded is None:
+        return Q(), ordering
+    values, _number, previous = decoded
+    order = reverse_ordering(ordering) if previous else ordering
+    return after_cursor(order, values), order
+
+
+# Página a partir de sus filas (como mucho per_page + 1, en el orden de page_query)
+def build_page(rows, ordering, per_page, decoded):
+    if decoded is None:
+        return KeysetPage(rows[:per_page], ordering, 1, len(rows) > per_page, False)
+
+    _values, number, previous = decoded
+    if previous:
+        if len(rows) <= per_page:
+            # Se ha llegado al principio -> es la primera página
+            number = 1
+        return KeysetPage(rows[:per_page][::-1], ordering, number, True, len(rows) > per_page)
+    return KeysetPage(rows[:per_page], ordering, number, len(rows) > per_page, True)
+
+
+def cursor_fields(queryset, ordering):
+    return [ordering_field(queryset, name.lstrip('-')) for name in ordering]
+
+
+# Página por clave de un queryset -> UNA consulta (per_page + 1 filas para saber si hay más)
+def keyset_page(queryset, ordering, per_page, cursor=None):
+    decoded = decode_cursor(cursor, cursor_fields(queryset, ordering)) if cursor else None
+    condition, order = page_query(ordering, decoded)
+    rows = list(queryset.filter(condition).order_by(*order)[:per_page + 1])
+    return build_page(rows, ordering, per_page, decoded)
+
+
+# Páginas por clave de varios grupos de un queryset a la vez -> UNA consulta para todos
+# (ej: los comentarios de cada juego de una página de rated_games, cada uno con su cursor)
+# group -> campo del grupo (ej: 'game'); cursors -> {valor del grupo: cursor o None}
+# => {valor del grupo: KeysetPage}
+# - WHERE: cada grupo con la condición de su cursor
+# - Filas numeradas dentro de cada grupo en el sentido de su página (ROW_NUMBER() OVER (PARTITION BY grupo ...))
+#   -> solo las per_page + 1 primeras de cada grupo
+def keyset_pages(queryset, ordering, per_page, group, cursors):
+    fields = cursor_fields(queryset, ordering)
+    decoded = {key: decode_cursor(cursor, fields) if cursor else None for key, cursor in cursors.items()}
+    if not decoded:
+        return {}
+
+    condition = Q()
+    backwards = []
+    for key, key_decoded in decoded.items():
+        key_condition, order = page_query(ordering, key_decoded)
+        condition |= Q(**{group: key}) & key_condition
+        if order != ordering:
+            backwards.append(key)
+
+    rank = Window(RowNumber(), partition_by=F(group), order_by=list(ordering))
+    if backwards:
+        # Grupos con página anterior -> numerados en orden inverso
+        rank = Case(When(**{f"{group}__in": backwards},
+                         then=Window(RowNumber(), partition_by=F(group), order_by=list(reverse_ordering(ordering)))),
+                    default=rank)
+    rows = queryset.filter(condition).annotate(group_rank=rank).filter(group_rank__lte=per_page + 1)
+
+    grouped = {key: [] for key in decoded}
+    attname = queryset.model._meta.get_field(group).attname
+    for row in sorted(rows, key=lambda row: row.group_rank):
+        grouped[getattr(row, attname)].append(row)
+    return {key: build_page(grouped[key], ordering, per_page, key_decoded) for key, key_decoded in decoded.items()}
+
+
+# Página de un listado según el parámetro de la petición (por defecto 'page'):
+# -> por clave (GAME_PAGINATION = 'keyset', por defecto) o por número con el Paginator de Django ('offset')
+def paginate(request, queryset, ordering, per_page, param='page'):
+    value = request.GET.get(param)
+    if offset_pagination():
+        return Paginator(queryset.order_by(*ordering), per_page).get_page(value)
+    return keyset_page(queryset, ordering, per_page, value)
+
+
+# Páginas de varios grupos según sus parámetros de la petición -> {valor del grupo: página}
+# params -> {valor del grupo: parámetro} (ej: {'LIS1-20': 'page_LIS1-20'})
+# -> por clave: UNA consulta para todos (keyset_pages); por número: una página del Paginator por grupo
+def paginate_groups(request, queryset, ordering, per_page, group, params):
+    if offset_pagination():
+        return {key: Paginator(queryset.filter(**{group: key}).order_by(*ordering), per_page).get_page(
+                    request.GET.get(param)) for key, param in params.items()}
+    cursors = {key: request.GET.get(param) for key, param in params.items()}
+    return keyset_pages(queryset, ordering, per_page, group, cursors)
+
+
+# Parámetro de página normalizado (ej: parte de las claves de la caché, games/page_cache.py)
+# -> por clave: el cursor decodificado vuelto a codificar ('' si no es válido => primera página)
+# -> por número: el número de la página que devuelve el Paginator (uno por página que existe, con un COUNT)
+def page_key(request, queryset, ordering, per_page, param='page'):
+    value = request.GET.get(param)
+    if offset_pagination():
+        return str(Paginator(queryset.order_by(*ordering), per_page).get_page(value).number)
+    decoded = decode_cursor(value, cursor_fields(queryset, ordering)) if value else None
+    if decoded is None:
+        return ''
+    values, number, previous = decoded
+    return encode_cursor(values, number, previous)
+
+
+def offset_pagination():
+    return getattr(settings, 'GAME_PAGINATION', 'keyset') == 'offset'
@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import Comment, Game, default_rank_score
+from .versions import bump_catalogue_version, bump_game_versions
+
+
+# Valoraciones de los juegos con contadores enteros exactos (Game.rating_sum + Game.vote_count):
+# - Cada voto suma su puntuación y su voto con F() en UN UPDATE -> la BD hace la suma sobre el valor actual
+#   => dos votos a la vez no se pisan (sin leer, calcular en Python y guardar el juego entero)
+# - average_rating = rating_sum / vote_count redondeada a 1 decimal, en el mismo UPDATE
+#   -> se guarda (con índice) para ordenar los listados, pero siempre sale de los contadores (sin acumular redondeos)
+# - rank_score = media bayesiana -> orden de los listados (índices game_*_rank_idx), en el mismo UPDATE
+#   (PRIOR_RATING * PRIOR_VOTES + suma) / (PRIOR_VOTES + votos): un 5 con un voto no supera a un 4.8 con 1000
+# - python manage.py reconcile_ratings -> volver a calcular los contadores de todos los juegos desde Comment
+# - python manage.py rebuild_rank_scores -> volver a calcular rank_score de todos los juegos (al cambiar la priori)
+
+
+# Transacción de una escritura que lee antes de escribir (valoraciones en game_detail, votos de likes.py)
+# -> SQLite: pide el bloqueo de escritura al empezar con una sentencia que escribe sin cambiar ninguna fila
+#    => las escrituras a la vez esperan su turno (settings: timeout) en vez de fallar con "database is locked"
+#       al pasar de lectura a escritura; el resto de transacciones siguen empezando DEFERRED (lecturas a la vez)
+@contextmanager
+def write_transaction():
+    with transaction.atomic():
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"UPDATE {Game._meta.db_table} SET id = id WHERE 0")
+        yield
+
+
+# Valoración y votos a priori de la media bayesiana (settings.GAME_RANK_PRIOR_RATING / GAME_RANK_PRIOR_VOTES)
+def rank_prior():
+    return default_rank_score(), float(getattr(settings, 'GAME_RANK_PRIOR_VOTES', 10))
+
+
+# Puntuación de la ordenación de unos contadores -> mismas operaciones que rank_score_expression (mismo resultado)
+def rank_score(rating_sum, vote_count):
+    prior_rating, prior_votes = rank_prior()
+    return (prior_rating * prior_votes + rating_sum) / (prior_votes + vote_count)
+
+
+# Expresión de rank_score en la BD (sobre expresiones de la suma y los votos)
+def rank_score_expression(rating_sum, vote_count):
+    prior_rating, prior_votes = rank_prior()
+    return ExpressionWrapper((Value(prior_rating * prior_votes) + rating_sum) / (Value(prior_votes) + vote_count),
+                             output_field=FloatField())
+
+
+# Media de unos contadores redondeada a 1 decimal (la mitad hacia arriba) -> Decimal (0 sin votos)
+# Solo con enteros: décimas = (20 * suma + votos) // (2 * votos) -> el mismo cálculo que la BD (rounded_tenths)
+def average(rating_sum, vote_count):
+    if not vote_count:
+        return Decimal('0.0')
+    return Decimal((20 * rating_sum + vote_count) // (2 * vote_count)) / 10
+
+
+# Expresión de la media en la BD -> división entera (sin redondeos de coma flotante) y después décimas
+def rounded_tenths(rating_sum, vote_count):
+    return Cast((20 * rating_sum + vote_count) / (2 * vote_count), FloatField()) / 10
+
+
+# Sumar un voto (o el cambio de uno) a un juego -> UN UPDATE con F()
+# ej: nuevo voto de 4 -> add_rating(game, 4, 1); cambiar un 4 por un 2 -> add_rating(game, -2, 0)
+# -> dentro de la transacción del comentario; el juego se vuelve a leer con los contadores actuales
+def add_rating(game, rating_delta, vote_delta):
+    rating_sum = F('rating_sum') + rating_delta
+    vote_count = F('vote_count') + vote_delta
+    Game.objects.filter(pk=game.pk).update(
+        rating_sum=rating_sum,
+        vote_count=vote_count,
+        # Misma sentencia -> las F() son los valores ANTES del UPDATE (se suman aquí también)
+        average_rating=Case(
+            When(vote_count__lte=-vote_delta, then=Value(0.0)),
+            default=rounded_tenths(rating_sum, vote_count),
+            output_field=DecimalField(max_digits=2, decimal_places=1)),
+        rank_score=rank_score_expression(rating_sum, vote_count),
+    )
+    game.refresh_from_db(fields=['rating_sum', 'vote_count', 'average_rating', 'rank_score'])
+    # UPDATE sin señales -> invalidar las páginas cacheadas del juego (como game.save())
+    bump_game_versions(game)
+
+
+# Volver a calcular los contadores de todos los juegos desde sus valoraciones -> (juegos cambiados)
+# UNA consulta agrupada de Comment + solo se escriben los juegos con contadores distintos (bulk_update por lotes)
+def reconcile_ratings(batch_size=1000):
+    totals = {game_id: (rating_sum, vote_count) for game_id, rating_sum, vote_count in
+              Comment.objects.filter(rating__gte=0).values_list('game').annotate(
+                  rating_sum=Sum('rating'), vote_count=Count('id')).order_by().iterator()}
+
+    changed = []
+    fields = ['rating_sum', 'vote_count', 'average_rating', 'rank_score']
+    for game in Game.objects.only('id', *fields).iterator():
+        rating_sum, vote_count = totals.get(game.id, (0, 0))
+        values = (rating_sum, vote_count, average(rating_sum, vote_count), rank_score(rating_sum, vote_count))
+        if tuple(getattr(game, field) for field in fields) != values:
+            game.rating_sum, game.vote_count, game.average_rating, game.rank_score = values
+            changed.append(game)
+
+    Game.objects.bulk_update(changed, fields, batch_size=batch_size)
+    if changed:
+        # bulk_update sin señales -> nueva versión del catálogo (como la ingesta)
+        bump_catalogue_version()
+    return len(changed)
+
+
+# Volver a calcular rank_score de todos los juegos desde sus contadores -> UN UPDATE (juegos)
+# (al cambiar GAME_RANK_PRIOR_RATING / GAME_RANK_PRIOR_VOTES)
+def rebuild_rank_scores():
+    count = Game.objects.update(rank_score=rank_score_expression(F('rating_sum'), F('vote_count')))
+    # UPDATE sin señales -> nueva versión del catálogo (cambia el orden de todos los listados)
+    bump_catalogue_version()
+    return count
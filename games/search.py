@@ -0,0 +1,271 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Game, normalize_title
+
+
+# Búsqueda de texto completo en el título y la descripción de los juegos (SQLite FTS5):
+# - Tabla virtual games_game_search (migración 0023) con una fila por juego
+#   -> índice invertido de las palabras => sin recorrer Game.description con LIKE '%...%' (icontains)
+# - Sin mayúsculas ni acentos (tokenize unicode61 remove_diacritics 2) -> "pokemon" encuentra "Pokémon"
+# - Orden por relevancia BM25 (rank, con más peso en el título) + palabras encontradas resaltadas
+#   -> BM25 recorre todas las coincidencias: solo si son como mucho GAME_SEARCH_RANK_LIMIT
+#      (si no -> primero las que tienen todas las palabras en el título y luego el resto, en el orden del índice)
+# - Filtros de la página principal (platform, genre, publisher) -> columnas de la tabla con el valor en UNA palabra
+#   (facet_token) => el filtro forma parte del MATCH (sin JOIN con games_game por cada coincidencia)
+# - Se mantiene al día con las señales de Game (signals.py) y con las escrituras por lotes de ingest.py
+#   -> sin los juegos obsoletos (Game.is_stale: eliminados en su fuente)
+# - python manage.py rebuild_search_index -> volver a crear el índice completo a partir de games_game
+
+SEARCH_TABLE = 'games_game_search'
+
+# Columnas de la tabla (después de game_id) y su peso en BM25 -> una palabra en el título cuenta 10 veces más
+# (los filtros no cuentan en la relevancia)
+SEARCH_COLUMNS = ('title', 'description', 'platform', 'genre', 'publisher')
+RANK_WEIGHTS = (0.0, 10.0, 1.0, 0.0, 0.0, 0.0)
+FACETS = ('platform', 'genre', 'publisher')
+
+# Índices de prefijos de 2, 3 y 4 letras -> la última palabra de la búsqueda se busca como prefijo
+# ("shoo" -> "shooter") sin recorrer todas las palabras que empiezan así
+PREFIX_INDEXES = '2 3 4'
+
+# Palabras de los filtros -> empiezan por '_' (letra más del tokenizador: '_pcwindows' es UNA palabra)
+# => ninguna palabra de la búsqueda (ni como prefijo) coincide con un filtro
+FACET_MARK = '_'
+
+# Palabras de la búsqueda (letras y números, '_' separa)
+SEARCH_TERMS = re.compile(r'[^\W_]+')
+# Máximo de palabras de una búsqueda (el resto se ignora):
+MAX_TERMS = 10
+
+# Palabras de cada fragmento de la descripción:
+SNIPPET_TOKENS = 24
+
+# Filas a borrar / insertar por sentencia:
+INDEX_BATCH = 500
+
+
+# SQL de la tabla virtual (migración 0023)
+def create_table_sql():
+    columns = ', '.join(SEARCH_COLUMNS)
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return [
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(game_id UNINDEXED, {columns}, "
+        f"tokenize = \"unicode61 remove_diacritics 2 tokenchars '{FACET_MARK}'\", prefix = '{PREFIX_INDEXES}')",
+        # Pesos por defecto de rank -> la columna rank de las consultas ya es BM25 con estos pesos
+        f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({weights})')",
+    ]
+
+
+# rowid de un juego en la tabla de búsqueda -> 64 bits del hash del id (estable, no depende del rowid de games_game,
+# que puede cambiar con VACUUM) => borrar / reemplazar un juego sin recorrer la tabla
+def search_rowid(game_id):
+    digest = hashlib.blake2b(game_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+# Valor de un filtro en UNA palabra del índice -> ej: 'PC (Windows)' => '_pcwindows'
+def facet_token(value):
+    token = normalize_title(value).replace(' ', '')
+    return FACET_MARK + token if token else ''
+
+
+# Fila de un juego en la tabla -> (rowid, game_id, title, description, platform, genre, publisher)
+def search_row(game):
+    return ((search_rowid(game.id), game.id, game.title, game.description)
+            + tuple(facet_token(getattr(game, facet)) for facet in FACETS))
+
+
+def insert_sql():
+    columns = ('rowid', 'game_id') + SEARCH_COLUMNS
+    return (f"INSERT INTO {SEARCH_TABLE} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('%s' for _column in columns)})")
+
+
+# Añadir o reemplazar juegos en el índice -> sentencias por lotes de INDEX_BATCH
+# Juegos obsoletos (is_stale) -> solo se quitan
+# new=True -> juegos recién creados (no hay filas que borrar antes)
+def index_games(games, new=False):
+    games = list(games)
+    with connection.cursor() as cursor:
+        for start in range(0, len(games), INDEX_BATCH):
+            batch = games[start:start + INDEX_BATCH]
+            if not new:
+                delete_rowids(cursor, [search_rowid(game.id) for game in batch])
+            rows = [search_row(game) for game in batch if not game.is_stale]
+            if rows:
+                cursor.executemany(insert_sql(), rows)
+
+
+# Quitar juegos del índice (borrados u obsoletos)
+def remove_games(game_ids):
+    rowids = [search_rowid(game_id) for game_id in game_ids]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rowids), INDEX_BATCH):
+            delete_rowids(cursor, rowids[start:start + INDEX_BATCH])
+
+
+def delete_rowids(cursor, rowids):
+    if rowids:
+        placeholders = ', '.join('%s' for _rowid in rowids)
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", rowids)
+
+
+# Volver a crear el índice completo -> (juegos indexados)
+def rebuild_index(batch_size=2000):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    count = 0
+    games = Game.objects.filter(is_stale=False).only('id', *SEARCH_COLUMNS, 'is_stale').order_by('id')
+    batch = []
+    for game in games.iterator(chunk_size=batch_size):
+        batch.append(game)
+        if len(batch) == batch_size:
+            index_games(batch, new=True)
+            count += len(batch)
+            batch = []
+    index_games(batch, new=True)
+    with connection.cursor() as cursor:
+        # Unir los segmentos del índice -> consultas más rápidas
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return count + len(batch)
+
+
+# Palabras de una búsqueda -> normalizadas como los títulos (sin mayúsculas ni acentos)
+def search_terms(text):
+    terms = [normalize_title(term) for term in SEARCH_TERMS.findall(text or '')]
+    return [term for term in terms if term][:MAX_TERMS]
+
+
+# Coincidencias que se ordenan por relevancia (BM25) -> settings.GAME_SEARCH_RANK_LIMIT
+def rank_limit():
+    return getattr(settings, 'GAME_SEARCH_RANK_LIMIT', 1000)
+
+
+# Consulta FTS5 de una búsqueda -> '' si no tiene ninguna palabra
+# Cada palabra entre comillas (sin operadores ni sintaxis de FTS5) -> todas deben aparecer
+# La última como prefijo (palabra a medio escribir) + los filtros en su columna
+# ej: 'star wars: old', {'genre': 'MMORPG'} -> '"star" "wars" "old"* genre : "_mmorpg"'
+# title=True -> todas las palabras en el título: 'title : ("star" "wars" "old"*) AND genre : "_mmorpg"'
+def match_query(text, filters=None, title=False):
+    terms = search_terms(text)
+    if not terms:
+        return ''
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    if title:
+        phrases = [f"title : ({' '.join(phrases)})"]
+    for facet in FACETS:
+        token = facet_token((filters or {}).get(facet, ''))
+        if token:
+            phrases.append(f'{facet} : "{token}"')
+    return (' AND ' if title else ' ').join(phrases)
+
+
+# Valor exacto de los filtros en games_game (dos valores distintos pueden dar la misma palabra en facet_token)
+# -> condición de la tabla de búsqueda + parámetros => el filtro va antes del LIMIT y las páginas no pierden resultados
+# EXISTS por clave primaria -> solo se comprueban las filas que encuentra el MATCH (no todos los juegos del filtro)
+def filter_sql(filters):
+    if not filters:
+        return '', []
+    table = Game._meta.db_table
+    conditions = ''.join(f" AND {facet} = %s" for facet in FACETS if facet in filters)
+    return (f" AND EXISTS (SELECT 1 FROM {table} WHERE {table}.id = {SEARCH_TABLE}.game_id{conditions})",
+            [filters[facet] for facet in FACETS if facet in filters])
+
+
+# Consulta de una búsqueda por relevancia -> (sql, params) o None si el texto no tiene ninguna palabra
+# Filas: (game_id, rank) por relevancia (rank de FTS5 -> más negativo = más relevante) de TODAS las coincidencias
+# -> ORDER BY rank + LIMIT / OFFSET de la página (SQLite solo guarda las limit + offset mejores al ordenar)
+# ¡¡Solo si hay como mucho rank_limit() coincidencias!! -> probe: cuenta hasta rank_limit() + 1 sin calcular BM25
+#    (CROSS JOIN -> se comprueba antes de recorrer la tabla) => más coincidencias: ninguna fila (ver common_sql)
+def search_sql(text, filters=None, limit=20, offset=0):
+    query = match_query(text, filters)
+    if not query:
+        return None
+    conditions, params = filter_sql(filters)
+    sql = (f"WITH probe (matches) AS (SELECT COUNT(*) FROM (SELECT 1 FROM {SEARCH_TABLE} "
+           f"WHERE {SEARCH_TABLE} MATCH %s LIMIT %s)) "
+           f"SELECT game_id, rank FROM probe CROSS JOIN {SEARCH_TABLE} "
+           f"WHERE matches <= %s AND {SEARCH_TABLE} MATCH %s{conditions} ORDER BY rank LIMIT %s OFFSET %s")
+    return sql, [query, rank_limit() + 1, rank_limit(), query] + params + [limit, offset]
+
+
+# Consulta de una búsqueda con demasiadas coincidencias para BM25 -> (sql, params) o None
+# Filas: (game_id, None) -> primero las que tienen todas las palabras en el título y después el resto,
+# cada grupo en el orden del índice (sin ORDER BY -> el LIMIT corta el recorrido)
+def common_sql(text, filters=None, limit=20, offset=0):
+    query = match_query(text, filters)
+    if not query:
+        return None
+    title = match_query(text, filters, title=True)
+    conditions, params = filter_sql(filters)
+    select = f"SELECT game_id, NULL FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{conditions}"
+    return (f"{select} UNION ALL {select} LIMIT %s OFFSET %s",
+            [title] + params + [f"({query}) NOT ({title})"] + params + [limit, offset])
+
+
+# Texto con las palabras de la búsqueda en <mark> -> HTML escapado
+# snippet -> solo un fragmento de SNIPPET_TOKENS palabras alrededor de la primera coincidencia
+def highlight(text, terms, snippet=False):
+    text = text or ''
+    exact, prefix = set(terms[:-1]), terms[-1]
+    tokens = list(SEARCH_TERMS.finditer(text))
+    found = [index for index, token in enumerate(tokens)
+             if normalize_title(token.group()) in exact or normalize_title(token.group()).startswith(prefix)]
+
+    start, end = 0, len(text)
+    if snippet and len(tokens) > SNIPPET_TOKENS:
+        first = max(min(found[0] if found else 0, len(tokens) - SNIPPET_TOKENS) - SNIPPET_TOKENS // 4, 0)
+        last = min(first + SNIPPET_TOKENS, len(tokens)) - 1
+        start = tokens[first].start() if first else 0
+        end = tokens[last].end() if last < len(tokens) - 1 else len(text)
+
+    html = '…' if start else ''
+    position = start
+    for index in found:
+        token = tokens[index]
+        if token.start() < start or token.end() > end:
+            continue
+        html += escape(text[position:token.start()]) + f"<mark>{escape(token.group())}</mark>"
+        position = token.end()
+    html += escape(text[position:end]) + ('…' if end < len(text) else '')
+    return mark_safe(html)
+
+
+# Buscar juegos -> (resultados de la página, hay más resultados)
+# Cada resultado: {'game', 'rank' (None sin BM25), 'title' (resaltado), 'snippet' (fragmento resaltado de la descripción)}
+# filters -> {'platform': ..., 'genre': ..., 'publisher': ...} (solo los que se filtran)
+# UNA consulta al índice (limit + 1 filas para saber si hay más) + una para cargar los juegos de la página
+# -> ninguna fila por relevancia (demasiadas coincidencias o ninguna) => otra consulta sin BM25 (common_sql)
+def search_games(text, filters=None, limit=20, offset=0):
+    query = search_sql(text, filters, limit + 1, offset)
+    if query is None:
+        return [], False
+    with connection.cursor() as cursor:
+        cursor.execute(*query)
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.execute(*common_sql(text, filters, limit + 1, offset))
+            rows = cursor.fetchall()
+
+    terms = search_terms(text)
+    # is_stale=False -> un juego marcado como obsoleto entre la consulta al índice y esta no sale
+    games = Game.objects.filter(is_stale=False).in_bulk([game_id for game_id, _rank in rows[:limit]])
+    results = []
+    for game_id, rank in rows[:limit]:
+        game = games.get(game_id)
+        if game is None:
+            continue
+        results.append({
+            'game': game,
+            'rank': rank,
+            'title': highlight(game.title, terms),
+            'snippet': highlight(game.description, terms, snippet=True),
+        })
+    return results, len(rows) > limit
@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Comment, Game
+from .search import index_games, remove_games
+from .versions import bump_comments_version, bump_game_versions, bump_titles_version
+
+
+# Juego guardado (valoración en game_detail, admin...) o borrado -> invalidar sus páginas cacheadas
+# + los recuentos de los filtros solo si es nuevo, se borra o cambian sus filtros o is_stale (facets.py)
+# (las escrituras por lotes de ingest.py no lanzan señales -> cambian la versión del catálogo completo)
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_changed(sender, instance, created=False, **kwargs):
+    filters = (instance.platform, instance.genre, instance.publisher)
+    facets = (created or kwargs['signal'] is post_delete or getattr(instance, '_loaded_filters', None) != filters
+              or stale_changed(instance))
+    bump_game_versions(instance, facets=facets)
+    instance._loaded_filters = filters
+
+
+# Juego nuevo, borrado, con otro título o marcado / desmarcado como obsoleto
+# -> nueva versión de los títulos (sugerencias, suggest.py)
+# (antes de game_saved_search: compara con el título de _loaded_search, que se actualiza allí)
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def game_titles_changed(sender, instance, created=False, **kwargs):
+    loaded = getattr(instance, '_loaded_search', None)
+    if (created or kwargs['signal'] is post_delete or loaded is None or loaded[0] != instance.title
+            or stale_changed(instance)):
+        bump_titles_version()
+
+
+# is_stale distinto del que tenía al cargarlo (Game.from_db) -> ej: desmarcado en el admin
+def stale_changed(instance):
+    loaded = getattr(instance, '_loaded_search', None)
+    return loaded is not None and loaded[-1] != instance.is_stale
+
+
+# Índice de búsqueda (search.py) -> solo si es nuevo o ha cambiado alguno de sus campos (texto, filtros o is_stale)
+# (una valoración en game_detail guarda el juego completo pero no cambia ninguno)
+@receiver(post_save, sender=Game)
+def game_saved_search(sender, instance, created, **kwargs):
+    search_fields = (instance.title, instance.description, instance.platform, instance.genre, instance.publisher,
+                     instance.is_stale)
+    if created or getattr(instance, '_loaded_search', None) != search_fields:
+        index_games([instance])
+    instance._loaded_search = search_fields
+
+
+@receiver(post_delete, sender=Game)
+def game_deleted_search(sender, instance, **kwargs):
+    remove_games([instance.pk])
+
+
+# Comentario creado, modificado o borrado (game_detail, admin, juego borrado en cascada)
+# -> invalidar el recuento de comentarios del context processor (context_processors.py)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    bump_comments_version()
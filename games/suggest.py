@@ -0,0 +1,184 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .models import Game, normalize_title
+from .versions import CATALOGUE, TITLES, get_versions
+
+
+# Sugerencias de títulos para el buscador de la cabecera (GET /suggest/?q=...) -> índice de prefijos EN MEMORIA:
+# - Lista ordenada de claves (título normalizado -> Game.title_key) desde el principio de cada palabra
+#   ej: 'star wars the old republic' -> 'star wars...', 'wars the old...', 'the old republic', ...
+#   => prefijo = rango de la lista (bisect), sin LIKE 'x%' en la BD por cada tecla
+# - Los N mejores por valoración de cada prefijo con más de SCAN_LIMIT claves se calculan al crear el índice
+#   (prefijos cortos: 'a', 'st'...) -> el resto se ordena en cada petición (como mucho SCAN_LIMIT claves)
+# - Un índice por proceso: se crea en la primera petición y se vuelve a crear cuando cambian las versiones
+#   del catálogo o de los títulos (games/versions.py) -> se comprueban cada GAME_SUGGEST_REFRESH segundos
+#   => una consulta cada GAME_SUGGEST_REFRESH segundos como mucho, ninguna por cada tecla
+# - Las valoraciones no cambian esas versiones -> el orden se pone al día cada GAME_SUGGEST_MAX_AGE segundos
+# - El índice nuevo se crea en otro hilo -> las peticiones siguen usando el anterior hasta que está listo
+#   (solo la primera petición del proceso espera a que se cree)
+
+# Claves de un rango que se ordenan en cada petición (más -> mejores precalculados):
+SCAN_LIMIT = 256
+# Palabras de un título desde las que se puede empezar a escribir (las primeras):
+MAX_WORD_STARTS = 6
+
+
+def get_limit():
+    return getattr(settings, 'GAME_SUGGEST_LIMIT', 8)
+
+
+def get_refresh():
+    return getattr(settings, 'GAME_SUGGEST_REFRESH', 5)
+
+
+def get_max_age():
+    return getattr(settings, 'GAME_SUGGEST_MAX_AGE', 300)
+
+
+# Índice de prefijos de unos juegos -> entries: [(id, título, valoración, clave normalizada)]
+class SuggestIndex:
+
+    def __init__(self, entries, limit):
+        self.limit = limit
+        # Juegos de mejor a peor valoración media (lo que muestra cada sugerencia) -> posición = orden
+        self.games = sorted(entries, key=lambda entry: (-entry[2], entry[0]))
+
+        # Claves desde el principio de cada palabra -> (clave, posición del juego)
+        keys = []
+        for position, (_game_id, _title, _rating, title_key) in enumerate(self.games):
+            words = title_key.split(' ')
+            for start in range(min(len(words), MAX_WORD_STARTS)):
+                keys.append((' '.join(words[start:]), position))
+        keys.sort()
+        self.keys = [key for key, _position in keys]
+        self.positions = [position for _key, position in keys]
+
+        # Mejores juegos de los prefijos con más de SCAN_LIMIT claves -> {prefijo: [posiciones]}
+        self.top = {}
+        self.collect('', 0, len(self.keys))
+
+    # Mejores juegos de un rango de claves que empiezan por prefix -> guardados si es grande
+    # (se calculan desde los de los prefijos de una letra más -> cada clave se ordena una sola vez)
+    def collect(self, prefix, lo, hi):
+        if hi - lo <= SCAN_LIMIT:
+            return self.best(self.positions[lo:hi])
+
+        depth = len(prefix)
+        candidates = []
+        # Claves iguales al prefijo (las primeras del rango) y después un rango por cada siguiente letra
+        while lo < hi and len(self.keys[lo]) == depth:
+            candidates.append(self.positions[lo])
+            lo += 1
+        while lo < hi:
+            child = prefix + self.keys[lo][depth]
+            end = bisect.bisect_left(self.keys, prefix + chr(ord(child[-1]) + 1), lo, hi)
+            candidates += self.collect(child, lo, end)
+            lo = end
+
+        self.top[prefix] = self.best(candidates)
+        return self.top[prefix]
+
+    # Las `limit` mejores posiciones distintas (un juego puede aparecer con varias claves)
+    def best(self, positions):
+        return sorted(set(positions))[:self.limit]
+
+    # Sugerencias de un texto -> [(id, título, valoración)] de mejor a peor valoración
+    # limit -> como mucho el del índice (0 o None -> el del índice)
+    def suggest(self, text, limit=None):
+        prefix = normalize_title(text)
+        if not prefix:
+            return []
+        positions = self.top.get(prefix)
+        if positions is None:
+            lo = bisect.bisect_left(self.keys, prefix)
+            hi = bisect.bisect_left(self.keys, prefix + '\U0010ffff', lo)
+            positions = self.best(self.positions[lo:hi])
+        return [self.games[position][:3] for position in positions[:min(limit or self.limit, self.limit)]]
+
+
+# Índice del proceso + versiones con las que se creó + cuándo se creó + última comprobación
+# + hilo que está creando el siguiente (None si no hay ninguno)
+_index = None
+_versions = None
+_built_at = 0.0
+_checked_at = 0.0
+_builder = None
+_lock = threading.Lock()
+
+
+# Versiones de las que depende el índice -> catálogo (ingesta) + títulos (juegos creados, borrados o renombrados)
+def index_versions():
+    return get_versions(CATALOGUE, TITLES)
+
+
+def build_index():
+    entries = [(game_id, title, float(rating), title_key or normalize_title(title))
+               for game_id, title, rating, title_key
+               in Game.objects.filter(is_stale=False)
+               .values_list('id', 'title', 'average_rating', 'title_key').iterator()]
+    return SuggestIndex(entries, get_limit())
+
+
+# Índice actual -> lo crea la primera vez; después, cada GAME_SUGGEST_REFRESH segundos, comprueba las versiones
+# UN solo hilo lo comprueba: si han cambiado (o el índice tiene más de GAME_SUGGEST_MAX_AGE segundos)
+# lanza la creación del siguiente en otro hilo => ninguna petición espera (siguen con el anterior)
+def get_index():
+    global _index, _versions, _built_at, _checked_at, _builder
+    if _index is not None and time.monotonic() - _checked_at < get_refresh():
+        return _index
+
+    if not _lock.acquire(blocking=_index is None):
+        return _index
+    try:
+        if _index is None:
+            _versions = index_versions()
+            _index, _built_at = build_index(), time.monotonic()
+            _checked_at = _built_at
+        elif _builder is None and time.monotonic() - _checked_at >= get_refresh():
+            versions = index_versions()
+            if versions != _versions or time.monotonic() - _built_at >= get_max_age():
+                _builder = threading.Thread(target=rebuild_in_thread, args=(versions,), daemon=True)
+                _builder.start()
+            _checked_at = time.monotonic()
+        return _index
+    finally:
+        _lock.release()
+
+
+# Crear el índice nuevo (versiones leídas ANTES de crearlo -> un cambio durante la creación se ve en la siguiente
+# comprobación) y cambiarlo por el anterior
+def rebuild_in_thread(versions):
+    global _index, _versions, _built_at, _builder
+    try:
+        index = build_index()
+        with _lock:
+            _index, _versions, _built_at = index, versions, time.monotonic()
+    finally:
+        with _lock:
+            _builder = None
+        # Conexión del hilo -> se cierra (cada creación es un hilo nuevo)
+        connections.close_all()
+
+
+# Esperar a que termine la creación del índice en curso (pruebas)
+def wait_for_rebuild(timeout=None):
+    builder = _builder
+    if builder is not None:
+        builder.join(timeout)
+
+
+# Olvidar el índice del proceso -> se vuelve a crear en la siguiente petición (pruebas)
+def reset_index():
+    global _index, _versions, _built_at, _checked_at
+    wait_for_rebuild()
+    with _lock:
+        _index, _versions, _built_at, _checked_at = None, None, 0.0, 0.0
+
+
+def suggest_titles(text, limit=None):
+    return get_index().suggest(text, limit)
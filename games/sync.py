@@ -0,0 +1,367 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .feeds import fetch_feed
+from .ingest import GameBatchWriter, IngestStats, default_batch_size, iter_source
+from .models import FeedSyncStatus
+from .thumbnails import cache_thumbnails
+
+
+logger = logging.getLogger(__name__)
+
+
+# Sincronización de las fuentes externas de juegos (settings.GAME_FEEDS):
+# - Se ejecuta FUERA de las vistas -> python manage.py sync_games [--loop]
+# - Cada fuente se refresca según su propio intervalo ('interval' en segundos)
+# - El estado de la última sincronización de cada fuente se guarda en la BD -> FeedSyncStatus
+# - Descarga condicional con caché en disco (games/feeds.py) -> sin cambios = sin parseo ni escrituras
+# - Las fuentes se descargan y parsean en paralelo (hilos, GAME_SYNC_WORKERS) con reintentos y tiempo máximo
+#   -> los juegos parseados llegan por lotes a una cola por fuente y un ÚNICO escritor (hilo principal) los guarda
+#      en el orden de GAME_FEEDS -> si dos fuentes repiten un título se queda siempre el de la primera
+#   => sin escrituras concurrentes en SQLite y el fallo de una fuente no afecta a las demás
+# - Después se descargan las miniaturas nuevas o cambiadas (games/thumbnails.py, GAME_THUMBNAIL_SYNC)
+# => La vista main solo lee de la base de datos (sin descargas bloqueantes por petición)
+
+# Lotes parseados que pueden esperar en la cola de cada fuente (el hilo se bloquea si está llena):
+SYNC_QUEUE_SIZE = 4
+
+
+# El escritor ha fallado -> los hilos de las fuentes dejan de parsear
+class SyncCancelled(Exception):
+    pass
+
+
+# Cola acotada de lotes entre el hilo de una fuente y el escritor
+# cancel() -> un hilo bloqueado en put() con la cola llena deja de esperar (SyncCancelled)
+#   => si el escritor falla, ThreadPoolExecutor no espera para siempre a hilos que nadie va a desbloquear
+class BatchQueue(queue.Queue):
+
+    def __init__(self):
+        super().__init__(maxsize=SYNC_QUEUE_SIZE)
+        self.cancelled = threading.Event()
+
+    def put(self, item, block=True, timeout=None):
+        while not self.cancelled.is_set():
+            try:
+                return super().put(item, timeout=0.1)
+            except queue.Full:
+                pass
+        raise SyncCancelled("The writer stopped before the source was written")
+
+    # Fin de la fuente -> ('done', None) (nada que avisar si el escritor ya no lee)
+    def done(self):
+        try:
+            self.put(('done', None))
+        except SyncCancelled:
+            pass
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+# Fuentes configuradas en settings.py:
+def get_feeds():
+    return getattr(settings, 'GAME_FEEDS', [])
+
+
+# Ver si una fuente debe sincronizarse ya:
+# -> nunca sincronizada o ha pasado su intervalo desde que terminó la última sincronización
+def is_due(feed, status, now=None):
+    if status is None or status.last_finished is None:
+        return True
+    now = now or timezone.now()
+    return (now - status.last_finished).total_seconds() >= feed.get('interval', 0)
+
+
+# Informe de la sincronización de una fuente -> tiempos de cada fase y juegos escritos
+class SourceReport:
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.name = feed['name']
+        self.result = None          # FeedResult de la descarga
+        self.unchanged = False      # Mismo contenido que la última sincronización correcta
+        self.error = None           # Excepción de la descarga, el parseo o la escritura
+        self.attempts = 0
+        self.fetch_time = 0.0       # Descarga con todos sus reintentos
+        self.parse_time = 0.0       # Parseo (sin contar la espera a que el escritor libere la cola)
+        self.write_time = 0.0       # Escrituras en la BD
+        self.stats = IngestStats()
+
+    @property
+    def total_time(self):
+        return self.fetch_time + self.parse_time + self.write_time
+
+    def __str__(self):
+        if self.error is not None:
+            outcome = f"error ({self.error})"
+        elif self.unchanged:
+            outcome = "unchanged"
+        else:
+            outcome = (f"{self.stats.inserted} inserted, {self.stats.updated} updated, "
+                       f"{self.stats.skipped} skipped, {self.stats.stale} stale")
+        if self.result is not None and self.result.status == 'fallback':
+            outcome += f" from the cached copy ({self.result.error})"
+        return (f"{self.name}: fetch {self.fetch_time:.2f}s ({self.attempts} attempts), "
+                f"parse {self.parse_time:.2f}s, write {self.write_time:.2f}s, "
+                f"total {self.total_time:.2f}s -> {outcome}")
+
+
+# Descargar una fuente con reintentos (espera creciente entre intentos) sin pasar de su tiempo máximo
+# -> se reintenta si la descarga falla o si se ha tenido que usar la copia en caché (fallback)
+# -> agotados los reintentos: último fallback o se propaga el error
+def fetch_with_retries(report):
+    feed = report.feed
+    retries = feed.get('retries', getattr(settings, 'GAME_FEED_RETRIES', 2))
+    backoff = getattr(settings, 'GAME_FEED_RETRY_BACKOFF', 2)
+    timeout = feed.get('timeout') or getattr(settings, 'GAME_FEED_TIMEOUT', 30)
+    deadline = time.monotonic() + feed.get('deadline', getattr(settings, 'GAME_FEED_DEADLINE', 120))
+
+    while True:
+        report.attempts += 1
+        # Cada intento solo dispone del tiempo que queda hasta el tiempo máximo de la fuente:
+        remaining = deadline - time.monotonic()
+        try:
+            result = fetch_feed(feed['url'], timeout=max(min(timeout, remaining), 0.1))
+            if result.status != 'fallback':
+                return result
+            error = None
+        except Exception as e:
+            error = e
+
+        # Sin reintentos o sin tiempo para esperar y volver a intentarlo -> resultado final
+        if report.attempts > retries or time.monotonic() + backoff >= deadline:
+            if error is not None:
+                raise error
+            return result
+
+        time.sleep(backoff)
+        backoff *= 2
+
+
+# Parsear una fuente ya abierta (flujo de bytes) -> lotes de batch_size juegos a la cola de la fuente
+# -> report.parse_time sin contar la espera a que el escritor libere la cola
+def parse_batches(report, stream, batch_size, batches):
+    started = time.perf_counter()
+    waited = 0.0
+    batch = []
+    for game_data in iter_source(report.feed['format'], stream, report.feed['prefix']):
+        batch.append(game_data)
+        if len(batch) >= batch_size:
+            # Cola llena -> el hilo espera al escritor (memoria acotada)
+            put_started = time.perf_counter()
+            batches.put(('batch', batch))
+            waited += time.perf_counter() - put_started
+            batch = []
+    if batch:
+        batches.put(('batch', batch))
+    report.parse_time = time.perf_counter() - started - waited
+
+
+# Trabajo de cada hilo: descargar y parsear una fuente -> lotes de juegos a la cola de la fuente
+# -> NO accede a la base de datos (el hash de la última sincronización se recibe como parámetro)
+# -> siempre termina con ('done', None) en la cola, también si hay error (salvo si el escritor ya ha parado)
+def fetch_and_parse(report, content_hash, batch_size, batches):
+    try:
+        started = time.perf_counter()
+        try:
+            report.result = fetch_with_retries(report)
+        finally:
+            report.fetch_time = time.perf_counter() - started
+
+        # Mismo contenido que la última sincronización correcta -> nada que parsear
+        if report.result.content_hash == content_hash:
+            report.unchanged = True
+            return
+
+        with report.result.open() as response:
+            parse_batches(report, response, batch_size, batches)
+
+    except Exception as e:
+        report.error = e
+
+    finally:
+        batches.done()
+
+
+# Escribir un lote de juegos de una fuente -> una transacción por lote
+# -> un mismo GameBatchWriter para todas las fuentes: los títulos ya guardados por una fuente no se duplican en otra
+# -> lote con error -> writer.rollback(): las demás fuentes no ven los juegos que no se han guardado
+def write_batch(writer, report, batch):
+    started = time.perf_counter()
+    # Estadísticas de la fuente del lote:
+    writer.stats = report.stats
+    try:
+        with transaction.atomic():
+            for game_data in batch:
+                writer.add(game_data)
+            writer.flush()
+    except Exception as e:
+        # Error de escritura -> se descarta el resto de la fuente (las demás siguen)
+        report.error = e
+        writer.rollback()
+    report.write_time += time.perf_counter() - started
+
+
+# Fuente recorrida completa -> marcar como obsoletos sus juegos que ya no aparecen (ver GameBatchWriter.mark_stale)
+def mark_stale(writer, report):
+    started = time.perf_counter()
+    writer.stats = report.stats
+    try:
+        with transaction.atomic():
+            writer.mark_stale(report.feed['prefix'])
+    except Exception as e:
+        report.error = e
+    report.write_time += time.perf_counter() - started
+
+
+# Escritor único: escribir los lotes de la cola de una fuente hasta que su hilo termina
+# -> fuente completa y sin errores -> marcar sus juegos obsoletos (stale=False -> no: ej. import_games sin --mark-stale)
+# on_batch -> función on_batch(report) llamada tras cada lote escrito (ej: progreso de import_games)
+def write_source(writer, report, batches, on_batch=None, stale=True):
+    while True:
+        kind, batch = batches.get()
+        if kind == 'done':
+            break
+        if report.error is None:
+            write_batch(writer, report, batch)
+            if on_batch is not None:
+                on_batch(report)
+
+    if stale and report.error is None and not report.unchanged:
+        mark_stale(writer, report)
+
+
+# Desbloquear los hilos de las fuentes que aún esperan al escritor (ver BatchQueue)
+def cancel_queues(queues):
+    for batches in queues:
+        batches.cancel()
+
+
+# Guardar el resultado de la sincronización de una fuente en su FeedSyncStatus:
+# -> si la fuente falla a mitad del parseo, los lotes ya escritos se mantienen y el hash NO se guarda
+#    (la siguiente sincronización vuelve a procesarla; los juegos ya guardados se omiten)
+def finish_status(status, report):
+    if report.error is not None:
+        # Error de descarga (sin copia en caché), de parseo o de escritura -> se guarda para consultarlo (admin)
+        status.status = 'error'
+        status.last_error = str(report.error)
+        status.games_created = report.stats.inserted
+    elif report.result.status == 'fallback':
+        # La fuente ha fallado -> se ha usado la última copia correcta de la caché
+        status.status = 'error'
+        status.last_error = f"Using cached copy: {report.result.error}"
+        status.games_created = report.stats.inserted
+        if not report.unchanged:
+            status.content_hash = report.result.content_hash
+    else:
+        status.status = 'unchanged' if report.unchanged else 'ok'
+        status.games_created = report.stats.inserted
+        status.content_hash = report.result.content_hash
+        status.last_success = timezone.now()
+        status.last_error = ''
+
+    status.last_finished = timezone.now()
+    status.save()
+
+
+# Sincronizar varias fuentes a la vez y guardar su estado en la BD
+# -> devuelve sus FeedSyncStatus actualizados (mismo orden que feeds), cada uno con su informe (status.report)
+# workers -> número máximo de fuentes descargándose a la vez (None = settings.GAME_SYNC_WORKERS)
+def sync_feeds(feeds, workers=None):
+    if not feeds:
+        return []
+    workers = workers or getattr(settings, 'GAME_SYNC_WORKERS', 4)
+    batch_size = default_batch_size()
+
+    # Marcar las fuentes como en curso:
+    statuses = []
+    for feed in feeds:
+        status, _created = FeedSyncStatus.objects.get_or_create(source=feed['name'])
+        status.status = 'running'
+        status.last_started = timezone.now()
+        status.save(update_fields=['status', 'last_started'])
+        status.report = SourceReport(feed)
+        statuses.append(status)
+
+    # Una cola acotada por fuente entre su hilo (descarga + parseo) y el escritor -> memoria acotada
+    queues = [BatchQueue() for _status in statuses]
+    writer = GameBatchWriter(batch_size=batch_size)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for status, batches in zip(statuses, queues):
+            pool.submit(fetch_and_parse, status.report, status.content_hash, batch_size, batches)
+
+        # Escritor único: fuentes en el orden de GAME_FEEDS (las demás siguen descargándose mientras tanto)
+        try:
+            for status, batches in zip(statuses, queues):
+                write_source(writer, status.report, batches)
+        finally:
+            # Escritor terminado (o con error) -> ningún hilo sigue esperando en una cola llena
+            cancel_queues(queues)
+
+    for status in statuses:
+        status.report.stats.elapsed = status.report.write_time
+        finish_status(status, status.report)
+    return statuses
+
+
+# Sincronizar una fuente -> devuelve el FeedSyncStatus actualizado
+# -> si el contenido de la fuente no ha cambiado (304 o mismo hash) NO se parsea ni se toca la BD
+def sync_feed(feed):
+    return sync_feeds([feed])[0]
+
+
+# Sincronizar todas las fuentes pendientes (o todas si force=True)
+# sources -> lista de nombres de fuentes a sincronizar (None = todas)
+def sync_due_feeds(force=False, sources=None):
+    # Estados guardados de todas las fuentes en una sola consulta:
+    statuses = {status.source: status for status in FeedSyncStatus.objects.all()}
+    now = timezone.now()
+
+    due = []
+    for feed in get_feeds():
+        if sources and feed['name'] not in sources:
+            continue
+        if force or is_due(feed, statuses.get(feed['name']), now):
+            due.append(feed)
+    results = sync_feeds(due)
+
+    # Miniaturas de los juegos nuevos o con la miniatura cambiada:
+    if results and getattr(settings, 'GAME_THUMBNAIL_SYNC', True):
+        cached, failed = cache_thumbnails()
+        if cached or failed:
+            print(f"Miniaturas: {cached} guardadas, {failed} con error")
+    return results
+
+
+# Worker en segundo plano: comprobar las fuentes pendientes cada poll_interval segundos
+# iterations -> número de comprobaciones (None = infinito)
+# on_status -> función on_status(status) llamada con cada fuente sincronizada (ej: informe en la salida de sync_games)
+#    (None -> el informe va al logger)
+# Error en una comprobación (ej: "database is locked" con la web, miniaturas) -> se registra y se sigue
+# con la siguiente => el worker no se para
+def run_scheduler(poll_interval=None, iterations=None, on_status=None):
+    if poll_interval is None:
+        poll_interval = getattr(settings, 'GAME_SYNC_POLL_INTERVAL', 60)
+
+    done = 0
+    while iterations is None or done < iterations:
+        try:
+            for status in sync_due_feeds():
+                if on_status is None:
+                    logger.info("%s", status.report)
+                else:
+                    on_status(status)
+        except Exception:
+            logger.exception("Feed sync failed, retrying in %ss", poll_interval)
+        done += 1
+        if iterations is None or done < iterations:
+            time.sleep(poll_interval)
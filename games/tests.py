@@ -1,9 +1,43 @@
-from django.test import TestCase, Client
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import io
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.template import RequestContext, Template
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext as _, activate
+from PIL import Image
 
-from .models import Game, Comment, UserGameFollow, ValidPassword
+from .models import (Game, Comment, UserGameFollow, ValidPassword, FeedSyncStatus, GameAlias, normalize_title,
+                     thumbnail_name, UserStats, Like)
+from .feeds import fetch_feed
+from .ingest import JsonArrayReader, game_data_from_json, ingest_games, iter_xml_games
+from .likes import reconcile_like_counts, toggle_vote, user_vote, write_votes
+from .pagination import GAME_ORDERING, encode_cursor
+from .ratings import add_rating, average, rank_score, write_transaction
+from .search import rebuild_index, search_games, search_rowid
+from .suggest import SuggestIndex, build_index, reset_index, suggest_titles, wait_for_rebuild
+from .sync import run_scheduler, sync_due_feeds
+from .thumbnails import cache_thumbnails, thumbnail_path
+from .utils import load_games, load_json
+from .versions import CATALOGUE, FACET_COUNTS, TITLES, bump_ingest_versions, get_versions
+from . import vote_buffer
+from .vote_buffer import flush_votes, pending_votes
 
 
 class GameRankTests(TestCase):
@@ -153,6 +187,22 @@ class GameRankTests(TestCase):
         for gid in rated_game_ids:
             self.assertContains(response, gid)
 
+    def test_rated_games_page_does_not_trust_the_user_counters(self):
+        game = Game.objects.create(
+            id="GAME0", title="Rated Game 0", genre="Action", platform="PC", publisher="Pub", developer="Dev",
+            release_date="2024-01-01", description="Great game",
+            freetogame_profile_url="https://x", game_url="https://x", thumbnail="https://x"
+        )
+        # Recuentos del usuario desfasados (UserStats) -> la página sale de sus valoraciones
+        UserStats.objects.create(user=self.user, rated_games_count=3)
+        self.assertContains(self.client.get(reverse("rated_games")), "Any rating has been done yet!!")
+
+        Comment.objects.create(game=game, user=self.user, rating=4)
+        UserStats.objects.filter(user=self.user).update(rated_games_count=0)
+        response = self.client.get(reverse("rated_games"))
+        self.assertContains(response, "Rated Game 0")
+        self.assertNotContains(response, "Any rating has been done yet!!")
+
     def test_followed_games_page(self):
         followed_game_ids = []
         for i in range(3):
@@ -277,3 +327,1879 @@ class GameRankTests(TestCase):
         response = self.client.get(reverse("main"), {"genre": "Shooter"})
         self.assertNotContains(response, self.game.title)
 
+
+# Fuentes de prueba -> servidas por un servidor HTTP local (FeedServer), sin acceso a internet
+TEST_XML = b"""<games>
+<game><id>1</id><title>Xml Game</title><platform>PC</platform><genre>MMORPG</genre><developer>Dev</developer>
+<publisher>Pub</publisher><release_date>2014-02-30</release_date><short_description>Test</short_description>
+<freetogame_profile_url>https://x</freetogame_profile_url><game_url>https://x</game_url><thumbnail>https://x</thumbnail></game>
+</games>"""
+TEST_JSON = json.dumps([
+    {'id': 1, 'title': 'Json Game', 'platform': 'PC', 'genre': 'Shooter', 'developer': 'Dev', 'publisher': 'Pub',
+     'release_date': None, 'short_description': 'Test', 'profile_url': 'https://x', 'game_url': 'https://x',
+     'thumbnail': 'https://x'},
+    {'id': 2, 'title': 'Xml Game', 'platform': 'PC', 'genre': 'MMORPG', 'developer': 'Dev', 'publisher': 'Pub',
+     'release_date': '2020-01-01', 'short_description': 'Test', 'profile_url': 'https://x', 'game_url': 'https://x',
+     'thumbnail': 'https://x'},
+]).encode()
+
+
+# Servidor HTTP local que hace de fuente externa:
+# routes -> {path: {'body': bytes, 'etag': str | None, 'status': int, 'delay': segundos, 'failures': int}}
+# failures -> número de peticiones que responden 503 antes de responder normalmente
+class FeedServer:
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []      # (path, If-None-Match) de cada petición recibida
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                route = server.routes.get(self.path, {'status': 404, 'body': b''})
+                server.requests.append((self.path, self.headers.get('If-None-Match')))
+                time.sleep(route.get('delay', 0))
+
+                if route.get('failures'):
+                    route['failures'] -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+
+                etag = route.get('etag')
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(route.get('status', 200))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(route['body'])))
+                self.end_headers()
+                try:
+                    self.wfile.write(route['body'])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass    # El cliente ha cortado la conexión (timeout)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# Test con servidor de fuentes local y caché de fuentes en un directorio temporal:
+class FeedServerTestCase(TestCase):
+
+    def setUp(self):
+        self.server = FeedServer({
+            '/listado.xml': {'body': TEST_XML, 'etag': '"v1"'},
+            '/games': {'body': TEST_JSON},
+        })
+        self.addCleanup(self.server.stop)
+
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        self.feeds = [
+            {'name': 'xml-feed', 'format': 'XML', 'url': self.server.url('/listado.xml'),
+             'prefix': 'LIS1-', 'interval': 3600},
+            {'name': 'json-feed', 'format': 'JSON', 'url': self.server.url('/games'),
+             'prefix': 'LIS2-', 'interval': 60, 'timeout': 1},
+        ]
+        # Sin reintentos por defecto (cada test de reintentos los activa en su fuente)
+        # Miniaturas en un directorio temporal y sin descargarlas al sincronizar (ver ThumbnailTests)
+        settings_override = override_settings(GAME_FEEDS=self.feeds, GAME_FEED_CACHE_DIR=cache_dir.name,
+                                              GAME_FEED_RETRIES=0, GAME_FEED_RETRY_BACKOFF=0.05,
+                                              GAME_THUMBNAIL_DIR=cache_dir.name, GAME_THUMBNAIL_SYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MainQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+
+    def create_games(self, count):
+        games = Game.objects.bulk_create([
+            Game(id=f'LIS2-{i}', title=f"Game {i}", platform='PC', genre='Shooter', developer='Dev',
+                 publisher='Pub', release_date='2020-01-01', description='Test', freetogame_profile_url='https://x',
+                 game_url='https://x', thumbnail='https://x') for i in range(Game.objects.count(), count)])
+        UserGameFollow.objects.bulk_create(UserGameFollow(user=self.user, game=game) for game in games[::2])
+        # Como la ingesta -> nueva versión del catálogo y de los filtros (bulk_create no lanza señales)
+        bump_ingest_versions()
+
+    def test_main_query_count_does_not_depend_on_catalogue_size(self):
+        # Sesión (2) + versiones de la caché (1) + juegos de la página (1) + seguimiento de los juegos de la página (1)
+        # + filtros (versiones + consulta agrupada al cambiar el catálogo) (2) + context processor stats y perfil (3)
+        # -> no depende del número de juegos (el recuento del filtro sale de las combinaciones de filtros)
+        # (la primera visita a una combinación de filtros crea su versión -> se hace antes de medir)
+        self.client.get(reverse("main"), {'genre': 'Shooter'})
+        for count in (5, 100):
+            self.create_games(count)
+            with self.assertNumQueries(10):
+                response = self.client.get(reverse("main"), {'genre': 'Shooter'})
+            self.assertEqual(response['X-Page-Cache'], 'miss')
+            self.assertEqual(len(response.context['games']), min(count, 30))
+
+        # El seguimiento de cada juego viene en UNA consulta para toda la página:
+        self.assertContains(response, f'action="{reverse("unfollow_game", args=["LIS2-0"])}"')
+        self.assertContains(response, f'action="{reverse("follow_game", args=["LIS2-1"])}"')
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client.login(username="testuser", password="testpass")
+        Game.objects.bulk_create([
+            Game(id=f'LIS2-{i}', title=f"Game {i}", platform='PC', genre=('Shooter', 'MMORPG')[i % 2],
+                 developer='Dev', publisher='Pub', release_date='2020-01-01', description='Test',
+                 freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+            for i in range(6)])
+
+    def get(self, client=None, **params):
+        return (client or self.client).get(reverse("main"), params)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.get(genre='Shooter')
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+
+        # Sin juegos ni recuento: sesión (2) + versiones (1) + seguimiento (1) + versiones de los filtros (1)
+        # + context processor (3)
+        with self.assertNumQueries(8):
+            second = self.get(genre='Shooter')
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertContains(second, "Game 0")
+        self.assertNotContains(second, "Game 1")
+        # El mensaje de filtrado usa el recuento de los filtros (games/facets.py):
+        self.assertContains(second, "3 games found with selected filters!!!")
+
+        # Filtros normalizados -> misma entrada
+        self.assertEqual(self.get(genre=' Shooter ')['X-Page-Cache'], 'hit')
+
+    def test_follow_buttons_are_per_user(self):
+        UserGameFollow.objects.create(user=self.user, game_id='LIS2-0')
+        unfollow = f'action="{reverse("unfollow_game", args=["LIS2-0"])}"'
+        self.assertContains(self.get(), unfollow)
+
+        # Misma entrada de la caché para otro usuario y para un anónimo -> sus propios botones
+        other = Client()
+        User.objects.create_user(username="other", password="testpass")
+        other.login(username="other", password="testpass")
+        response = self.get(other)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertNotContains(response, unfollow)
+        self.assertContains(response, f'action="{reverse("follow_game", args=["LIS2-0"])}"')
+
+        response = self.get(Client())
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, "Log in to follow this game")
+
+    def test_game_save_invalidates_only_its_filter_combinations(self):
+        for params in ({}, {'genre': 'Shooter'}, {'genre': 'MMORPG'}):
+            self.get(**params)
+
+        # Nueva valoración de un juego de Shooter (game_detail -> game.save())
+        game = Game.objects.get(id='LIS2-0')
+        game.average_rating = 4.5
+        game.vote_count = 1
+        game.save()
+
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        response = self.get(genre='Shooter')
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "4.5")
+        # Otro género -> no cambia
+        self.assertEqual(self.get(genre='MMORPG')['X-Page-Cache'], 'hit')
+
+        # Cambiar el género -> se invalidan el anterior y el nuevo
+        game.genre = 'MMORPG'
+        game.save()
+        self.assertEqual(self.get(genre='Shooter')['X-Page-Cache'], 'miss')
+        self.assertContains(self.get(genre='MMORPG'), "Game 0")
+
+    def test_ingestion_and_language_change_the_entry(self):
+        self.get()
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+
+        ingest_games([{
+            'id': 'LIS2-99', 'title': "New Game", 'platform': 'PC', 'genre': 'Shooter', 'developer': 'Dev',
+            'publisher': 'Pub', 'release_date': '2020-01-01', 'description': 'Test',
+            'freetogame_profile_url': 'https://x', 'game_url': 'https://x', 'thumbnail': 'https://x'}])
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, "New Game")
+
+        # Otro idioma -> otra entrada
+        self.client.cookies[settings.LANGUAGE_COOKIE_NAME] = 'es'
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+
+    def test_page_parameter_is_normalized(self):
+        self.get()
+        # Cursores no válidos -> primera página => misma entrada
+        for page in ('garbage', 'x' * 200, '=='):
+            self.assertEqual(self.get(page=page)['X-Page-Cache'], 'hit')
+
+        # Mismo cursor con otra codificación (relleno '=') -> misma entrada
+        cursor = encode_cursor([Decimal('0'), 'LIS2-1'], 2)
+        self.assertEqual(self.get(page=cursor)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get(page=cursor + '=' * (-len(cursor) % 4))['X-Page-Cache'], 'hit')
+
+    @override_settings(GAME_PAGINATION='offset')
+    def test_offset_page_parameter_is_normalized(self):
+        self.get()
+        # Números no válidos -> página 1; fuera de rango -> la última (la única)
+        for page in ('abc', '1', '999'):
+            self.assertEqual(self.get(page=page)['X-Page-Cache'], 'hit')
+
+    @override_settings(GAME_PAGE_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        self.get()
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+
+    def test_cache_stats(self):
+        self.get()
+        self.get()
+        self.get(genre='Shooter')
+
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        response = self.client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, 404)
+
+        self.user.is_staff = True
+        self.user.save()
+        stats = self.client.get(reverse("cache_stats")).json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertEqual(stats['hit_ratio'], 0.333)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        # 65 juegos con puntuaciones repetidas -> el desempate por id decide el orden
+        Game.objects.bulk_create([
+            Game(id=f'LIS2-{i:03d}', title=f"Game {i}", platform='PC', genre='Shooter', developer='Dev',
+                 publisher='Pub', release_date='2020-01-01', description='Test', freetogame_profile_url='https://x',
+                 game_url='https://x', thumbnail='https://x', rank_score=i % 3) for i in range(65)])
+        self.expected = list(Game.objects.order_by(*GAME_ORDERING).values_list('id', flat=True))
+
+    def page_ids(self, response):
+        return [game.id for game in response.context['games']]
+
+    def test_main_walks_all_pages_forward_and_back(self):
+        response = self.client.get(reverse("main"))
+        pages = [self.page_ids(response)]
+        while response.context['games'].has_next():
+            response = self.client.get(reverse("main"), {'page': response.context['games'].next_cursor})
+            pages.append(self.page_ids(response))
+
+        # Todos los juegos una sola vez y en orden:
+        self.assertEqual([len(page) for page in pages], [30, 30, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(response.context['games'].number, 3)
+        self.assertContains(response, "Page 3")
+
+        # Hacia atrás -> mismas páginas
+        response = self.client.get(reverse("main"), {'page': response.context['games'].previous_cursor})
+        self.assertEqual(self.page_ids(response), pages[1])
+        self.assertEqual(response.context['games'].number, 2)
+        # De la página 2 a la 1 -> enlace sin cursor
+        self.assertEqual(response.context['games'].previous_cursor, '')
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        first = self.client.get(reverse("main"))
+        second = self.client.get(reverse("main"), {'page': first.context['games'].next_cursor})
+        cursor = second.context['games'].next_cursor
+
+        # Sesión (2) + versiones de la caché (1) + juegos de la página (1) + seguimiento (1)
+        # + versiones de los filtros (1) + context processor stats y perfil (3) -> sin COUNT ni OFFSET
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main"), {'page': cursor})
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertEqual(len(queries), 9)
+        listing = [query['sql'] for query in queries if 'LIMIT 31' in query['sql']]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('COUNT(', listing[0].upper())
+        self.assertNotIn('OFFSET', listing[0].upper())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        for cursor in ('3', 'not-a-cursor', 'eyJ2IjpbXX0'):
+            # Cursor no válido -> misma entrada de la caché que la primera página => sin caché para ver la consulta
+            cache.clear()
+            response = self.client.get(reverse("main"), {'page': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.page_ids(response), self.expected[:30])
+
+    def test_filters_are_kept_in_cursor_links(self):
+        response = self.client.get(reverse("main"), {'genre': 'Shooter'})
+        self.assertContains(response, f"?genre=Shooter&page={response.context['games'].next_cursor}")
+
+    @override_settings(GAME_PAGINATION='offset')
+    def test_offset_mode(self):
+        response = self.client.get(reverse("main"), {'page': 2})
+        self.assertEqual(self.page_ids(response), self.expected[30:60])
+        self.assertContains(response, "Page 2 of 3")
+
+    def test_comments_pages_in_htmx_partial(self):
+        game = Game.objects.get(id='LIS2-000')
+        comments = Comment.objects.bulk_create([Comment(game=game, user='testuser', text=f"Comment {i}")
+                                                for i in range(7)])
+        # Misma fecha en todos -> el desempate por id mantiene el orden entre páginas
+        Comment.objects.filter(game=game).update(timestamp=timezone.now())
+        expected = list(Comment.objects.filter(game=game).order_by('-timestamp', 'id').values_list('id', flat=True))
+
+        url = reverse("game_detail", args=[game.id])
+        first = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(first, 'games/comments_section.html')
+        cursor = first.context['comments'].next_cursor
+        self.assertContains(first, f"?page={cursor}")
+
+        second = self.client.get(url, {'page': cursor}, HTTP_HX_REQUEST='true')
+        ids = [comment.id for comment in first.context['comments']] + \
+              [comment.id for comment in second.context['comments']]
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(comments), 7)
+        self.assertFalse(second.context['comments'].has_next())
+
+    def test_rated_games_comment_pages(self):
+        game = Game.objects.get(id='LIS2-000')
+        Comment.objects.create(game=game, user='testuser', rating=4, text="Rated")
+        for i in range(6):
+            Comment.objects.create(game=game, user='testuser', text=f"Comment {i}")
+
+        response = self.client.get(reverse("rated_games"))
+        rated_game = response.context['rated_games'][0]
+        # Primero la valoración y después el resto de comentarios (recientes a antiguos)
+        self.assertEqual([comment.text for comment in rated_game['comments']],
+                         ["Rated", "Comment 5", "Comment 4", "Comment 3", "Comment 2"])
+
+        response = self.client.get(reverse("rated_games"),
+                                   {f'page_{game.id}': rated_game['comments'].next_cursor})
+        self.assertEqual([comment.text for comment in response.context['rated_games'][0]['comments']],
+                         ["Comment 1", "Comment 0"])
+
+    # Valoraciones del usuario en los primeros juegos (más comentarios en cada uno)
+    def rate_games(self, count, comments=0):
+        Comment.objects.bulk_create(
+            [Comment(game_id=f'LIS2-{i:03d}', user='testuser', rating=4, text="Rated") for i in range(count)]
+            + [Comment(game_id=f'LIS2-{i:03d}', user='testuser', text=f"Comment {j}")
+               for i in range(count) for j in range(comments)])
+        Comment.objects.update(timestamp=timezone.now())
+        call_command('reconcile_user_stats', stdout=io.StringIO())
+
+    def test_rated_games_query_count_does_not_depend_on_rated_games(self):
+        counts = []
+        for rated in (1, 3, 40):
+            Comment.objects.all().delete()
+            self.rate_games(rated, comments=7)
+            # Primera visita -> versiones y recuentos cacheados del pie de página (se hace antes de medir)
+            self.client.get(reverse("rated_games"))
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("rated_games"))
+            self.assertEqual(len(response.context['rated_games']), min(rated, 5))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[-1])
+        self.assertEqual(counts[1], counts[-1])
+
+    def test_rated_games_comment_pages_are_independent(self):
+        self.rate_games(2, comments=12)
+        first, second = self.client.get(reverse("rated_games")).context['rated_games']
+        self.assertFalse(first['comments'].has_previous())
+
+        # Página 2 del primer juego y 3 del segundo a la vez -> cada uno con su cursor
+        params = {f"page_{first['game'].id}": first['comments'].next_cursor}
+        second_page = self.client.get(reverse("rated_games"),
+                                      {f"page_{second['game'].id}": second['comments'].next_cursor})
+        params[f"page_{second['game'].id}"] = second_page.context['rated_games'][1]['comments'].next_cursor
+        first, second = self.client.get(reverse("rated_games"), params).context['rated_games']
+        self.assertEqual(first['comments'].number, 2)
+        self.assertEqual(second['comments'].number, 3)
+        self.assertEqual(len(second['comments']), 3)
+        self.assertFalse(second['comments'].has_next())
+
+        # Hacia atrás en el segundo (el primero sigue en su página 2)
+        params[f"page_{second['game'].id}"] = second['comments'].previous_cursor
+        first_again, back = self.client.get(reverse("rated_games"), params).context['rated_games']
+        self.assertEqual([comment.id for comment in first_again['comments']],
+                         [comment.id for comment in first['comments']])
+        self.assertEqual(back['comments'].number, 2)
+        self.assertEqual([comment.id for comment in back['comments']],
+                         [comment.id for comment in second_page.context['rated_games'][1]['comments']])
+
+    @override_settings(GAME_PAGINATION='offset')
+    def test_rated_games_offset_mode(self):
+        self.rate_games(2, comments=7)
+        response = self.client.get(reverse("rated_games"), {'page_LIS2-000': 2})
+        pages = {rated['game'].id: rated['comments'] for rated in response.context['rated_games']}
+        self.assertEqual((pages['LIS2-000'].number, len(pages['LIS2-000'])), (2, 3))
+        self.assertEqual((pages['LIS2-001'].number, len(pages['LIS2-001'])), (1, 5))
+
+
+class QueryPlanTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        Game.objects.bulk_create([
+            Game(id=f'LIS2-{i:03d}', title=f"Game {i}", platform=('PC', 'Web')[i % 2], genre='Shooter',
+                 developer='Dev', publisher='Pub', release_date='2020-01-01', description='Test',
+                 freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x') for i in range(40)])
+        self.game = Game.objects.get(id='LIS2-000')
+        Comment.objects.create(game=self.game, user='testuser', rating=4, text="Rated")
+        for i in range(6):
+            Comment.objects.create(game=self.game, user='testuser', text=f"Comment {i}")
+        UserGameFollow.objects.create(user=self.user, game=self.game)
+
+    # Plan (EXPLAIN QUERY PLAN) de cada consulta de una petición -> [(sql, [pasos del plan])]
+    def query_plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append((query['sql'], [row[3] for row in cursor.fetchall()]))
+        return response, plans
+
+    # Ninguna consulta recorre una tabla entera sin índice (SCAN <tabla>)
+    def assertNoFullScan(self, plans):
+        for sql, plan in plans:
+            for step in plan:
+                self.assertNotRegex(step, r'^SCAN (games|auth|django)_\w+$', f"Full table scan in: {sql}")
+
+    # La consulta del listado usa el índice esperado y sale ya ordenada (sin ordenar en una tabla temporal)
+    def assertListingUses(self, plans, table, index):
+        listing = [plan for sql, plan in plans if f'FROM "{table}"' in sql and 'LIMIT' in sql]
+        self.assertTrue(listing)
+        self.assertTrue(any(index in step for step in listing[0]), listing[0])
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', listing[0])
+
+    def test_main_plans(self):
+        response, plans = self.query_plans(reverse("main"))
+        self.assertNoFullScan(plans)
+        self.assertListingUses(plans, 'games_game', 'game_rank_idx')
+
+        cursor = response.context['games'].next_cursor
+        _response, plans = self.query_plans(reverse("main"), {'page': cursor})
+        self.assertNoFullScan(plans)
+        self.assertListingUses(plans, 'games_game', 'game_rank_idx')
+
+        for params, index in (({'platform': 'PC'}, 'game_platform_rank_idx'),
+                              ({'genre': 'Shooter', 'page': cursor}, 'game_genre_rank_idx'),
+                              ({'publisher': 'Pub'}, 'game_publisher_rank_idx'),
+                              ({'platform': 'PC', 'genre': 'Shooter', 'publisher': 'Pub'}, '_rank_idx')):
+            _response, plans = self.query_plans(reverse("main"), params)
+            self.assertNoFullScan(plans)
+            self.assertListingUses(plans, 'games_game', index)
+
+    def test_game_detail_plans(self):
+        response, plans = self.query_plans(reverse("game_detail", args=[self.game.id]))
+        self.assertNoFullScan(plans)
+        self.assertListingUses(plans, 'games_comment', 'comment_game_recent_idx')
+
+        cursor = response.context['comments'].next_cursor
+        _response, plans = self.query_plans(reverse("game_detail", args=[self.game.id]), {'page': cursor})
+        self.assertNoFullScan(plans)
+        self.assertListingUses(plans, 'games_comment', 'comment_game_recent_idx')
+
+    def test_user_lists_plans(self):
+        _response, plans = self.query_plans(reverse("rated_games"))
+        self.assertNoFullScan(plans)
+        self.assertTrue(any('comment_user_game_idx' in step for _sql, plan in plans for step in plan))
+
+        _response, plans = self.query_plans(reverse("followed_games"))
+        self.assertNoFullScan(plans)
+
+    def test_like_counts_use_covering_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(reconcile_like_counts(), 0)
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[3] for row in cursor.fetchall()]
+                self.assertTrue(any('COVERING INDEX like_comment_vote_idx' in step for step in plan), plan)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.create("LIS2-1", "Space Raiders", "A sci-fi shooter set in deep space.", genre='Shooter')
+        self.create("LIS2-2", "Pokémon Arena", "Collect creatures and battle in the <b>arena</b>.", genre='MMORPG')
+        self.create("LIS2-3", "Castle Siege", "A strategy game where you defend a space station.",
+                    genre='Strategy', platform='Web Browser')
+
+    # Game.objects.create -> señal post_save => se indexa
+    def create(self, game_id, title, description, genre='Shooter', platform='PC (Windows)'):
+        return Game.objects.create(id=game_id, title=title, platform=platform, genre=genre, developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description=description,
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+
+    def ids(self, text, **filters):
+        results, _has_next = search_games(text, filters)
+        return [result['game'].id for result in results]
+
+    def test_ranks_title_matches_first_and_ignores_accents(self):
+        # "space" en el título de LIS2-1 y en la descripción de LIS2-3
+        self.assertEqual(self.ids("space"), ['LIS2-1', 'LIS2-3'])
+        self.assertEqual(self.ids("pokemon"), ['LIS2-2'])
+        # Todas las palabras deben aparecer; la última es un prefijo
+        self.assertEqual(self.ids("space shoo"), ['LIS2-1'])
+        self.assertEqual(self.ids("\"OR* NEAR("), [])
+
+    def test_highlights_matches_and_escapes_html(self):
+        results, _has_next = search_games("arena")
+        self.assertEqual(str(results[0]['title']), "Pokémon <mark>Arena</mark>")
+        self.assertEqual(str(results[0]['snippet']),
+                         "Collect creatures and battle in the &lt;b&gt;<mark>arena</mark>&lt;/b&gt;.")
+
+    def test_combines_with_facet_filters(self):
+        self.assertEqual(self.ids("space", genre='Strategy'), ['LIS2-3'])
+        self.assertEqual(self.ids("space", platform='Web Browser', genre='Strategy'), ['LIS2-3'])
+        self.assertEqual(self.ids("space", platform='PC'), [])
+        # Una palabra de la búsqueda no coincide con el valor de un filtro
+        self.assertEqual(self.ids("mmorpg"), [])
+
+    def test_index_follows_game_changes(self):
+        game = Game.objects.get(id='LIS2-3')
+        game.title = "Orbital Siege"
+        game.genre = 'Shooter'
+        game.save()
+        self.assertEqual(self.ids("orbital", genre='Shooter'), ['LIS2-3'])
+        self.assertEqual(self.ids("castle"), [])
+
+        # Solo la valoración -> no se vuelve a indexar (la búsqueda sigue igual)
+        game = Game.objects.get(id='LIS2-3')
+        game.average_rating = 4
+        with CaptureQueriesContext(connection) as queries:
+            game.save()
+        self.assertFalse(any('games_game_search' in query['sql'] for query in queries))
+
+        # Obsoleto -> fuera del índice (y de vuelta al quitarle la marca, ej: en el admin)
+        game.is_stale = True
+        game.save()
+        self.assertEqual(self.ids("orbital"), [])
+        game.is_stale = False
+        game.save()
+        self.assertEqual(self.ids("orbital"), ['LIS2-3'])
+
+        game.delete()
+        self.assertEqual(self.ids("orbital"), [])
+
+    def test_ingest_indexes_new_and_changed_games(self):
+        def record(description):
+            return game_data_from_json({
+                'id': 10, 'title': "Nebula Drift", 'platform': 'PC', 'genre': 'Racing', 'developer': 'Dev',
+                'publisher': 'Pub', 'release_date': '2020-01-01', 'short_description': description,
+                'game_url': 'https://x', 'freetogame_profile_url': 'https://x', 'thumbnail': 'https://x'}, 'LIS2-')
+
+        ingest_games([record("Racing between nebulae.")])
+        self.assertEqual(self.ids("nebula"), ['LIS2-10'])
+
+        ingest_games([record("Racing across asteroid fields.")])
+        self.assertEqual(self.ids("asteroid"), ['LIS2-10'])
+        self.assertEqual(self.ids("nebulae"), [])
+
+    def test_rebuild_command_restores_the_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM games_game_search")
+        self.assertEqual(self.ids("space"), [])
+
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.ids("space"), ['LIS2-1', 'LIS2-3'])
+
+        Game.objects.filter(id='LIS2-1').update(is_stale=True)
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.ids("space"), ['LIS2-3'])
+
+    def test_ranks_and_pages_every_match(self):
+        games = [Game(id=f'LIS3-{i}', title=f"Game {i}", platform='PC', genre=('Sci Fi', 'Sci-Fi')[i % 2],
+                      developer='Dev', publisher='Pub', release_date='2020-01-01', description="A free to play game.",
+                      freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+                 for i in range(520)]
+        # Mejor resultado (la palabra en el título) -> el último que recorre el índice (rowid más alto)
+        best = max(games, key=lambda game: search_rowid(game.id))
+        best.title = "Free Fire"
+        Game.objects.bulk_create(games)
+        rebuild_index()
+
+        # Por relevancia (BM25) y con más coincidencias que GAME_SEARCH_RANK_LIMIT (el título primero, sin BM25)
+        for rank_limit, ranked in ((1000, True), (100, False)):
+            with self.subTest(rank_limit=rank_limit), override_settings(GAME_SEARCH_RANK_LIMIT=rank_limit):
+                results, _has_next = search_games("free")
+                self.assertEqual(results[0]['game'].id, best.id)
+                self.assertEqual(results[0]['rank'] is not None, ranked)
+
+                # Páginas de todas las coincidencias -> sin repetir ni perder ninguna
+                # 'Sci Fi' y 'Sci-Fi' -> la misma palabra en el índice => el filtro exacto va antes del LIMIT
+                for filters, expected in (({}, 520), ({'genre': best.genre}, 260)):
+                    found, offset, has_next = [], 0, True
+                    while has_next:
+                        results, has_next = search_games("free", filters, limit=100, offset=offset)
+                        found += [result['game'].id for result in results]
+                        offset += 100
+                    self.assertEqual(len(found), expected)
+                    self.assertEqual(len(set(found)), expected)
+                    self.assertEqual(found[0], best.id)
+                    self.assertEqual({Game.objects.get(id=game_id).genre for game_id in found[:5]},
+                                     {best.genre} if filters else {'Sci Fi', 'Sci-Fi'})
+
+    def test_search_view_and_json_endpoint(self):
+        response = self.client.get(reverse("search"), {'q': "space", 'genre': 'Shooter'})
+        self.assertContains(response, "<mark>Space</mark> Raiders")
+        self.assertNotContains(response, "Castle Siege")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("search_json"), {'q': "space"})
+        data = response.json()
+        self.assertEqual([result['id'] for result in data['results']], ['LIS2-1', 'LIS2-3'])
+        self.assertEqual(data['results'][0]['title_html'], "<mark>Space</mark> Raiders")
+        self.assertFalse(data['has_next'])
+
+        # Sin palabras -> sin resultados (ni consulta al índice)
+        self.assertEqual(self.client.get(reverse("search_json"), {'q': " !? "}).json()['results'], [])
+
+
+class SuggestTests(TestCase):
+
+    def setUp(self):
+        reset_index()
+        for game_id, title, rating in (('LIS2-1', "Star Wars: The Old Republic", 4), ('LIS2-2', "Starfield Arena", 5),
+                                       ('LIS2-3', "Pokémon Stars", 3), ('LIS2-4', "Warframe", 2)):
+            Game.objects.create(id=game_id, title=title, platform='PC', genre='Shooter', developer='Dev',
+                                publisher='Pub', release_date='2020-01-01', description='Test', average_rating=rating,
+                                freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+
+    def titles(self, text, **params):
+        response = self.client.get(reverse("suggest"), {'q': text, **params})
+        return [result['title'] for result in response.json()['results']]
+
+    def test_suggests_by_rating_from_any_word(self):
+        self.assertEqual(self.titles("star"), ["Starfield Arena", "Star Wars: The Old Republic", "Pokémon Stars"])
+        self.assertEqual(self.titles("WAR"), ["Star Wars: The Old Republic", "Warframe"])
+        self.assertEqual(self.titles("pokemon st"), ["Pokémon Stars"])
+        self.assertEqual(self.titles("star", limit=1), ["Starfield Arena"])
+        self.assertEqual(self.titles(" "), [])
+
+    def test_keystrokes_do_not_query_the_database(self):
+        self.titles("s")
+        # Sin contraseña global ni sesión -> ninguna consulta hasta la siguiente comprobación de versiones
+        with self.assertNumQueries(0):
+            for text in ("s", "st", "sta", "star", "star w"):
+                self.assertEqual(self.client.get(reverse("suggest"), {'q': text}).status_code, 200)
+
+    def test_precomputed_prefixes_match_a_full_scan(self):
+        entries = [(f"G-{i}", f"Game {i % 7} Title {i}", (i * 37) % 50 / 10, f"game {i % 7} title {i}")
+                   for i in range(3000)]
+        index = SuggestIndex(entries, 5)
+        self.assertIn('game', index.top)
+        for text in ("g", "game", "game 3", "title 1", "title 29", "3", "x"):
+            expected = sorted((entry for entry in entries if any(
+                word_start.startswith(text) for word_start in
+                (' '.join(entry[3].split(' ')[start:]) for start in range(4)))),
+                key=lambda entry: (-entry[2], entry[0]))[:5]
+            self.assertEqual(index.suggest(text), [entry[:3] for entry in expected])
+
+
+# El índice nuevo se crea en otro hilo (con su propia conexión) -> los juegos tienen que estar confirmados
+class SuggestRebuildTests(TransactionTestCase):
+
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+        for game_id, title, rating in (('LIS2-1', "Warlords", 4), ('LIS2-4', "Warframe", 2)):
+            Game.objects.create(id=game_id, title=title, platform='PC', genre='Shooter', developer='Dev',
+                                publisher='Pub', release_date='2020-01-01', description='Test', average_rating=rating,
+                                freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+
+    def titles(self, text):
+        return [title for _game_id, title, _rating in suggest_titles(text)]
+
+    def test_index_is_rebuilt_in_the_background_when_titles_change(self):
+        self.assertEqual(self.titles("ward"), [])
+        game = Game.objects.get(id='LIS2-4')
+        game.title = "Wardens"
+        game.save()
+
+        # Dentro del intervalo de comprobación -> el índice anterior
+        self.assertEqual(self.titles("ward"), [])
+        with override_settings(GAME_SUGGEST_REFRESH=0):
+            # Creación lenta -> la petición no la espera (sigue con el índice anterior)
+            building = threading.Event()
+            release = threading.Event()
+
+            def slow_build():
+                building.set()
+                release.wait(5)
+                return build_index()
+
+            with mock.patch('games.suggest.build_index', side_effect=slow_build):
+                self.assertEqual(self.titles("ward"), [])
+                self.assertTrue(building.wait(5))
+                self.assertEqual(self.titles("ward"), [])
+                release.set()
+                wait_for_rebuild(5)
+            self.assertEqual(self.titles("ward"), ["Wardens"])
+
+    def test_ratings_do_not_rebuild_the_index_until_it_is_old(self):
+        self.assertEqual(self.titles("war"), ["Warlords", "Warframe"])
+        add_rating(Game.objects.get(id='LIS2-4'), 5, 1)
+        add_rating(Game.objects.get(id='LIS2-4'), 5, 1)
+
+        with override_settings(GAME_SUGGEST_REFRESH=0):
+            # Versiones sin cambios -> solo se comprueban (el índice no se vuelve a crear)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.titles("war"), ["Warlords", "Warframe"])
+            with override_settings(GAME_SUGGEST_MAX_AGE=0):
+                self.titles("war")
+                wait_for_rebuild(5)
+            self.assertEqual(self.titles("war"), ["Warframe", "Warlords"])
+
+
+class FacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for i, (platform, genre, publisher) in enumerate((('PC', 'Shooter', 'Pub'), ('PC', 'Shooter', 'Other'),
+                                                          ('PC', 'MMORPG', 'Pub'), ('Web', 'MMORPG', 'Pub'))):
+            Game.objects.create(id=f'LIS2-{i}', title=f"Game {i}", platform=platform, genre=genre, developer='Dev',
+                                publisher=publisher, release_date='2020-01-01', description='Test',
+                                freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+
+    def facets(self, **params):
+        context = self.client.get(reverse("main"), params).context
+        return {name: context[name] for name in ('platforms', 'genres', 'publishers')}
+
+    def test_counts_follow_the_other_selected_filters(self):
+        self.assertEqual(self.facets(), {'platforms': [('PC', 3), ('Web', 1)],
+                                         'genres': [('MMORPG', 2), ('Shooter', 2)],
+                                         'publishers': [('Other', 1), ('Pub', 3)]})
+        # Web -> sin Shooter ni Other (listados vacíos); las plataformas no dependen de la plataforma elegida
+        self.assertEqual(self.facets(platform='Web'), {'platforms': [('PC', 3), ('Web', 1)],
+                                                       'genres': [('MMORPG', 1)],
+                                                       'publishers': [('Pub', 1)]})
+        # El valor elegido siempre aparece (aunque no tenga juegos con el resto de filtros)
+        facets = self.facets(platform='Web', genre='Shooter')
+        self.assertEqual(facets['genres'], [('MMORPG', 1), ('Shooter', 0)])
+        self.assertEqual(facets['platforms'], [('PC', 2), ('Web', 0)])
+
+    def test_one_grouped_query_per_catalogue_version(self):
+        response = self.client.get(reverse("main"), {'genre': 'MMORPG'})
+        self.assertContains(response, "2 games found with selected filters!!!")
+        self.assertContains(response, '<option value="Pub" >Pub (2)</option>')
+
+        # Combinaciones en la caché -> sin consultas a games_game para los filtros ni el recuento
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("main"), {'genre': 'MMORPG', 'publisher': 'Pub'})
+        self.assertFalse([query for query in queries if 'GROUP BY' in query['sql'] or 'DISTINCT' in query['sql']])
+
+        # Juego borrado -> nueva versión => se vuelven a agrupar
+        Game.objects.get(id='LIS2-0').delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main"), {'genre': 'Shooter'})
+        self.assertEqual(len([query for query in queries if 'GROUP BY' in query['sql']]), 1)
+        self.assertContains(response, "1 games found with selected filters!!!")
+
+    def grouped_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("main"))
+        return len([query for query in queries if 'GROUP BY' in query['sql']])
+
+    def test_only_filter_changes_regroup(self):
+        self.assertEqual(self.grouped_queries(), 1)
+
+        # Valoraciones y cambios de otros campos -> los recuentos siguen en la caché
+        game = Game.objects.get(id='LIS2-0')
+        add_rating(game, 4, 1)
+        game.title = "Renamed"
+        game.save()
+        self.assertEqual(self.grouped_queries(), 0)
+
+        # Otro género, juego nuevo o ingesta -> se vuelven a agrupar
+        game.genre = 'MMORPG'
+        game.save()
+        self.assertEqual(self.grouped_queries(), 1)
+        self.assertEqual(self.facets()['genres'], [('MMORPG', 3), ('Shooter', 1)])
+        ingest_games([game_data_from_json({**json.loads(TEST_JSON)[0], 'id': 9}, 'LIS2-')])
+        self.assertEqual(self.grouped_queries(), 1)
+
+
+
+class RatingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        self.game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                        publisher='Pub', release_date='2020-01-01', description='Test',
+                                        freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+
+    def counters(self):
+        return Game.objects.values_list('rating_sum', 'vote_count', 'average_rating').get(id=self.game.id)
+
+    def test_votes_update_exact_counters(self):
+        # Votos de otros usuarios (sumados como en game_detail) -> 3 + 4 + 4 = 11 / 3 = 3.67
+        for rating in (3, 4, 4):
+            add_rating(self.game, rating, 1)
+        self.assertEqual(self.counters(), (11, 3, Decimal('3.7')))
+
+        self.client.post(reverse("game_detail", args=[self.game.id]), {'rate_comment': 'true', 'rating': 5})
+        self.assertEqual(self.counters(), (16, 4, Decimal('4.0')))
+        # Cambiar el voto -> mismo número de votos
+        response = self.client.post(reverse("game_detail", args=[self.game.id]), {'rate_comment': 'true', 'rating': 0})
+        self.assertEqual(self.counters(), (11, 4, Decimal('2.8')))
+        self.assertEqual(response.context['game'].average_rating, Decimal('2.8'))
+
+    def test_average_has_no_accumulated_rounding(self):
+        # 1 voto de 5 y 20 de 4 -> media exacta 4.0476... (antes: media redondeada * votos en cada voto)
+        add_rating(self.game, 5, 1)
+        for _vote in range(20):
+            add_rating(self.game, 4, 1)
+        self.assertEqual(self.counters(), (85, 21, Decimal('4.0')))
+        self.assertEqual(average(9, 2), Decimal('4.5'))
+        self.assertEqual(average(0, 0), Decimal('0.0'))
+
+    def test_reconcile_recomputes_from_comments(self):
+        other = Game.objects.create(id='LIS2-2', title="Game 2", platform='PC', genre='Shooter', developer='Dev',
+                                    publisher='Pub', release_date='2020-01-01', description='Test', vote_count=9,
+                                    rating_sum=40, average_rating=4.4, freetogame_profile_url='https://x',
+                                    game_url='https://x', thumbnail='https://x')
+        for rating in (5, 4, 4):
+            Comment.objects.create(game=self.game, user='someone', rating=rating, text="")
+        Comment.objects.create(game=self.game, user='someone', text="Not a vote")
+
+        out = io.StringIO()
+        call_command('reconcile_ratings', stdout=out)
+        self.assertIn("2 games changed", out.getvalue())
+        self.assertEqual(self.counters(), (13, 3, Decimal('4.3')))
+        other.refresh_from_db()
+        self.assertEqual((other.rating_sum, other.vote_count, other.average_rating), (0, 0, Decimal('0.0')))
+
+    def test_rank_score_needs_votes_to_beat_the_prior(self):
+        # 1 voto de 5 -> (3 * 10 + 5) / 11 = 3.18; 1000 votos de media 4.8 -> (30 + 4800) / 1010 = 4.78
+        add_rating(self.game, 5, 1)
+        other = Game.objects.create(id='LIS2-2', title="Game 2", platform='PC', genre='Shooter', developer='Dev',
+                                    publisher='Pub', release_date='2020-01-01', description='Test',
+                                    freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        add_rating(other, 4800, 1000)
+        self.assertEqual(self.game.average_rating, Decimal('5.0'))
+        self.assertAlmostEqual(self.game.rank_score, rank_score(5, 1))
+        self.assertAlmostEqual(other.rank_score, 4830 / 1010)
+        self.assertEqual(list(Game.objects.order_by(*GAME_ORDERING).values_list('id', flat=True)),
+                         ['LIS2-2', 'LIS2-1'])
+
+        # Sin votos -> la valoración a priori
+        add_rating(self.game, -5, -1)
+        self.assertAlmostEqual(self.game.rank_score, 3.0)
+
+    def test_rebuild_rank_scores_with_a_new_prior(self):
+        add_rating(self.game, 5, 1)
+        with override_settings(GAME_RANK_PRIOR_VOTES=0):
+            call_command('rebuild_rank_scores', stdout=io.StringIO())
+        self.game.refresh_from_db()
+        self.assertAlmostEqual(self.game.rank_score, 5.0)
+
+
+class ConcurrentRatingTests(TransactionTestCase):
+
+    def test_parallel_votes_are_not_lost(self):
+        game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description='Test',
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        votes = [(i % 5) + 1 for i in range(200)]
+        start = threading.Barrier(8)
+
+        # Cada hilo con su conexión vota su parte a la vez que el resto (como peticiones de game_detail:
+        # el juego se lee al principio de la petición, fuera de la transacción del voto)
+        def vote(ratings):
+            start.wait()
+            try:
+                for rating in ratings:
+                    loaded = Game.objects.get(id=game.id)
+                    with write_transaction():
+                        add_rating(loaded, rating, 1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(votes[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        game.refresh_from_db()
+        self.assertEqual((game.rating_sum, game.vote_count), (sum(votes), len(votes)))
+        self.assertEqual(game.average_rating, Decimal('3.0'))
+
+    def test_parallel_toggles_wait_for_the_write_lock(self):
+        game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description='Test',
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        comment = Comment.objects.create(game=game, user='someone', text="Nice")
+        users = [User.objects.create(username=f"user{i}") for i in range(8)]
+        start = threading.Barrier(len(users))
+        errors = []
+
+        # toggle_vote lee el voto antes de escribirlo -> sin el bloqueo desde el principio, dos hilos que ya han
+        # leído no pueden pasar los dos a escribir ("database is locked" sin esperar)
+        def vote(user):
+            start.wait()
+            try:
+                for value in (Like.LIKE, Like.DISLIKE, Like.LIKE):
+                    toggle_vote(Comment.objects.get(pk=comment.pk), user, value)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        comment.refresh_from_db()
+        self.assertEqual((comment.like_count, comment.dislike_count), (len(users), 0))
+
+
+class StatsContextTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        self.game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                        publisher='Pub', release_date='2020-01-01', description='Test',
+                                        freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        Comment.objects.create(game=self.game, user='testuser', rating=4, text="Rated")
+        Comment.objects.create(game=self.game, user='other', text="Other")
+
+    def test_values_are_computed_only_when_read(self):
+        request = RequestFactory().get('/', HTTP_REFERER='/help')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            self.assertEqual(Template("{{ previous_page }}").render(RequestContext(request)), '/help')
+        # Los recuentos del usuario -> UNA lectura de su fila (UserStats) para los dos
+        UserStats.objects.create(user=self.user, vote_count=1, rating_sum=4, comment_count=1, rated_games_count=1)
+        with self.assertNumQueries(1):
+            html = Template("{{ voted_games_count }} {{ user_comments_count }}").render(RequestContext(request))
+        self.assertEqual(html, '1 1')
+
+    def test_fragments_skip_the_context_processor(self):
+        response = self.client.get(reverse("game_detail", args=[self.game.id]), HTTP_HX_REQUEST="true")
+        self.assertTemplateUsed(response, "games/comments_section.html")
+        self.assertNotIn('games_count', response.context)
+        self.assertNotIn('platforms', response.context)
+
+    def test_comments_count_is_cached_until_a_comment_changes(self):
+        self.assertContains(self.client.get(reverse("main")), "Total Comments: 2")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("main"))
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT COUNT(*)')])
+
+        self.client.post(reverse("game_detail", args=[self.game.id]), {'rate_comment': 'true', 'text': "New"})
+        response = self.client.get(reverse("main"))
+        self.assertContains(response, "Total Comments: 3")
+        self.assertContains(response, "Games: 1")
+        self.assertContains(response, "User Comments: 2")
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        self.games = [Game.objects.create(id=f'LIS2-{i}', title=f"Game {i}", platform='PC', genre='Shooter',
+                                          developer='Dev', publisher='Pub', release_date='2020-01-01',
+                                          description='Test', freetogame_profile_url='https://x',
+                                          game_url='https://x', thumbnail='https://x') for i in range(2)]
+
+    def post(self, game, **data):
+        self.client.post(reverse("game_detail", args=[game.id]), {'rate_comment': 'true', **data})
+
+    def stats(self, user=None):
+        return UserStats.objects.filter(user=user or self.user).values_list(
+            'vote_count', 'rating_sum', 'comment_count', 'rated_games_count').get()
+
+    def test_game_detail_keeps_the_counts_in_step_with_the_comments(self):
+        self.post(self.games[0], text="Only a comment")
+        self.assertEqual(self.stats(), (0, 0, 1, 0))
+        self.post(self.games[0], rating=4)
+        self.assertEqual(self.stats(), (1, 4, 1, 1))
+        # Cambiar la valoración (ahora con texto) -> misma cantidad de votos
+        self.post(self.games[0], rating=2, text="Changed my mind")
+        self.assertEqual(self.stats(), (1, 2, 2, 1))
+        self.post(self.games[1], rating=5, text="Great")
+        self.assertEqual(self.stats(), (2, 7, 3, 2))
+
+        # Igual que recalcularlos desde los comentarios:
+        call_command('reconcile_user_stats', stdout=io.StringIO())
+        self.assertEqual(self.stats(), (2, 7, 3, 2))
+
+        response = self.client.get(reverse("user_profile"))
+        self.assertEqual(response.context['vote_count'], 2)
+        self.assertEqual(response.context['average_rating'], 3.5)
+
+    def test_missing_row_is_built_from_the_comments(self):
+        Comment.objects.create(game=self.games[0], user='testuser', rating=3, text="Before the table")
+        self.post(self.games[1], text="After")
+        self.assertEqual(self.stats(), (1, 3, 2, 1))
+
+    def test_reconcile_rebuilds_every_user(self):
+        other = User.objects.create_user(username="other", password="testpass")
+        Comment.objects.create(game=self.games[0], user='testuser', rating=3, text="")
+        Comment.objects.create(game=self.games[1], user='testuser', rating=0, text="Bad")
+        Comment.objects.create(game=self.games[1], user='testuser', text="Still bad")
+        Comment.objects.create(game=self.games[0], user='Anonymous', rating=5, text="Who?")
+        UserStats.objects.create(user=other, vote_count=9, comment_count=9)
+
+        out = io.StringIO()
+        call_command('reconcile_user_stats', batch_size=1, stdout=out)
+        self.assertIn("2 users", out.getvalue())
+        self.assertEqual(self.stats(), (2, 3, 2, 2))
+        self.assertEqual(self.stats(other), (0, 0, 0, 0))
+
+
+class LikeCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description='Test',
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        self.comment = Comment.objects.create(game=game, user='someone', text="Nice")
+
+    def vote(self, like_type):
+        return self.client.post(reverse("like", args=[self.comment.id]) + f"?like_type={like_type}",
+                                {'like_type': like_type})
+
+    def counters(self):
+        return Comment.objects.values_list('like_count', 'dislike_count').get(id=self.comment.id)
+
+    def test_votes_update_the_counters(self):
+        other = User.objects.create_user(username="other", password="testpass")
+        Like.objects.create(comment=self.comment, user=other, value=Like.LIKE)
+        Comment.objects.filter(id=self.comment.id).update(like_count=1)
+
+        response = self.vote('like')
+        self.assertEqual(self.counters(), (2, 0))
+        self.assertEqual(response.context['comment'].like_count, 2)
+        # like -> dislike: un like menos y un dislike más
+        self.vote('dislike')
+        self.assertEqual(self.counters(), (1, 1))
+        # Anular el dislike
+        self.vote('dislike')
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_buttons_do_not_count_likes(self):
+        self.vote('like')
+        # Sesión + contraseña global + comentario + voto del usuario (sin COUNT de los likes)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("like", args=[self.comment.id]))
+        self.assertEqual((response.context['comment'].like_count, response.context['vote']), (1, Like.LIKE))
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
+    def test_showing_the_buttons_does_not_write(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("like", args=[self.comment.id]))
+        self.assertEqual(response.context['vote'], Like.NO_VOTE)
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith(('INSERT', 'UPDATE')) and 'games_' in query['sql']])
+
+    def test_toggle_is_one_upsert(self):
+        self.vote('like')
+        with CaptureQueriesContext(connection) as queries:
+            self.vote('like')
+        writes = [query['sql'] for query in queries.captured_queries if 'games_like' in query['sql']
+                  and query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+        self.assertEqual(Like.objects.get().value, Like.NO_VOTE)
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_value_is_constrained(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Like.objects.create(comment=self.comment, user=self.user, value=2)
+
+    def test_reconcile_recomputes_from_likes(self):
+        other = User.objects.create_user(username="other", password="testpass")
+        Like.objects.create(comment=self.comment, user=self.user, value=Like.LIKE)
+        Like.objects.create(comment=self.comment, user=other, value=Like.DISLIKE)
+        Comment.objects.filter(id=self.comment.id).update(like_count=5)
+
+        out = io.StringIO()
+        call_command('reconcile_like_counts', stdout=out)
+        self.assertIn("1 comments changed", out.getvalue())
+        self.assertEqual(self.counters(), (1, 1))
+        call_command('reconcile_like_counts', stdout=out)
+        self.assertIn("0 comments changed", out.getvalue())
+
+
+
+class CommentVoteApiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description='Test',
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        self.comments = [Comment.objects.create(game=game, user='someone', text=f"Comment {i}") for i in range(3)]
+        # Sin votos pendientes ni escrituras programadas para las siguientes pruebas
+        self.addCleanup(flush_votes)
+
+    def vote(self, vote, comment=None):
+        response = self.client.post(reverse("comment_vote", args=[(comment or self.comments[0]).id]), {'vote': vote})
+        return response.json()
+
+    def counters(self, comment=None):
+        return Comment.objects.values_list('like_count', 'dislike_count').get(id=(comment or self.comments[0]).id)
+
+    def test_vote_returns_the_counts_as_json(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("comment_vote", args=[self.comments[0].id]), {'vote': 'like'})
+        self.assertEqual(response.json(), {'comment': self.comments[0].id, 'vote': 1, 'like_count': 1,
+                                           'dislike_count': 0})
+        # Sin plantillas ni context processors (ninguna consulta de los contadores del pie de página)
+        self.assertFalse(response.templates)
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+
+        self.assertEqual(self.vote('dislike')['vote'], -1)
+        self.assertEqual(self.counters(), (0, 1))
+        self.assertEqual(self.vote('dislike'), {'comment': self.comments[0].id, 'vote': 0, 'like_count': 0,
+                                                'dislike_count': 0})
+
+    def test_invalid_requests(self):
+        url = reverse("comment_vote", args=[self.comments[0].id])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, {'vote': 'love'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse("comment_vote", args=[999]), {'vote': 'like'}).status_code, 404)
+        self.client.logout()
+        self.client.cookies["global_pass"] = "123"
+        self.assertEqual(self.client.post(url, {'vote': 'like'}).status_code, 401)
+        self.assertFalse(Like.objects.exists())
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60)
+    def test_buffer_coalesces_repeated_toggles(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual([self.vote('like')['like_count'] for _click in range(3)], [1, 0, 1])
+            self.assertEqual(self.vote('dislike'), {'comment': self.comments[0].id, 'vote': -1, 'like_count': 0,
+                                                    'dislike_count': 1})
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith(('INSERT', 'UPDATE')) and 'games_' in query['sql']])
+        self.assertEqual(pending_votes(), 1)
+
+        # Cuatro clics -> un solo voto escrito
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(Like.objects.get().value, Like.DISLIKE)
+        self.assertEqual(self.counters(), (0, 1))
+        self.assertEqual(flush_votes(), 0)
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60, GAME_VOTE_BUFFER_SIZE=2)
+    def test_buffer_is_bounded(self):
+        for comment in self.comments:
+            self.vote('like', comment)
+        # Buffer lleno en el tercer voto -> los dos primeros ya están escritos
+        self.assertEqual(pending_votes(), 1)
+        self.assertEqual([self.counters(comment) for comment in self.comments], [(1, 0), (1, 0), (0, 0)])
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60)
+    def test_flush_skips_deleted_comments(self):
+        self.vote('like')
+        self.vote('like', self.comments[1])
+        self.comments[1].delete()
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_comment_deleted_before_the_vote(self):
+        # Comentario borrado entre la consulta de la vista y el voto -> 404 (con y sin buffer)
+        vote = vote_buffer.vote
+
+        def delete_then_vote(comment, user, value):
+            Comment.objects.filter(id=comment.id).delete()
+            return vote(comment, user, value)
+
+        for window, comment in ((0, self.comments[0]), (60, self.comments[1])):
+            with self.settings(GAME_VOTE_BUFFER_WINDOW=window):
+                with mock.patch('games.vote_buffer.vote', side_effect=delete_then_vote):
+                    response = self.client.post(reverse("comment_vote", args=[comment.id]), {'vote': 'like'})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {'error': "Comment not found"})
+        self.assertFalse(Like.objects.exists())
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60)
+    def test_deleted_comment_drops_its_pending_votes(self):
+        other = User.objects.create_user(username="other", password="testpass")
+        self.vote('like')
+        self.vote('like', self.comments[1])
+        comment = Comment.objects.get(id=self.comments[0].id)
+        Comment.objects.filter(id=comment.id).delete()
+
+        with self.assertRaises(Comment.DoesNotExist):
+            vote_buffer.vote(comment, other, Like.LIKE)
+        # Solo queda el voto del comentario que sigue existiendo
+        self.assertEqual(pending_votes(), 1)
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(self.counters(self.comments[1]), (1, 0))
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60)
+    def test_failed_flush_keeps_the_votes(self):
+        self.vote('like')
+        self.vote('like', self.comments[1])
+
+        # Durante la escritura llega otro voto del mismo usuario -> la escritura no bloquea y el voto nuevo gana
+        def failing_write(votes):
+            self.vote('dislike', self.comments[1])
+            raise OperationalError("database is locked")
+
+        with mock.patch('games.vote_buffer.write_votes', side_effect=failing_write), \
+                self.assertLogs('games.vote_buffer', 'ERROR'):
+            self.assertEqual(flush_votes(), 0)
+        self.assertEqual(pending_votes(), 2)
+        self.assertFalse(Like.objects.exists())
+
+        self.assertEqual(flush_votes(), 2)
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertEqual(self.counters(self.comments[1]), (0, 1))
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=60)
+    def test_vote_during_a_flush_sees_the_votes_being_written(self):
+        # El voto guardado se lee de la BD sin el bloqueo del buffer
+        def unlocked_user_vote(comment, user):
+            self.assertFalse(vote_buffer._lock.locked())
+            return user_vote(comment, user)
+
+        with mock.patch('games.vote_buffer.user_vote', side_effect=unlocked_user_vote) as read_vote:
+            self.vote('like')
+        read_vote.assert_called_once()
+
+        # Segundo like mientras se escribe el primero -> lo anula (y los contadores ya cuentan el que se escribe)
+        during = []
+
+        def slow_write(votes):
+            during.append(self.vote('like'))
+            return write_votes(votes)
+
+        with mock.patch('games.vote_buffer.write_votes', side_effect=slow_write):
+            self.assertEqual(flush_votes(), 1)
+        self.assertEqual(during, [{'comment': self.comments[0].id, 'vote': 0, 'like_count': 0, 'dislike_count': 0}])
+        self.assertEqual(self.counters(), (1, 0))
+
+        self.assertEqual(self.vote('dislike'), {'comment': self.comments[0].id, 'vote': -1, 'like_count': 0,
+                                                'dislike_count': 1})
+        self.assertEqual(flush_votes(), 1)
+        self.assertEqual(Like.objects.get().value, Like.DISLIKE)
+        self.assertEqual(self.counters(), (0, 1))
+
+
+class VoteBufferTimerTests(TransactionTestCase):
+
+    @override_settings(GAME_VOTE_BUFFER_WINDOW=0.05)
+    def test_pending_votes_are_written_after_the_window(self):
+        user = User.objects.create_user(username="testuser", password="testpass")
+        ValidPassword.objects.create(value="123")
+        self.client.cookies["global_pass"] = "123"
+        self.client.login(username="testuser", password="testpass")
+        game = Game.objects.create(id='LIS2-1', title="Game 1", platform='PC', genre='Shooter', developer='Dev',
+                                   publisher='Pub', release_date='2020-01-01', description='Test',
+                                   freetogame_profile_url='https://x', game_url='https://x', thumbnail='https://x')
+        comment = Comment.objects.create(game=game, user='someone', text="Nice")
+
+        self.client.post(reverse("comment_vote", args=[comment.id]), {'vote': 'like'})
+        deadline = time.monotonic() + 5
+        while pending_votes() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(pending_votes(), 0)
+        self.assertEqual(Like.objects.get(user=user).value, Like.LIKE)
+        comment.refresh_from_db()
+        self.assertEqual(comment.like_count, 1)
+
+class FeedSyncTests(FeedServerTestCase):
+
+    def test_main_does_not_load_feeds(self):
+        # La página principal solo lee de la base de datos -> ninguna descarga
+        with mock.patch('urllib.request.urlopen') as urlopen:
+            response = self.client.get(reverse("main"))
+        self.assertEqual(response.status_code, 200)
+        urlopen.assert_not_called()
+
+    def test_sync_records_status(self):
+        results = sync_due_feeds()
+        self.assertEqual(len(results), 2)
+
+        status = FeedSyncStatus.objects.get(source='xml-feed')
+        self.assertEqual(status.status, 'ok')
+        self.assertEqual(status.games_created, 1)
+        self.assertIsNotNone(status.last_success)
+        # El segundo juego del JSON repite título con el del XML -> no se duplica:
+        self.assertEqual(FeedSyncStatus.objects.get(source='json-feed').games_created, 1)
+        self.assertEqual(Game.objects.count(), 2)
+
+    def test_sync_respects_interval(self):
+        sync_due_feeds()
+
+        # Recién sincronizadas -> ninguna pendiente:
+        self.assertEqual(sync_due_feeds(), [])
+        self.assertEqual(len(self.server.requests), 2)
+
+        # Solo la fuente con intervalo corto (60s) vuelve a estar pendiente:
+        FeedSyncStatus.objects.update(last_finished=timezone.now() - timedelta(minutes=5))
+        results = sync_due_feeds()
+        self.assertEqual([status.source for status in results], ['json-feed'])
+
+        # --force -> se sincronizan todas:
+        self.assertEqual(len(sync_due_feeds(force=True)), 2)
+
+    def test_sync_failure_is_isolated(self):
+        self.server.routes['/games'] = {'status': 500, 'body': b'upstream down'}
+        results = sync_due_feeds()
+        self.assertEqual(len(results), 2)
+
+        status = FeedSyncStatus.objects.get(source='json-feed')
+        self.assertEqual(status.status, 'error')
+        self.assertIn("500", status.last_error)
+        self.assertIsNone(status.last_success)
+        # La otra fuente se sincroniza igualmente:
+        self.assertEqual(FeedSyncStatus.objects.get(source='xml-feed').status, 'ok')
+
+    def test_failed_batch_does_not_leak_into_the_next_source(self):
+        # El lote del XML falla después de insertar "Xml Game" -> rollback
+        # -> el JSON repite ese título y debe guardarlo como juego propio (no como alias de un juego inexistente)
+        from .ingest import index_games
+        calls = []
+
+        def fail_first(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError("disk full")
+            return index_games(*args, **kwargs)
+
+        with mock.patch('games.ingest.index_games', side_effect=fail_first):
+            sync_due_feeds()
+
+        self.assertEqual(FeedSyncStatus.objects.get(source='xml-feed').status, 'error')
+        self.assertEqual(FeedSyncStatus.objects.get(source='json-feed').status, 'ok')
+        self.assertFalse(Game.objects.filter(id='LIS1-1').exists())
+        self.assertEqual(set(Game.objects.values_list('id', flat=True)), {'LIS2-1', 'LIS2-2'})
+        self.assertFalse(GameAlias.objects.exists())
+
+    @override_settings(GAME_INGEST_BATCH_SIZE=1)
+    def test_writer_error_does_not_hang_the_sync(self):
+        # Fuente JSON con más lotes de los que caben en su cola -> su hilo se queda esperando al escritor
+        self.server.routes['/games'] = {'body': json.dumps([
+            {**json.loads(TEST_JSON)[0], 'id': i, 'title': f"Game {i}"} for i in range(20)]).encode()}
+        started = time.perf_counter()
+        with mock.patch('games.sync.write_batch', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                sync_due_feeds()
+        self.assertLess(time.perf_counter() - started, 5)
+
+    def test_sync_games_command(self):
+        out = io.StringIO()
+        call_command('sync_games', '--source', 'json-feed', stdout=out)
+        self.assertEqual([path for path, _etag in self.server.requests], ['/games'])
+        self.assertTrue(Game.objects.filter(id='LIS2-1').exists())
+        # Informe de tiempos por fuente:
+        self.assertIn("json-feed: fetch", out.getvalue())
+        self.assertIn("2 inserted", out.getvalue())
+
+    def test_scheduler_survives_a_failed_iteration(self):
+        # Primera comprobación con la BD bloqueada (ej: escritura de la web) -> la segunda sincroniza igual
+        calls = []
+
+        def flaky_sync():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return sync_due_feeds(sources=['json-feed'])
+
+        statuses = []
+        with mock.patch('games.sync.sync_due_feeds', side_effect=flaky_sync):
+            with self.assertLogs('games.sync', 'ERROR') as logs:
+                run_scheduler(poll_interval=0, iterations=2, on_status=statuses.append)
+        self.assertEqual(len(calls), 2)
+        self.assertIn("database is locked", logs.output[0])
+        self.assertEqual([status.source for status in statuses], ['json-feed'])
+        self.assertTrue(Game.objects.filter(id='LIS2-1').exists())
+
+    def test_sources_are_fetched_concurrently(self):
+        self.server.routes['/listado.xml']['delay'] = 0.5
+        self.server.routes['/games']['delay'] = 0.5
+
+        started = time.perf_counter()
+        results = sync_due_feeds()
+        elapsed = time.perf_counter() - started
+
+        # Las dos descargas a la vez -> menos que la suma de las latencias
+        self.assertLess(elapsed, 1)
+        self.assertEqual([status.status for status in results], ['ok', 'ok'])
+        self.assertEqual(Game.objects.count(), 2)
+        for status in results:
+            self.assertGreaterEqual(status.report.fetch_time, 0.5)
+
+    def test_failed_fetch_is_retried(self):
+        self.server.routes['/games']['failures'] = 2
+        self.feeds[1]['retries'] = 2
+
+        status = sync_due_feeds(sources=['json-feed'])[0]
+
+        self.assertEqual(status.status, 'ok')
+        self.assertEqual(status.report.attempts, 3)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_deadline_stops_retries(self):
+        self.server.routes['/games']['delay'] = 2
+        self.feeds[1].update(retries=5, timeout=10, deadline=0.5)
+
+        started = time.perf_counter()
+        status = sync_due_feeds(sources=['json-feed'])[0]
+
+        # Un solo intento limitado al tiempo máximo de la fuente (0.5s) y sin copia en caché -> error
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertEqual(status.status, 'error')
+        self.assertEqual(status.report.attempts, 1)
+
+
+class FeedFetchTests(FeedServerTestCase):
+
+    def test_etag_not_modified_skips_ingestion(self):
+        sync_due_feeds(sources=['xml-feed'])
+
+        with mock.patch('games.sync.iter_source') as iter_source:
+            status = sync_due_feeds(force=True, sources=['xml-feed'])[0]
+
+        # Petición condicional con el ETag guardado -> 304 -> sin parseo ni escrituras
+        self.assertEqual(self.server.requests[-1], ('/listado.xml', '"v1"'))
+        iter_source.assert_not_called()
+        self.assertEqual(status.status, 'unchanged')
+
+    def test_same_hash_skips_ingestion(self):
+        # Fuente sin ETag -> se descarga de nuevo pero el hash es el mismo
+        sync_due_feeds(sources=['json-feed'])
+        self.assertEqual(fetch_feed(self.feeds[1]['url']).status, 'fetched')
+
+        with mock.patch('games.sync.iter_source') as iter_source:
+            status = sync_due_feeds(force=True, sources=['json-feed'])[0]
+        iter_source.assert_not_called()
+        self.assertEqual(status.status, 'unchanged')
+
+    def test_changed_content_is_ingested(self):
+        sync_due_feeds(sources=['json-feed'])
+        games = json.loads(TEST_JSON)
+        games.append(dict(games[0], id=3, title='Brand New Game'))
+        self.server.routes['/games'] = {'body': json.dumps(games).encode()}
+
+        status = sync_due_feeds(force=True, sources=['json-feed'])[0]
+        self.assertEqual(status.status, 'ok')
+        self.assertTrue(Game.objects.filter(id='LIS2-3').exists())
+
+    def test_upstream_corrections_are_applied(self):
+        sync_due_feeds(sources=['json-feed'])
+        games = json.loads(TEST_JSON)
+        games[0]['title'] = 'Json Game (fixed)'
+        self.server.routes['/games'] = {'body': json.dumps(games[:1]).encode()}
+
+        status = sync_due_feeds(force=True, sources=['json-feed'])[0]
+
+        self.assertEqual(status.report.stats.updated, 1)
+        self.assertEqual(Game.objects.get(id='LIS2-1').title, 'Json Game (fixed)')
+        # El juego 2 ya no viene en la fuente -> obsoleto
+        self.assertTrue(Game.objects.get(id='LIS2-2').is_stale)
+
+    def test_load_games_skips_unchanged_content(self):
+        xml_url, json_url = self.server.url('/listado.xml'), self.server.url('/games')
+        self.assertEqual(load_games('XML', xml_url, 'LIS1-').inserted, 1)
+
+        # Error en la carga -> no cuenta como cargado: la siguiente llamada lo vuelve a cargar
+        with mock.patch('games.utils.load_source', side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                load_games('JSON', json_url, 'LIS2-')
+        self.assertEqual(load_games('JSON', json_url, 'LIS2-').inserted, 1)
+
+        # 304 (ETag del XML) o mismo hash (JSON sin ETag) -> ni se parsea ni se consulta la BD
+        with mock.patch('games.utils.load_source') as load_source, self.assertNumQueries(0):
+            self.assertEqual(load_games('XML', xml_url, 'LIS1-').records, 0)
+            self.assertEqual(load_games('JSON', json_url, 'LIS2-').records, 0)
+        load_source.assert_not_called()
+        self.assertEqual(self.server.requests[-2], ('/listado.xml', '"v1"'))
+
+        # Contenido nuevo -> se carga
+        games = json.loads(TEST_JSON)
+        games[0]['title'] = 'Json Game (fixed)'
+        self.server.routes['/games'] = {'body': json.dumps(games).encode()}
+        self.assertEqual(load_games('JSON', json_url, 'LIS2-').updated, 1)
+
+    def test_stale_games_are_hidden_until_they_come_back(self):
+        sync_due_feeds(sources=['json-feed'])
+        games = json.loads(TEST_JSON)
+        self.server.routes['/games'] = {'body': json.dumps(games[:1]).encode()}
+        versions = get_versions(CATALOGUE, FACET_COUNTS, TITLES)
+        sync_due_feeds(force=True, sources=['json-feed'])
+
+        # update() sin señales -> nuevas versiones del listado, los filtros y las sugerencias
+        self.assertTrue(Game.objects.get(id='LIS2-2').is_stale)
+        self.assertTrue(all(version > versions[name]
+                            for name, version in get_versions(CATALOGUE, FACET_COUNTS, TITLES).items()))
+        self.assertEqual(self.visible("xml"), {'main': False, 'search': [], 'suggest': [], 'genres': []})
+        self.assertEqual(self.visible("json")['search'], ['LIS2-1'])
+
+        # Vuelve a su fuente -> vuelve a salir
+        self.server.routes['/games'] = {'body': TEST_JSON}
+        sync_due_feeds(force=True, sources=['json-feed'])
+        self.assertFalse(Game.objects.get(id='LIS2-2').is_stale)
+        self.assertEqual(self.visible("xml"), {'main': True, 'search': ['LIS2-2'], 'suggest': ["Xml Game"],
+                                               'genres': [('MMORPG', 1)]})
+
+    # Dónde sale un juego del JSON (por una palabra de su título): listado, búsqueda, sugerencias y filtro MMORPG
+    def visible(self, text):
+        response = self.client.get(reverse("main"))
+        results, _has_next = search_games(text)
+        return {
+            'main': "Xml Game" in response.content.decode(),
+            'search': [result['game'].id for result in results],
+            'suggest': [title for _game_id, title, _rating in build_index().suggest(text)],
+            'genres': [genre for genre in response.context['genres'] if genre[0] == 'MMORPG'],
+        }
+
+    def test_fallback_to_cached_copy(self):
+        url = self.feeds[1]['url']
+        first = fetch_feed(url)
+
+        # Fuente caída -> última copia correcta de la caché:
+        self.server.routes['/games'] = {'status': 503, 'body': b''}
+        result = fetch_feed(url)
+        self.assertEqual(result.status, 'fallback')
+        self.assertEqual(result.content_hash, first.content_hash)
+        with result.open() as f:
+            self.assertEqual(f.read(), TEST_JSON)
+
+    def test_timeout_falls_back_to_cached_copy(self):
+        sync_due_feeds(sources=['json-feed'])
+
+        # Fuente más lenta que su timeout (1s) -> copia en caché, sin escrituras (mismo hash)
+        self.server.routes['/games']['delay'] = 2
+        status = sync_due_feeds(force=True, sources=['json-feed'])[0]
+        self.assertEqual(status.status, 'error')
+        self.assertIn("cached copy", status.last_error)
+
+    def test_no_cached_copy_raises(self):
+        self.server.routes['/games'] = {'status': 500, 'body': b''}
+        with self.assertRaises(urllib.error.HTTPError):
+            fetch_feed(self.feeds[1]['url'])
+
+
+class IngestTests(TestCase):
+
+    # Registro de una API JSON (FreeToGame) -> diccionario de Game
+    def record(self, game_id, title, **extra):
+        data = {
+            'id': game_id, 'title': title, 'platform': 'PC', 'genre': 'Shooter',
+            'developer': 'Dev', 'publisher': 'Pub', 'release_date': '2014-03-00',
+            'short_description': 'Synthetic game', 'game_url': 'https://x',
+            'freetogame_profile_url': 'https://x', 'thumbnail': 'https://x',
+        }
+        data.update(extra)
+        return game_data_from_json(data, 'LIS2-')
+
+    def test_ingest_inserts_and_skips_duplicates(self):
+        Game.objects.create(**self.record(1, "Existing Game"))
+
+        records = [
+            self.record(1, "Existing Game"),        # mismo id -> omitido
+            self.record(2, "Existing Game"),        # mismo título -> omitido
+            self.record(3, "New Game"),
+            self.record(4, "New Game"),             # título repetido en la misma fuente -> omitido
+            self.record(5, "Another Game"),
+        ]
+        stats = ingest_games(records, batch_size=2)
+
+        self.assertEqual((stats.inserted, stats.updated, stats.skipped), (2, 0, 3))
+        self.assertEqual(Game.objects.count(), 3)
+        # Fecha inválida -> fecha por defecto:
+        self.assertEqual(str(Game.objects.get(id='LIS2-3').release_date), '2025-01-01')
+
+    def test_ingest_updates_only_changed_games(self):
+        ingest_games([self.record(1, "Old Title"), self.record(2, "Other Game")])
+        Game.objects.filter(id='LIS2-1').update(vote_count=7)
+
+        records = [self.record(1, "New Title", genre='MMORPG'), self.record(2, "Other Game")]
+        with CaptureQueriesContext(connection) as queries:
+            stats = ingest_games(records)
+
+        self.assertEqual((stats.inserted, stats.updated, stats.skipped), (0, 1, 1))
+        game = Game.objects.get(id='LIS2-1')
+        self.assertEqual((game.title, game.genre), ("New Title", 'MMORPG'))
+        # Los campos de valoración no vienen de la fuente -> no se tocan:
+        self.assertEqual(game.vote_count, 7)
+        # Solo se escriben los campos que han cambiado:
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"genre"', updates[0])
+        self.assertNotIn('"platform"', updates[0])
+
+        # Sin cambios en la fuente -> ninguna escritura
+        with CaptureQueriesContext(connection) as queries:
+            stats = ingest_games(records)
+        self.assertEqual(stats.skipped, 2)
+        self.assertFalse([query for query in queries if query['sql'].startswith(('UPDATE', 'INSERT'))])
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title("Warframe™"), normalize_title("WARFRAME"))
+        self.assertEqual(normalize_title("Star Wars: The Old Republic®"), 'star wars the old republic')
+        self.assertEqual(normalize_title("Pokémon  Unite"), 'pokemon unite')
+
+    def test_near_duplicates_are_recorded_as_aliases(self):
+        ingest_games([self.record(1, "Warframe")])
+        records = [
+            dict(self.record(7, "WARFRAME™"), id='LIS3-7'),     # mismo juego en otra fuente -> alias
+            dict(self.record(8, "Warframe 2"), id='LIS3-8'),
+        ]
+        stats = ingest_games(records)
+
+        self.assertEqual((stats.inserted, stats.skipped, stats.aliased), (1, 1, 1))
+        alias = GameAlias.objects.get()
+        self.assertEqual((alias.alias_id, alias.game_id, alias.title), ('LIS3-7', 'LIS2-1', "WARFRAME™"))
+
+        # Alias ya guardado -> no se repite en la siguiente sincronización
+        self.assertEqual(ingest_games(records).aliased, 0)
+        self.assertEqual(Game.objects.get(id='LIS3-8').title_key, 'warframe 2')
+
+    def test_ingest_marks_removed_games_as_stale(self):
+        ingest_games([self.record(i, f"Game {i}") for i in range(3)], prefix='LIS2-')
+        Game.objects.create(**dict(self.record(1, "Other source"), id='LIS3-1'))
+
+        # El juego 2 ya no está en la fuente -> obsoleto (los de otras fuentes no se tocan)
+        stats = ingest_games([self.record(i, f"Game {i}") for i in range(2)], prefix='LIS2-')
+        self.assertEqual(stats.stale, 1)
+        self.assertEqual(list(Game.objects.filter(is_stale=True).values_list('id', flat=True)), ['LIS2-2'])
+
+        # Vuelve a aparecer -> deja de estar obsoleto
+        ingest_games([self.record(i, f"Game {i}") for i in range(3)], prefix='LIS2-')
+        self.assertFalse(Game.objects.filter(is_stale=True).exists())
+
+    def test_ingest_query_count_is_batched(self):
+        records = [self.record(i, f"Game {i}") for i in range(60)]
+        # Savepoint (2) + claves existentes (1) + alias existentes (1) + 2 lotes de bulk_create (2)
+        # + versión del catálogo (1 por lote) + índice de búsqueda (1 por lote) -> no depende del número de juegos
+        with self.assertNumQueries(10):
+            stats = ingest_games(records, batch_size=30)
+        self.assertEqual(stats.inserted, 60)
+
+    def test_iter_xml_games_streams_direct_children(self):
+        feed = io.BytesIO(TEST_XML.replace(b"</games>", b"""
+            <game><id>2</id><title>Second</title><extra><game><id>99</id></game></extra></game>
+            </games>"""))
+        games = iter_xml_games(feed, 'LIS1-')
+
+        first = next(games)
+        self.assertEqual((first['id'], first['title']), ('LIS1-1', 'Xml Game'))
+        self.assertEqual(str(first['release_date']), '2025-01-01')
+        # Solo los <game> hijos directos de <games> -> el anidado (99) se ignora
+        self.assertEqual([game['id'] for game in games], ['LIS1-2'])
+
+    def test_json_reader_streams_large_array_with_bounded_buffer(self):
+        count = 1000000
+        feed = io.BytesIO(b'[' + b','.join(b'{"id":%d}' % i for i in range(count)) + b']')
+        reader = JsonArrayReader(feed)
+
+        total = sum(1 for _record in reader)
+
+        self.assertEqual(total, count)
+        self.assertEqual(reader.offset, len(feed.getvalue()))
+        # Solo el bloque actual en memoria (no el array completo):
+        self.assertLess(reader.peak_buffer, 2 * reader.chunk_size)
+
+    def test_json_reader_resumes_from_offset(self):
+        # Caracteres multibyte partidos entre bloques de 3 bytes:
+        data = json.dumps([{'id': i, 'title': f"Jüego ñ {i}"} for i in range(10)],
+                          ensure_ascii=False).encode('utf-8')
+        reader = JsonArrayReader(io.BytesIO(data), chunk_size=3)
+        elements = iter(reader)
+        first = [next(elements) for _i in range(4)]
+        self.assertEqual([record['id'] for record in first], [0, 1, 2, 3])
+
+        # Reanudar desde el offset guardado -> continúa justo después del último elemento
+        resumed = JsonArrayReader(io.BytesIO(data), offset=reader.offset, chunk_size=3)
+        records = list(resumed)
+        self.assertEqual([record['id'] for record in records], list(range(4, 10)))
+        self.assertEqual(records[0]['title'], "Jüego ñ 4")
+        self.assertEqual(resumed.offset, len(data))
+
+    def test_json_reader_rejects_invalid_input(self):
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(io.BytesIO(b'{"id": 1}')))
+        # Fichero cortado a mitad de un elemento:
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(io.BytesIO(b'[{"id": 1}, {"id": 2, "ti')))
+
+    def test_load_json_checkpoints_after_each_batch(self):
+        fields = {'platform': 'PC', 'genre': 'Shooter', 'developer': 'Dev', 'publisher': 'Pub',
+                  'short_description': 'Synthetic game', 'game_url': 'https://x',
+                  'freetogame_profile_url': 'https://x', 'thumbnail': 'https://x'}
+        records = [dict(fields, id=i, title=f"Game {i}", release_date='2020-01-01') for i in range(5)]
+        data = json.dumps(records).encode('utf-8')
+        offsets = []
+
+        stats = load_json(io.BytesIO(data), 'LIS2-', batch_size=2, checkpoint=offsets.append)
+
+        self.assertEqual(stats.inserted, 5)
+        # 2 lotes completos + el último -> el último offset es el final del fichero
+        self.assertEqual(len(offsets), 3)
+        self.assertEqual(offsets[-1], len(data))
+
+        # Reanudar desde el primer checkpoint -> los juegos ya guardados no se repiten
+        Game.objects.filter(id__in=['LIS2-2', 'LIS2-3', 'LIS2-4']).delete()
+        stats = load_json(io.BytesIO(data), 'LIS2-', offset=offsets[0])
+        self.assertEqual((stats.inserted, stats.skipped), (3, 0))
+
+
+class ImportGamesTests(FeedServerTestCase):
+
+    def import_games(self, *args):
+        out = io.StringIO()
+        call_command('import_games', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_local_file_and_url(self):
+        with tempfile.NamedTemporaryFile(suffix='.xml') as f:
+            f.write(TEST_XML)
+            f.flush()
+            out = self.import_games(f.name, '--prefix', 'LIS1-')
+        self.assertIn("Total: 1 records (1 inserted, 0 updated)", out)
+        self.assertTrue(Game.objects.filter(id='LIS1-1').exists())
+
+        # URL sin extensión -> --format
+        self.import_games(self.server.url('/games'), '--prefix', 'LIS2-', '--format', 'json')
+        # El segundo juego repite el título del XML -> no se duplica
+        self.assertEqual(list(Game.objects.filter(id__startswith='LIS2-').values_list('id', flat=True)),
+                         ['LIS2-1'])
+
+    def test_failed_source_is_reported(self):
+        self.server.routes['/games'] = {'status': 500, 'body': b''}
+        with self.assertRaises(CommandError):
+            self.import_games('xml-feed', self.server.url('/games'), '--prefix', 'LIS2-', '--format', 'JSON')
+        # La otra fuente se importa igualmente:
+        self.assertTrue(Game.objects.filter(id='LIS1-1').exists())
+
+    def test_import_feed_name_and_stdin(self):
+        stdin = mock.Mock(buffer=io.BytesIO(TEST_XML))
+        with mock.patch('sys.stdin', stdin):
+            out = self.import_games('json-feed', '-', '--format', 'XML', '--prefix', 'LIS1-')
+
+        # Fuente configurada -> su formato y su prefijo (y primero en el orden de los argumentos)
+        self.assertEqual(set(Game.objects.values_list('id', flat=True)), {'LIS2-1', 'LIS2-2'})
+        self.assertIn("stdin:", out)
+
+    def test_dry_run_rolls_back(self):
+        out = self.import_games('json-feed', '--dry-run', '--batch-size', '1', '--workers', '1')
+        self.assertIn("2 inserted", out)
+        self.assertIn("Dry run", out)
+        self.assertFalse(Game.objects.exists())
+
+    def test_partial_file_does_not_mark_other_games_stale(self):
+        self.import_games('json-feed')
+        partial = json.dumps(json.loads(TEST_JSON)[:1]).encode()
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            f.write(partial)
+            f.flush()
+            self.import_games(f.name, '--prefix', 'LIS2-')
+            self.assertFalse(Game.objects.filter(is_stale=True).exists())
+
+            # --mark-stale -> el fichero es el catálogo completo del prefijo
+            out = self.import_games(f.name, '--prefix', 'LIS2-', '--mark-stale')
+        self.assertIn("1 stale", out)
+        self.assertEqual(list(Game.objects.filter(is_stale=True).values_list('id', flat=True)), ['LIS2-2'])
+
+    def test_unknown_source_needs_prefix(self):
+        with self.assertRaises(CommandError):
+            self.import_games('catalogue.json')
+        with self.assertRaises(CommandError):
+            self.import_games('-', '--prefix', 'LIS2-')
+
+
+class ThumbnailTests(FeedServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Imagen de 400x200 servida por la fuente local:
+        image = io.BytesIO()
+        Image.new('RGB', (400, 200), 'red').save(image, 'PNG')
+        self.server.routes['/thumb.png'] = {'body': image.getvalue()}
+        self.game = Game.objects.create(
+            id='LIS2-1', title="Thumb Game", platform='PC', genre='Shooter', developer='Dev', publisher='Pub',
+            release_date='2020-01-01', description='Test', freetogame_profile_url='https://x',
+            game_url='https://x', thumbnail=self.server.url('/thumb.png'))
+
+    def test_thumbnails_are_cached_once(self):
+        self.assertEqual(cache_thumbnails(), (1, 0))
+        self.game.refresh_from_db()
+        self.assertTrue(self.game.thumbnail_hash)
+
+        # Variantes redimensionadas en disco:
+        for width in settings.GAME_THUMBNAIL_WIDTHS:
+            with Image.open(thumbnail_path(thumbnail_name(self.game.thumbnail_hash, width))) as variant:
+                self.assertEqual((variant.format, variant.width), ('WEBP', width))
+
+        # Ya guardada -> no se vuelve a descargar
+        self.assertEqual(cache_thumbnails(), (0, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_thumbnail_is_served_with_far_future_cache(self):
+        cache_thumbnails()
+        self.game.refresh_from_db()
+
+        # Página principal (pública) -> srcset con las variantes locales y carga diferida
+        response = self.client.get(reverse("main"))
+        self.assertContains(response, f'srcset="{self.game.thumbnail_srcset}"')
+        self.assertContains(response, 'loading="lazy"')
+
+        response = self.client.get(self.game.thumbnail_src)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse("thumbnail", args=['0' * 64 + '-1.webp'])).status_code, 404)
+
+    def test_failed_download_keeps_remote_url(self):
+        self.server.routes['/thumb.png'] = {'status': 404, 'body': b''}
+        self.assertEqual(cache_thumbnails(), (0, 1))
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.thumbnail_src, self.game.thumbnail)
+        # Intento fallido reciente -> no se reintenta todavía
+        self.assertEqual(cache_thumbnails(), (0, 0))
@@ -0,0 +1,119 @@
+import hashlib
+import io
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Game, thumbnail_name
+from .versions import bump_catalogue_version
+
+
+# Caché local de las miniaturas de los juegos (settings.GAME_THUMBNAIL_DIR):
+# - Cada Game.thumbnail se descarga UNA vez durante la sincronización (no al servir las páginas)
+# - Se guardan variantes redimensionadas y comprimidas (WebP) -> una por ancho de GAME_THUMBNAIL_WIDTHS
+# - Nombre = sha256 de la imagen original + ancho -> mismo contenido = mismo fichero (compartido entre juegos)
+#   => se sirven con caché del navegador de 1 año (vista thumbnail en game_views.py)
+# - Si la descarga falla se reintenta pasado THUMBNAIL_RETRY_AFTER (mientras tanto se usa la URL original)
+
+# Tamaño máximo de la imagen original a descargar (bytes):
+THUMBNAIL_MAX_SIZE = 5 * 1024 * 1024
+
+# Tiempo hasta reintentar una miniatura que no se pudo descargar:
+THUMBNAIL_RETRY_AFTER = timedelta(days=1)
+
+
+def get_thumbnail_dir():
+    return getattr(settings, 'GAME_THUMBNAIL_DIR', settings.BASE_DIR / 'thumbnail_cache')
+
+
+# Ruta de una variante en disco -> subdirectorio con los 2 primeros caracteres del hash (ficheros repartidos)
+def thumbnail_path(name):
+    return os.path.join(get_thumbnail_dir(), name[:2], name)
+
+
+# Descargar una imagen -> bytes (error si supera THUMBNAIL_MAX_SIZE)
+def download_image(url):
+    timeout = getattr(settings, 'GAME_THUMBNAIL_TIMEOUT', 10)
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        data = response.read(THUMBNAIL_MAX_SIZE + 1)
+    if len(data) > THUMBNAIL_MAX_SIZE:
+        raise ValueError(f"Image larger than {THUMBNAIL_MAX_SIZE} bytes: {url}")
+    return data
+
+
+# Guardar las variantes de una imagen -> devuelve su hash
+# -> las variantes que ya existen en disco (misma imagen en otro juego) no se vuelven a generar
+def save_variants(data):
+    content_hash = hashlib.sha256(data).hexdigest()
+    quality = getattr(settings, 'GAME_THUMBNAIL_QUALITY', 75)
+
+    image = None
+    for width in settings.GAME_THUMBNAIL_WIDTHS:
+        path = thumbnail_path(thumbnail_name(content_hash, width))
+        if os.path.exists(path):
+            continue
+
+        if image is None:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        # Redimensionar manteniendo la proporción (nunca se amplía):
+        variant = image.copy()
+        variant.thumbnail((width, width * 10), Image.LANCZOS)
+
+        # Escribir de forma atómica (fichero temporal + os.replace):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        variant.save(tmp_path, 'WEBP', quality=quality, method=4)
+        os.replace(tmp_path, path)
+
+    return content_hash
+
+
+# Descargar y guardar la miniatura de una URL -> hash (None si falla)
+# -> se ejecuta en los hilos: NO accede a la base de datos
+def cache_thumbnail(url):
+    try:
+        return save_variants(download_image(url))
+    except Exception as e:
+        print(f"Error al guardar la miniatura '{url}': {e}")
+        return None
+
+
+# Descargar las miniaturas pendientes (sin hash y sin un intento fallido reciente)
+# -> descargas en paralelo (GAME_SYNC_WORKERS), una sola descarga por URL aunque la compartan varios juegos
+# -> devuelve (miniaturas guardadas, miniaturas con error)
+def cache_thumbnails(workers=None):
+    workers = workers or getattr(settings, 'GAME_SYNC_WORKERS', 4)
+    now = timezone.now()
+
+    pending = (Game.objects.filter(thumbnail_hash='').exclude(thumbnail='')
+               .exclude(thumbnail_checked_at__gt=now - THUMBNAIL_RETRY_AFTER)
+               .only('id', 'thumbnail'))
+    games = list(pending)
+    if not games:
+        return 0, 0
+
+    urls = sorted({game.thumbnail for game in games})
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = dict(zip(urls, pool.map(cache_thumbnail, urls)))
+
+    for game in games:
+        game.thumbnail_hash = hashes[game.thumbnail] or ''
+        game.thumbnail_checked_at = now
+    cached = sum(1 for game in games if game.thumbnail_hash)
+    with transaction.atomic():
+        Game.objects.bulk_update(games, ['thumbnail_hash', 'thumbnail_checked_at'], batch_size=500)
+        # Miniaturas nuevas -> cambian las URLs de las tarjetas => nueva versión del catálogo
+        if cached:
+            bump_catalogue_version()
+
+    return cached, len(games) - cached
@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import game_views, user_views
 
 urlpatterns = [ # Definición de rutas a partir del path principal --> http://ip:puerto/...
@@ -29,8 +29,20 @@ urlpatterns = [ # Definición de rutas a partir del path principal --> http://ip
     path('unfollow_game/<str:game_id>', game_views.unfollow_game, name='unfollow_game'),
     # like = http://ip:puerto/like/<comment_id> -> Dar like a un comentario:
     path('like/<int:comment_id>', game_views.like_comment, name='like'),
+    # comment_vote = http://ip:puerto/api/comments/<comment_id>/vote -> Like/Dislike de un comentario (JSON):
+    path('api/comments/<int:comment_id>/vote', game_views.comment_vote, name='comment_vote'),
     # set_language = http://ip:puerto/set-language/<lang_code> -> Cambiar idioma: es o en
     path('set-language/<str:lang_code>/', user_views.set_language, name='set_language'),
+    # search = http://ip:puerto/search/?q=... -> Buscar juegos por título y descripción:
+    path('search/', game_views.search, name='search'),
+    # search_json = http://ip:puerto/api/search/?q=... -> Resultados de la búsqueda en JSON:
+    path('api/search/', game_views.search_json, name='search_json'),
+    # suggest = http://ip:puerto/suggest/?q=... -> Sugerencias de títulos del buscador (JSON):
+    path('suggest/', game_views.suggest, name='suggest'),
+    # cache_stats = http://ip:puerto/cache_stats -> Aciertos y fallos de la caché de la página principal (staff):
+    path('cache_stats/', game_views.cache_stats, name='cache_stats'),
+    # thumbnail = http://ip:puerto/thumbs/<hash>-<ancho>.webp -> Miniatura guardada en local:
+    re_path(r'^thumbs/(?P<name>[0-9a-f]{64}-[0-9]+\.webp)$', game_views.thumbnail, name='thumbnail'),
     # game_json = http://ip:puerto/<game_id>.json -> JSON de un juego:
     path('<str:game_id>.json', game_views.game_json, name='game_json'),
     # game_xml = http://ip:puerto/<game_id>.xml -> XML de un juego:
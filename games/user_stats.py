@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Comment, UserStats
+
+
+# Recuentos de los comentarios de cada usuario en UNA fila (modelo UserStats):
+# - Perfil (valoraciones y media), pie de página (juegos votados y comentarios) y rated_games
+#   -> una lectura por clave primaria en lugar de recorrer sus comentarios en cada página
+# - game_detail suma los cambios de cada comentario (add_user_stats) en la misma transacción que el comentario
+# - Los cambios fuera de game_detail (admin, juegos borrados) -> python manage.py reconcile_user_stats
+# - Un usuario sin fila -> se calcula desde sus comentarios la primera vez que se lee o se cambia
+
+STATS_FIELDS = ('vote_count', 'rating_sum', 'comment_count', 'rated_games_count')
+
+
+# Recuentos de unos comentarios -> {campo: agregado} (aggregate para un usuario, annotate por usuario para todos)
+def stats_aggregates():
+    rated = Q(rating__gte=0)
+    return {
+        'vote_count': Count('id', filter=rated),
+        'rating_sum': Coalesce(Sum('rating', filter=rated), 0),
+        'comment_count': Count('id', filter=Q(text__isnull=False) & ~Q(text='')),
+        'rated_games_count': Count('game', filter=rated, distinct=True),
+    }
+
+
+# Recalcular la fila de un usuario desde sus comentarios
+def rebuild_user_stats(user):
+    values = Comment.objects.filter(user=user.username).aggregate(**stats_aggregates())
+    stats, _created = UserStats.objects.update_or_create(user=user, defaults=values)
+    return stats
+
+
+# Recuentos de un usuario -> una vez por petición (se guardan en el user: los usan la vista y el context processor)
+def get_user_stats(user):
+    stats = getattr(user, '_user_stats', None)
+    if stats is None:
+        stats = UserStats.objects.filter(pk=user.pk).first() or rebuild_user_stats(user)
+        user._user_stats = stats
+    return stats
+
+
+# Sumar los cambios de un comentario -> UPDATE con F() (sin leer la fila ni perder escrituras a la vez)
+# ej: add_user_stats(user, vote_count=1, rating_sum=4, rated_games_count=1)
+# -> dentro de la transacción del comentario; si el usuario no tiene fila se calcula entera (ya con el comentario)
+def add_user_stats(user, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = UserStats.objects.filter(pk=user.pk).update(**{field: F(field) + delta
+                                                             for field, delta in deltas.items()})
+    if not updated:
+        rebuild_user_stats(user)
+    # Recuentos leídos antes en esta petición -> se vuelven a leer
+    user._user_stats = None
+
+
+# Volver a calcular todas las filas desde Comment -> (usuarios)
+# Una consulta agrupada para todos los comentarios + escrituras por lotes (INSERT ... ON CONFLICT DO UPDATE)
+def reconcile_user_stats(batch_size=1000):
+    rows = Comment.objects.values('user').annotate(**stats_aggregates()).order_by()
+    by_username = {row['user']: row for row in rows.iterator()}
+    count = 0
+    batch = []
+    for user_id, username in User.objects.values_list('id', 'username').order_by('id').iterator():
+        values = by_username.get(username, {})
+        batch.append(UserStats(user_id=user_id, **{field: values.get(field, 0) for field in STATS_FIELDS}))
+        if len(batch) == batch_size:
+            write_user_stats(batch)
+            count += len(batch)
+            batch = []
+    write_user_stats(batch)
+    return count + len(batch)
+
+
+def write_user_stats(batch):
+    if batch:
+        UserStats.objects.bulk_create(batch, update_conflicts=True, unique_fields=['user'],
+                                      update_fields=list(STATS_FIELDS))
@@ -9,7 +9,8 @@ from urllib.parse import urlparse
 from django.conf import settings
 
 from .forms import UserSettingsForm, PasswordAuthForm
-from .models import Comment, Profile, ValidPassword
+from .models import Profile, ValidPassword
+from .user_stats import get_user_stats
 
 
 # GET /global_login -> Verificar contraseñas globales de acceso (mandar formulario)
@@ -92,23 +93,13 @@ def user_profile(request):
         messages.error(request, _("Login required to access this page!!!"))
         return redirect('login')
 
-    # Votaciones realizadas por el usuario:
-    # rating__isnull=False -> filtrar por valores no nulos:
-    votes = Comment.objects.filter(user=request.user, rating__isnull=False)
-
-    # Número de votos del user:
-    vote_count = votes.count()
+    # Votaciones realizadas por el usuario -> número y suma de sus puntuaciones (UserStats: una lectura por clave primaria)
+    stats = get_user_stats(request.user)
+    vote_count = stats.vote_count
 
     # Puntuación media del usuario:
-    # Obtener todas las valoraciones del usuario:
-    # values_list() -> obtener solo los lista de valores de la columna rating
-    # flat=True => lista plana (no de tuplas)
-    ratings = votes.values_list('rating', flat=True)
-
-    # Calcular la suma de todas las valoraciones y la valoración media:
-    total_rating = sum(ratings)
     if vote_count > 0:
-        average_rating = 0.0 if total_rating == 0 else total_rating / vote_count
+        average_rating = 0.0 if stats.rating_sum == 0 else stats.rating_sum / vote_count
     else:
         average_rating = 0
 
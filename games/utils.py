@@ -1,102 +1,67 @@
 from datetime import datetime
 
-from django.utils.dateparse import parse_date
-import json
-import urllib.request
-import xml.etree.ElementTree as ET
-from xml.etree.ElementTree import Element, SubElement, tostring
 
-from .models import Game, Comment, Like
+from .feeds import fetch_feed, loaded_hash, set_loaded_hash
+from .ingest import IngestStats, JsonArrayReader, game_data_from_json, ingest_games, iter_xml_games
 
 
 # Funciones auxiliares:
-# - cargar juegos desde un archivo XML mediante su DOM
-# - cargar juegos desde un archivo JSON mediante json.loads
+# - cargar juegos desde un archivo XML en streaming (iterparse)
+# - cargar juegos desde un archivo JSON en streaming (JsonArrayReader)
 # - comprobar si un a fecha es válida
 # - Parámetros base a pasar a los templates
 
 
-# Parser XML: cargar juegos desde un archivo XML mediante su DOM --> Listado 1
-# Parsear JSON: cargar juegos desde un archivo JSON mediante json.loads --> Listado 2 y 3
-# Cargar datos a la base de datos antes de lanzar servidor desde la shell de django
-def load_games(formato, url, prefix): # Formato de datos, URL y prefix -> en Strings
+# Parser XML: cargar juegos desde un archivo XML en streaming (iterparse) --> Listado 1
+# Parsear JSON: cargar juegos desde un archivo JSON en streaming (JsonArrayReader) --> Listado 2 y 3
+# Cargar datos a la base de datos -> desde el worker de sincronización (games/sync.py) o la shell de django
+# Devuelve las estadísticas de la ingesta (IngestStats) -> los errores se propagan (estado de la sincronización)
+# ¡¡Sin cambios desde la última carga correcta (304 o mismo hash)!! -> NO se parsea ni se toca la BD (IngestStats vacío)
+# batch_size -> tamaño de los lotes de escritura (None = settings.GAME_INGEST_BATCH_SIZE)
+# timeout -> segundos máximos de la descarga (None = settings.GAME_FEED_TIMEOUT)
+def load_games(formato, url, prefix, batch_size=None, timeout=None): # Formato de datos, URL y prefix -> en Strings
     try:
-        # Descargar el archivo utilizando urllib -> solicitud HTTP GET a la URL:
-        response = urllib.request.urlopen(url)
+        # Descargar el archivo (petición condicional + caché en disco -> games/feeds.py):
+        result = fetch_feed(url, timeout=timeout)
+        # Mismo contenido que la última carga (un 304 devuelve el hash de la copia en caché):
+        if result.content_hash == loaded_hash(url):
+            print(f"Sin cambios en '{url}' ({result.status}): no se vuelve a cargar")
+            return IngestStats()
+        with result.open() as response:
+            stats = load_source(formato, response, prefix, batch_size)
+        # Solo tras una carga sin errores -> si falla, la siguiente llamada lo vuelve a cargar
+        set_loaded_hash(url, result.content_hash)
+        return stats
 
-        if formato == 'XML':
-            load_xml(response, prefix)
+    except Exception as e:
+        print(f"Error al descargar el archivo de la API, detalles del error: {e}")
+        raise
 
-        elif formato == 'JSON':
-            load_json(response, prefix)
 
-        else:
-            print("Formato de datos NO reconocido o NO compatible.")
-            return
+# Cargar juegos desde un flujo de bytes (respuesta HTTP o fichero) según su formato:
+def load_source(formato, response, prefix, batch_size=None):
+    if formato == 'XML':
+        return load_xml(response, prefix, batch_size)
 
-    except Exception as e:
-        print(f"Error al descargar el archivo de la API, detalles del error: {e}")
+    elif formato == 'JSON':
+        return load_json(response, prefix, batch_size)
+
+    raise ValueError(f"Formato de datos NO reconocido o NO compatible: {formato}")
 
 
 # Específico para XML:
 # ej:listado1.xml (prefijo = LIS1-):
 # load_games('XML', 'https://gitlab.eif.urjc.es/cursosweb/2024-2025/final-gamerank/-/raw/main/listado1.xml', 'LIS1-')
-def load_xml(response, prefix):
-    game_data = {}
-    try:
-        # Leemos y cargamos los datos del XML:
-        xml_data = response.read()
-        # Extraer el DOM del archivo XML: -> ElementTree
-        # Usamos ET.fromstring para analizar el contenido del XML
-        # desde el cuerpo de la respuesta (string)
-        # Obtener la raíz (root) del árbol del XML-> <games> en listado1.xml(response.content)
-        root = ET.fromstring(xml_data)
-
-        # Recorrer todos los juegos del árbol del XML y guardarlos en la base de datos:
-        # Buscar todos los elementos <game> dentro de <games> (root)
-        for game_element in root.findall('game'):
-            # Extraer los datos de cada juego -> Asociado al modelo Game en DB:
-
-            # Extraer la fecha de lanzamiento -> en formato 'YYYY-MM-DD':
-            # Bleach Online -> API: listado1.xml -> <release_date>2014-02-30</release_date>
-            release_date = game_element.find('release_date').text
-            # Verificar si "release_date" existe(!= None ó null) y es una fecha válida:
-            if release_date is None or not is_valid_date(release_date):
-                release_date = '2025-01-01'  # Fecha por defecto
-
-            # Asumir que todos los campos se aportan en cada elemento <game>:
-            game_data = {
-                # Asociar a cada clave -> valor que se encuentre
-                # en cada elemento marcado dentro de cada elemento <game>:
-                # ej -> <id>1</id> -> game_data['id'] = 'LIS1-1'
-                # Prefijo LIS1- añadido al ID -> listado1.xml
-                'id': prefix + game_element.find('id').text,
-                'title': game_element.find('title').text,
-                'platform': game_element.find('platform').text,
-                'genre': game_element.find('genre').text,
-                'developer': game_element.find('developer').text,
-                'publisher': game_element.find('publisher').text,
-                'release_date': parse_date(release_date),
-                'description': game_element.find('short_description').text,
-                'average_rating': 0.0,
-                'vote_count': 0,
-                'freetogame_profile_url': game_element.find('freetogame_profile_url').text,
-                'game_url': game_element.find('game_url').text,
-                'thumbnail': game_element.find('thumbnail').text,
-            }
-
-            # Verificar si el juego ya existe en la base de datos para crearlo
-            # ¡¡Si existe => id o title => NO se crea ni actualiza!!
-            # Muchos menos tiempo y accesos a la base de datos
-            if (not Game.objects.filter(id=game_data['id']).exists()
-                    and not Game.objects.filter(title=game_data['title']).exists()):
-                # Si no existe -> crear el juego
-                # Pasarle **game_data para desempaquetar el diccionario -> enviar parejas -> clave:valor
-                Game.objects.create(**game_data)
-                print(f"Juego '{game_data['title']}' guardado con éxito desde la API de formato XML")
-
-    except Exception as e:
-        print(f"Error al guardar el juego '{game_data['title']}': {e}")
+def load_xml(response, prefix, batch_size=None):
+    # Parsear el XML en streaming (iterparse) -> cada elemento <game> dentro de <games> (root)
+    # se convierte en un diccionario de Game al cerrarse y se libera -> memoria constante
+    # Los juegos se guardan por lotes a medida que se parsean:
+    # ¡¡Si existe => id o título normalizado => NO se crea!! -> comprobado en memoria (ingest.py), sin consultas por juego
+    # Si existe por id y ha cambiado en la fuente (hash) -> se actualizan solo los campos cambiados
+    # Fuente completa -> los juegos del prefijo que ya no aparecen se marcan como obsoletos
+    stats = ingest_games(iter_xml_games(response, prefix), batch_size=batch_size, prefix=prefix)
+    print(f"API de formato XML ({prefix}): {stats}")
+    return stats
 
 
 # Específico para JSON:
@@ -104,53 +69,24 @@ def load_xml(response, prefix):
 # load_games('JSON', 'https://www.freetogame.com/api/games', 'LIS2-')
 # ej:API de MMOBomb (Prefijo = LIS3-):
 # load_games('JSON', 'https://www.mmobomb.com/api1/games', 'LIS3-')
-def load_json(response, prefix):
-    game_data = {}
-    try:
-        # Leer los datos de la respuesta en formato de JSON:
-        # response.read() para leer los datos binarios de la respuesta
-        # json.loads() para convertirlos a un diccionario de Python
-        games = json.loads(response.read())
-
-        # Recorrer los juegos extraídos y guardarlos en la base de datos
-        # Guardar sus campos del diccionario también
-        for game_data in games:
-            # Añadir prefijo correspondiente a la API, en la clave primaria:
-            game_data['id'] = prefix + str(game_data['id'])
-
-            # Verificar si "release_date" existe(!= None ó null) y es una fecha válida
-            # Pocket Starships -> API: MMOBomb -> "release_date": null
-            # Pocket Starships -> API: FreeToGame -> "release_date": "2014-03-00"
-            release_date = game_data.get('release_date')
-            if release_date is None or not is_valid_date(release_date):
-                release_date = '2025-01-01'  # Fecha por defecto
-
-            # Guardar juego con sus campos -> si NO existe (id o title) en la base de datos:
-            # Usar update_or_create() -> pesado --> muchos accesos a la base de datos
-            if (not Game.objects.filter(id=game_data['id']).exists()
-                    and not Game.objects.filter(title=game_data['title']).exists()):
-                Game.objects.create(
-                    id=game_data['id'],
-                    title=game_data.get('title'),
-                    platform=game_data.get('platform'),
-                    genre=game_data.get('genre'),
-                    developer=game_data.get('developer'),
-                    publisher=game_data.get('publisher'),
-                    release_date=release_date,
-                    description=game_data.get('short_description'),
-                    average_rating=0.0,
-                    vote_count=0,
-                    # APIs -> distintos campos en el JSON:
-                    # freetogame_profile_url -> FreeToGame
-                    # game_url -> MMOBomb
-                    freetogame_profile_url=game_data.get('freetogame_profile_url') or game_data.get('profile_url'),
-                    game_url=game_data.get('game_url'),
-                    thumbnail=game_data.get('thumbnail'),
-                )
-                print(f"Juego '{game_data['title']}' guardado con éxito desde la API de formato JSON")
-
-    except Exception as e:
-        print(f"Error al guardar el juego '{game_data['title']}': {e}")
+# Reanudar tras un fallo a mitad del fichero:
+# offset -> byte del JSON desde el que continuar (justo después de un elemento)
+# checkpoint -> checkpoint(offset) tras confirmar cada lote -> último offset seguro para reanudar
+def load_json(response, prefix, batch_size=None, offset=0, checkpoint=None):
+    # Leer el array JSON en streaming (JsonArrayReader) -> un juego cada vez, memoria acotada
+    # (sin cargar la respuesta completa ni la lista completa de diccionarios)
+    reader = JsonArrayReader(response, offset=offset)
+
+    # Recorrer los juegos extraídos y guardarlos por lotes:
+    # ¡¡Si existe => id o título normalizado => NO se crea!! -> comprobado en memoria (ingest.py), sin consultas por juego
+    # Si existe por id y ha cambiado en la fuente (hash) -> se actualizan solo los campos cambiados
+    records = (game_data_from_json(record, prefix) for record in reader)
+    on_flush = (lambda stats: checkpoint(reader.offset)) if checkpoint else None
+    # Juegos obsoletos -> solo si se lee la fuente completa (al reanudar faltan los juegos anteriores al offset)
+    stale_prefix = prefix if offset == 0 else None
+    stats = ingest_games(records, batch_size=batch_size, checkpoint=on_flush, prefix=stale_prefix)
+    print(f"API de formato JSON ({prefix}): {stats}")
+    return stats
 
 
 # Función para validar si una fecha es válida
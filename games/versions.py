@@ -0,0 +1,93 @@
+import hashlib
+import itertools
+import time
+
+from .models import CacheVersion
+
+
+# Versiones de los datos cacheados (modelo CacheVersion):
+# - Cada parte cacheada lleva en su clave la versión de los datos de los que depende
+#   => al cambiar los datos se cambia la versión y las entradas anteriores dejan de usarse (caducan solas)
+# - Las versiones están en la BD -> la sincronización (otro proceso: sync_games --loop) invalida la caché de la web
+# - Versión = time.time_ns() del último cambio -> nunca se repite aunque se borre la tabla o la caché
+
+# Catálogo completo -> cambia con cada ingesta que crea o modifica juegos (ingest.py) y con las miniaturas
+CATALOGUE = 'catalogue'
+# Comentarios -> cambia con cada comentario creado, modificado o borrado (signals.py)
+COMMENTS = 'comments'
+# Títulos -> cambia al crear, borrar o cambiar el título de un juego guardado con save() (signals.py)
+# y al marcar o desmarcar juegos como obsoletos (ingest.py)
+# (no con las valoraciones -> el índice de sugerencias, games/suggest.py)
+TITLES = 'titles'
+# Recuentos de los filtros (facets.py) -> cambia con cada ingesta que crea o modifica juegos y al crear, borrar
+# o cambiar platform / genre / publisher de un juego guardado con save() (no con las valoraciones)
+FACET_COUNTS = 'facets'
+
+
+# Versión de una combinación de filtros de la página principal (platform, genre, publisher -> '' si no se filtra)
+def filters_scope(platform, genre, publisher):
+    key = '\x1f'.join((platform, genre, publisher))
+    return f"filters:{hashlib.md5(key.encode()).hexdigest()}"
+
+
+# Combinaciones de filtros en las que aparece un juego -> 8 (cada filtro con su valor o sin filtrar)
+def game_filter_scopes(platform, genre, publisher):
+    return {filters_scope(*combination)
+            for combination in itertools.product((platform, ''), (genre, ''), (publisher, ''))}
+
+
+# Versiones actuales -> {nombre: versión} (las que no existen se crean)
+def get_versions(*names):
+    versions = dict(CacheVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    missing = [name for name in names if name not in versions]
+    if missing:
+        now = time.time_ns()
+        CacheVersion.objects.bulk_create([CacheVersion(name=name, version=now) for name in missing],
+                                         ignore_conflicts=True)
+        # Otro proceso puede haberlas creado a la vez -> se vuelven a leer
+        versions.update(CacheVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+    return versions
+
+
+# Cambiar las versiones -> UNA sentencia (INSERT ... ON CONFLICT DO UPDATE)
+# -> dentro de la transacción del cambio de los datos (si se deshace, la versión tampoco cambia)
+def bump_versions(*names):
+    now = time.time_ns()
+    CacheVersion.objects.bulk_create([CacheVersion(name=name, version=now) for name in names],
+                                     update_conflicts=True, unique_fields=['name'], update_fields=['version'])
+
+
+def bump_catalogue_version():
+    bump_versions(CATALOGUE)
+
+
+# Ingesta -> catálogo y recuentos de los filtros en UNA sentencia
+def bump_ingest_versions():
+    bump_versions(CATALOGUE, FACET_COUNTS)
+
+
+# Juegos marcados / desmarcados como obsoletos (ingest.py: update() sin señales)
+# -> catálogo, recuentos de los filtros y títulos (sugerencias) en UNA sentencia
+def bump_stale_versions():
+    bump_versions(CATALOGUE, FACET_COUNTS, TITLES)
+
+
+def bump_comments_version():
+    bump_versions(COMMENTS)
+
+
+def bump_titles_version():
+    bump_versions(TITLES)
+
+
+# Un juego ha cambiado (valoración, campos, borrado) -> solo las combinaciones de filtros en las que aparece
+# (con sus valores actuales y, si se han cambiado, los que tenía al cargarlo)
+# facets=True -> también los recuentos de los filtros (juego nuevo, borrado o con otros valores de los filtros)
+def bump_game_versions(game, facets=False):
+    scopes = game_filter_scopes(game.platform, game.genre, game.publisher)
+    loaded = getattr(game, '_loaded_filters', None)
+    if loaded and None not in loaded:
+        scopes |= game_filter_scopes(*loaded)
+    if facets:
+        scopes.add(FACET_COUNTS)
+    bump_versions(*sorted(scopes))
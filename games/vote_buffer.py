@@ -0,0 +1,174 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from .likes import like_deltas, toggle_vote, user_vote, write_votes
+from .models import Comment, Like
+
+
+# Votos de POST /api/comments/<id>/vote acumulados en memoria antes de escribirlos (write-behind):
+# - settings.GAME_VOTE_BUFFER_WINDOW (segundos, 0 -> sin buffer: cada clic es su propia transacción)
+# - El primer voto pendiente programa la escritura para dentro de WINDOW segundos (un Timer del proceso)
+#   => varios clics del mismo usuario en el mismo comentario dentro de la ventana -> UNA escritura (el último voto)
+#   => todos los votos de la ventana se escriben en UNA transacción (likes.write_votes) -> menos esperas
+#      del bloqueo de escritura de SQLite en los hilos con muchos clics a la vez
+# - Como mucho GAME_VOTE_BUFFER_SIZE votos pendientes -> con el buffer lleno se escriben antes de seguir
+# - La escritura no bloquea los votos nuevos (los votos en curso siguen contando hasta el COMMIT);
+#   si falla, los votos vuelven al buffer y se reintenta en WINDOW segundos
+# - Al terminar el proceso (atexit) se escriben los pendientes -> flush_votes() para hacerlo a mano
+# - Un buffer por proceso: el voto pendiente de un usuario solo lo ve el proceso que lo recibió
+#   (los contadores se calculan al escribir desde los votos de la BD -> siguen siendo exactos)
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_window():
+    return getattr(settings, 'GAME_VOTE_BUFFER_WINDOW', 0)
+
+
+def get_size():
+    return getattr(settings, 'GAME_VOTE_BUFFER_SIZE', 1000)
+
+
+# Votos pendientes del proceso -> {(comment_id, user_id): [voto en la BD, voto nuevo]} + escritura programada
+# Votos en curso de escritura (_inflight) -> siguen a la vista hasta el COMMIT: un clic durante la escritura parte
+#   del voto que se está guardando y los contadores devueltos incluyen sus cambios
+# _lock solo protege los diccionarios (sin consultas a la BD dentro) | _flush_lock -> una escritura a la vez
+# _flushes -> escrituras confirmadas (lo leído de la BD mientras se confirma una escritura se vuelve a leer)
+_pending = {}
+_inflight = {}
+_flushes = 0
+_timer = None
+_registered = False
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+
+# Voto (like / dislike, mismo voto otra vez lo anula) de un usuario en un comentario
+# -> (nuevo voto, likes, dislikes) con los votos pendientes y en curso del comentario ya sumados
+# Sin buffer -> se escribe en el momento (likes.toggle_vote)
+# Los contadores (y el voto actual si no está en memoria) se leen de la BD fuera del bloqueo
+# Comentario borrado después de cargarlo -> Comment.DoesNotExist (sin sus votos pendientes)
+def vote(comment, user, value):
+    if get_window() <= 0:
+        after = toggle_vote(comment, user, value)
+        return after, comment.like_count, comment.dislike_count
+
+    global _registered
+    key = (comment.pk, user.pk)
+    if pending_votes() >= get_size() and key not in _pending:
+        flush_votes()
+
+    stored = flushes = None
+    while True:
+        with _lock:
+            known = key in _pending or key in _inflight
+            if flushes == _flushes and (known or stored is not None):
+                entry = _pending.get(key)
+                if entry is None:
+                    # Voto en curso de escritura -> se parte de lo que va a quedar en la BD
+                    inflight = _inflight.get(key)
+                    before = inflight[1] if inflight is not None else stored
+                    entry = _pending[key] = [before, before]
+                entry[1] = Like.NO_VOTE if entry[1] == value else value
+
+                if not _registered:
+                    atexit.register(flush_votes)
+                    _registered = True
+                schedule_flush()
+                return (entry[1],) + buffered_counts(comment)
+            flushes = _flushes
+
+        # Fuera del bloqueo: contadores guardados (y el voto si no está en memoria)
+        # -> si mientras tanto se confirma una escritura (_flushes cambia) se vuelven a leer
+        try:
+            comment.refresh_from_db(fields=['like_count', 'dislike_count'])
+        except Comment.DoesNotExist:
+            discard_votes(comment.pk)
+            raise
+        stored = None if known else user_vote(comment, user)
+
+
+# Quitar del buffer los votos pendientes de un comentario borrado -> (votos quitados)
+# (los que están en curso de escritura los descarta likes.write_votes)
+def discard_votes(comment_id):
+    with _lock:
+        keys = [key for key in _pending if key[0] == comment_id]
+        for key in keys:
+            del _pending[key]
+        return len(keys)
+
+
+# Contadores de un comentario con los votos en curso y pendientes sumados -> (likes, dislikes) (con _lock)
+def buffered_counts(comment):
+    likes, dislikes = comment.like_count, comment.dislike_count
+    for votes in (_inflight, _pending):
+        for (comment_id, _user_id), (before, after) in votes.items():
+            if comment_id == comment.pk:
+                like_delta, dislike_delta = like_deltas(before, after)
+                likes, dislikes = likes + like_delta, dislikes + dislike_delta
+    return likes, dislikes
+
+
+# Escritura de los pendientes dentro de WINDOW segundos (si no hay ya una programada)
+def schedule_flush():
+    global _timer
+    if _timer is None:
+        _timer = threading.Timer(get_window(), flush_in_thread)
+        _timer.daemon = True
+        _timer.start()
+
+
+def flush_in_thread():
+    try:
+        flush_votes()
+    finally:
+        # Conexión del hilo del Timer -> se cierra (cada Timer es un hilo nuevo)
+        connections.close_all()
+
+
+# Escribir todos los votos pendientes (UNA transacción) -> (votos escritos)
+# Los pendientes pasan a _inflight con el bloqueo -> la escritura va sin él (los votos siguen entrando)
+#   y se quitan de _inflight solo después del COMMIT
+# Si la escritura falla -> los votos vuelven al buffer (sin pisar los votos más nuevos de los mismos usuarios) -> 0
+def flush_votes():
+    global _pending, _inflight, _flushes, _timer
+    with _flush_lock:
+        with _lock:
+            if _timer is not None:
+                _timer.cancel()
+                _timer = None
+            if not _pending:
+                return 0
+            _inflight, _pending = _pending, {}
+
+        try:
+            written = write_votes({key: after for key, (_before, after) in _inflight.items()})
+        except Exception:
+            logger.exception("Could not write %d buffered comment votes", len(_inflight))
+            with _lock:
+                for key, entry in _inflight.items():
+                    newer = _pending.get(key)
+                    if newer is None:
+                        _pending[key] = entry
+                    else:
+                        # Voto nuevo que partía del voto en curso -> la BD sigue con el de antes
+                        newer[0] = entry[0]
+                _inflight = {}
+                schedule_flush()
+            return 0
+
+        with _lock:
+            _inflight = {}
+            _flushes += 1
+        return written
+
+
+# Votos pendientes del proceso (pruebas)
+def pending_votes():
+    with _lock:
+        return len(_pending)